@@ -1,19 +1,52 @@
-from flask import Flask, request, jsonify
+import time
+
+# Start-up timing starts before any other import
+_STARTUP_T0 = time.perf_counter()
+
+from flask import Flask, request, jsonify, Response, g
 import os
 import traceback
-from huggingface_hub import InferenceClient
-from huggingface_hub.utils import HfHubHTTPError
-from codecarbon import EmissionsTracker
 import tempfile
 import sys
 import subprocess
-import time
 import statistics
+import math
 import json
 import psutil
 import platform
 import re
 import logging
+import atexit
+import queue
+import threading
+import contextlib
+import functools
+import hmac
+from concurrent.futures import ThreadPoolExecutor
+from llm_cache import CompletionCache, completion_key, DEFAULT_CACHE_PATH
+from build_cache import BuildCache, DEFAULT_BUILD_CACHE_DIR, compiler_version
+from worker_pool import PythonWorkerPool, WorkerTimeout, WORKER_SCRIPT
+from jobs import JobManager, JobStore, JobCancelled, JobQueueFull, DEFAULT_JOB_STORE_PATH
+from batch import StageLimiter, dedupe, run_batch
+from history import HistoryStore, parse_time, DEFAULT_HISTORY_PATH
+from benchmark import (adaptive_benchmark, compare as compare_benchmarks, output_digest,
+                       DEFAULT_SETTINGS as DEFAULT_BENCHMARK_SETTINGS)
+from energy import (EnergyMeter, calibrate_host, host_fingerprint, run_with_rusage, summarize_usage,
+                    DEFAULT_CALIBRATION_PATH)
+from measurement_cache import MeasurementCache, measurement_key, host_profile, DEFAULT_MEASUREMENT_CACHE_PATH
+from scheduler import MeasurementScheduler, SchedulerSaturated
+from nodes import NodeRegistry, NodeAgent, NodeUnavailable, TOKEN_HEADER as NODE_TOKEN_HEADER
+from complexity import (discover_entry_points, choose_entry_point, summarize_profile,
+                        DEFAULT_SIZES as DEFAULT_COMPLEXITY_SIZES, DEFAULT_PRODUCTION_SIZES)
+from hotspots import profile_c, format_for_prompt as format_hotspots, renumber as renumber_hotspots
+from prompt_prep import minify_code, output_token_budget, estimate_tokens
+from isolation import CorePool, apply_limits, parse_cpu_list, default_cores, SUPPORTED as ISOLATION_SUPPORTED
+from startup import StartupReport, Readiness, PENDING, READY, DISABLED
+import metrics
+
+startup_report = StartupReport(_STARTUP_T0)
+startup_report.mark("imports")
+readiness = Readiness()
 
 # Set codecarbon to info level for detailed logs
 logging.getLogger("codecarbon").setLevel(logging.INFO)
@@ -22,12 +55,170 @@ logging.getLogger("codecarbon").setLevel(logging.INFO)
 app = Flask(__name__)
 
 HF_TOKEN = os.getenv("HF_TOKEN")
-MODEL = "Qwen/Qwen3-Coder-30B-A3B-Instruct"
+# A Hub model id, or the URL of a compatible endpoint (e.g. the offline stub in stub_llm.py)
+MODEL = os.getenv("HF_MODEL", "Qwen/Qwen3-Coder-30B-A3B-Instruct")
+
+# huggingface_hub is heavy to import, so the client is built on first use or by the warm-up thread
+client = None
+client_lock = threading.Lock()
+
+
+def get_client():
+    """The shared InferenceClient, or None when HF_TOKEN is not set."""
+    global client
+    if client is None and HF_TOKEN:
+        with client_lock:
+            if client is None:
+                from huggingface_hub import InferenceClient
+                client = InferenceClient(model=MODEL, token=HF_TOKEN, headers={"Accept-Encoding": "identity"})
+                readiness.mark("llm_client", READY)
+    return client
+
+
+# Persistent cache of LLM completions, keyed by (model, prompts, language)
+completion_cache = CompletionCache(
+    path=os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH),
+    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000")),
+    max_bytes=int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    ttl_seconds=int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+)
+startup_report.mark("completion_cache")
+
+# Cache of compiled C executables, keyed by (source, compiler version, flags)
+build_cache = BuildCache(
+    directory=os.getenv("BUILD_CACHE_DIR", DEFAULT_BUILD_CACHE_DIR),
+    max_entries=int(os.getenv("BUILD_CACHE_MAX_ENTRIES", "500")),
+    max_bytes=int(os.getenv("BUILD_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+)
+C_COMPILE_FLAGS = []
+startup_report.mark("build_cache")
+
+# Durable history of every generation and optimization run
+history_store = HistoryStore(os.getenv("HISTORY_DB_PATH", DEFAULT_HISTORY_PATH))
+startup_report.mark("history_store")
+
+# Memoized measurement records, keyed by (normalized code, language, parameters, host profile, engine version).
+# Requests can force a fresh measurement with "remeasure": true.
+measurement_cache = MeasurementCache(
+    path=os.getenv("MEASUREMENT_CACHE_PATH", DEFAULT_MEASUREMENT_CACHE_PATH),
+    max_entries=int(os.getenv("MEASUREMENT_CACHE_MAX_ENTRIES", "2000")),
+    ttl_seconds=int(os.getenv("MEASUREMENT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+) if os.getenv("MEASUREMENT_CACHE", "1") == "1" else None
+startup_report.mark("measurement_cache")
+
+# Adaptive benchmarking: warm-up, then repeat until the 95% CI is tight or the budget is spent
+BENCHMARK_SETTINGS = {
+    "warmup_runs": int(os.getenv("BENCH_WARMUP_RUNS", DEFAULT_BENCHMARK_SETTINGS["warmup_runs"])),
+    "min_runs": int(os.getenv("BENCH_MIN_RUNS", DEFAULT_BENCHMARK_SETTINGS["min_runs"])),
+    "max_runs": int(os.getenv("BENCH_MAX_RUNS", DEFAULT_BENCHMARK_SETTINGS["max_runs"])),
+    "target_rel_ci": float(os.getenv("BENCH_TARGET_REL_CI", DEFAULT_BENCHMARK_SETTINGS["target_rel_ci"])),
+    "time_budget_s": float(os.getenv("BENCH_TIME_BUDGET_S", DEFAULT_BENCHMARK_SETTINGS["time_budget_s"]))
+}
+
+# Admission control: cap concurrent measurements to the core budget and bound the wait queue
+MEASURE_SLOTS = int(os.getenv("MEASURE_SLOTS", str(psutil.cpu_count(logical=False) or 1)))
+measurement_scheduler = MeasurementScheduler(
+    slots=MEASURE_SLOTS,
+    max_queue=int(os.getenv("MEASURE_QUEUE_DEPTH", str(2 * MEASURE_SLOTS))),
+    # Share the budget across server processes on this host (e.g. several WSGI workers)
+    lock_dir=os.getenv("MEASURE_LOCK_DIR") or None,
+    host_wait_s=float(os.getenv("MEASURE_HOST_WAIT_S", "30"))
+)
+
+# Remote measurement nodes: other backend instances started with COORDINATOR_URL register here and
+# take measurements off this host. Measuring locally stays the fallback. Nodes receive users' code and
+# their results are trusted, so node mode is only enabled when a shared NODE_TOKEN is configured.
+NODE_TOKEN = os.getenv("NODE_TOKEN") or None
+node_registry = NodeRegistry(
+    token=NODE_TOKEN,
+    job_timeout_s=float(os.getenv("NODE_JOB_TIMEOUT_S", "900")),
+    max_attempts=int(os.getenv("NODE_MAX_ATTEMPTS", "3")),
+    max_failures=int(os.getenv("NODE_MAX_FAILURES", "2")),
+    heartbeat_s=float(os.getenv("NODE_HEARTBEAT_S", "10")),
+    expiry_s=float(os.getenv("NODE_EXPIRY_S", "60")),
+    health_interval_s=float(os.getenv("NODE_HEALTH_INTERVAL_S", "10"))
+)
+if NODE_TOKEN:
+    node_registry.start_health_checks()
+# Set on a measurement node: where to register, and the URL the coordinator should use to reach this node
+COORDINATOR_URL = os.getenv("COORDINATOR_URL") or None
+NODE_PUBLIC_URL = os.getenv("NODE_PUBLIC_URL", f"http://{platform.node()}:{os.getenv('PORT', '5000')}")
+
+# Isolation mode: pin each measured run to its own cores with a fixed priority and resource limits,
+# so before/after numbers are reproducible. Requests can opt in or out with "isolate".
+ISOLATION_MODE = os.getenv("ISOLATION_MODE", "0") == "1"
+core_pool = CorePool(
+    cores=parse_cpu_list(os.getenv("ISOLATION_CORES", "")) or default_cores(),
+    sets=MEASURE_SLOTS,
+    nice=int(os.getenv("ISOLATION_NICE", "0")),
+    cpu_seconds=int(os.getenv("ISOLATION_CPU_SECONDS", "300")),
+    address_space_bytes=int(os.getenv("ISOLATION_ADDRESS_SPACE_BYTES", str(2 * 1024 ** 3))),
+    pin_server=ISOLATION_MODE and os.getenv("ISOLATION_PIN_SERVER", "0") == "1"
+) if ISOLATION_SUPPORTED else None
 
-if HF_TOKEN:
-    client = InferenceClient(model=MODEL, token=HF_TOKEN, headers={"Accept-Encoding": "identity"})
+# Empirical complexity profile of Python entry points across a geometric series of input sizes.
+# Requests can opt in or out with "complexity".
+COMPLEXITY_PROFILE = os.getenv("COMPLEXITY_PROFILE", "1") == "1"
+COMPLEXITY_SIZES = [int(n) for n in os.getenv("COMPLEXITY_SIZES", "").split(",") if n.strip()] or DEFAULT_COMPLEXITY_SIZES
+COMPLEXITY_PRODUCTION_SIZES = ([int(n) for n in os.getenv("COMPLEXITY_PRODUCTION_SIZES", "").split(",") if n.strip()]
+                               or DEFAULT_PRODUCTION_SIZES)
+# Stop growing the input once one call takes longer than this
+COMPLEXITY_MAX_POINT_S = float(os.getenv("COMPLEXITY_MAX_POINT_S", "0.5"))
+# The main measurement calls an entry point at the request's data_size, shrunk until one call takes at most
+# this long; integer size parameters are also capped at the largest COMPLEXITY_SIZES entry. /optimize probes the
+# original only and measures everything else at the size it settled on ("probe": False in test_params)
+MEASURE_MAX_CALL_S = float(os.getenv("MEASURE_MAX_CALL_S", "1.0"))
+COMPLEXITY_BENCHMARK_SETTINGS = {"warmup_runs": 1, "min_runs": 3, "max_runs": 10, "target_rel_ci": 0.05,
+                                 "time_budget_s": float(os.getenv("COMPLEXITY_POINT_BUDGET_S", "2.0"))}
+
+# Optional hotspot profile of the code before optimization, fed into the optimization prompt.
+# Requests can opt in or out with "profile".
+HOTSPOT_PROFILE = os.getenv("HOTSPOT_PROFILE", "0") == "1"
+
+# Compiler flag explorer for C: measure the code built at each flag set (";"-separated, the first is the
+# baseline) and recommend the greenest. Requests can opt in or out with "compiler_flags".
+C_FLAG_EXPLORER = os.getenv("C_FLAG_EXPLORER", "0") == "1"
+C_FLAG_SETS = [flags.strip() for flags in
+               os.getenv("C_FLAG_SETS", ";-O2;-O3;-O3 -march=native;-O3 -march=native -flto").split(";")]
+
+# Best-of-N optimization: up to this many candidates per request, sampled across the temperature range
+OPTIMIZE_MAX_CANDIDATES = int(os.getenv("OPTIMIZE_MAX_CANDIDATES", "5"))
+CANDIDATE_TEMPERATURE_RANGE = (float(os.getenv("CANDIDATE_TEMPERATURE_MIN", "0.2")),
+                               float(os.getenv("CANDIDATE_TEMPERATURE_MAX", "1.0")))
+
+# Prompt preparation: code in optimization prompts is minified (comments, docstrings and blank lines
+# dropped) unless PROMPT_COMPACTION=0 or a request sends "compact_prompt": false. Completions are capped
+# at a per-language output budget (LLM_MAX_TOKENS_<LANGUAGE>, else LLM_MAX_TOKENS), raised for long
+# input code up to LLM_MAX_TOKENS_CEILING.
+PROMPT_COMPACTION = os.getenv("PROMPT_COMPACTION", "1") == "1"
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "1024"))
+LLM_MAX_TOKENS_BY_LANGUAGE = {language: int(os.getenv(f"LLM_MAX_TOKENS_{language.upper()}", default))
+                              for language, default in (("python", "1024"), ("c", "1536"))}
+LLM_MAX_TOKENS_CEILING = int(os.getenv("LLM_MAX_TOKENS_CEILING", "4096"))
+
+# Optional memory term in the energy estimate: watts per GB of peak RSS (0 disables it)
+ENERGY_MEMORY_WATTS_PER_GB = float(os.getenv("ENERGY_MEMORY_WATTS_PER_GB", "0"))
+
+# Prefix of the line a fallback (one-shot) Python run writes its own codecarbon measurement on
+CHILD_RESULT_MARKER = "__codeleaf_measurement__ "
+
+# Per-process energy attribution; the host baseline is calibrated lazily on first measurement
+energy_meter = None
+# Identifies the host and energy model that cached measurements were taken under
+measurement_host_profile = None
+energy_meter_lock = threading.Lock()
+
+# Pre-warmed Python measurement workers (set PY_WORKER_POOL_SIZE=0 to spawn a fresh interpreter per run)
+PY_WORKER_POOL_SIZE = int(os.getenv("PY_WORKER_POOL_SIZE", "2"))
+if PY_WORKER_POOL_SIZE > 0:
+    python_pool = PythonWorkerPool(
+        size=PY_WORKER_POOL_SIZE,
+        max_jobs=int(os.getenv("PY_WORKER_MAX_JOBS", "50"))
+    )
+    atexit.register(python_pool.shutdown)
 else:
-    client = None
+    python_pool = None
+startup_report.mark("python_worker_spawn")
 
 # ====================== Helper Functions ======================
 def clean_code(code: str) -> str:
@@ -49,46 +240,412 @@ def clean_code(code: str) -> str:
     return "\n".join(code_lines)
 
 
-def universal_emissions_tracker(executable, num_runs=3) -> float:
+def reject_truncated(usage: dict):
+    """Code cut off at the output budget would be measured as if it were a real answer."""
+    if usage.get("truncated"):
+        raise RequestError(f"The model's answer was cut off at {usage['max_tokens']} tokens; "
+                           f"raise LLM_MAX_TOKENS for this language", 502)
+
+
+def estimate_llm_co2(request_time: float) -> float:
+    """Rough CO2 estimate for an LLM call from its wall time."""
+    cpu_count = psutil.cpu_count(logical=True)
+    cpu_power_w = 45 * 0.03
+    gpu_power_w = 300 * 0.03
+    energy_kwh = ((cpu_power_w * cpu_count) + gpu_power_w) * request_time / 3600
+    return energy_kwh * 0.475
+
+
+def cached_chat_completion(system_prompt: str, user_prompt: str, language: str, bypass_cache: bool = False, on_token=None,
+                           temperature=None, max_tokens=None):
     """
-    Rough CO2 estimate for non-Python code (C) using CPU time and system power assumptions.
+    Returns (content, request_time, cached, usage).
+    Serves identical requests from the completion cache unless bypass_cache is set.
+    When on_token is given the completion is streamed and each text delta is passed to it.
+    temperature overrides the model's default sampling temperature; max_tokens caps the output.
+    usage holds the token counts (estimated from the text when the model reports none), output
+    tokens per second, and whether the completion hit max_tokens.
     """
-    emissions_list = []
+    key = completion_key(MODEL, system_prompt, user_prompt, language, temperature, max_tokens)
+    sampling = {"temperature": temperature} if temperature is not None else {}
+    if max_tokens is not None:
+        sampling["max_tokens"] = max_tokens
+    if not bypass_cache:
+        content = completion_cache.get(key)
+        if content is not None:
+            metrics.LLM_COMPLETIONS.labels("true").inc()
+            if on_token:
+                on_token(content)
+            return content, 0.0, True, {"max_tokens": max_tokens, "completion_tokens": None, "tokens_per_s": None}
+
+    metrics.LLM_COMPLETIONS.labels("false").inc()
+    start_time = time.time()
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+    reported, finish_reason, first_token_s = None, None, None
+    with metrics.stage("llm", language):
+        if on_token:
+            parts = []
+            for chunk in get_client().chat_completion(messages=messages, stream=True,
+                                                      stream_options={"include_usage": True}, **sampling):
+                reported = getattr(chunk, "usage", None) or reported
+                if not chunk.choices:
+                    continue
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if first_token_s is None:
+                        first_token_s = time.time() - start_time
+                    parts.append(delta)
+                    on_token(delta)
+            content = "".join(parts)
+        else:
+            result = get_client().chat_completion(messages=messages, **sampling)
+            content = result.choices[0].message.content or ""
+            reported, finish_reason = result.usage, result.choices[0].finish_reason
+    request_time = time.time() - start_time
+
+    # Some servers report zero usage; fall back to estimating from the text
+    estimated = not (reported and reported.completion_tokens)
+    prompt_tokens = estimate_tokens(system_prompt + user_prompt) if estimated else reported.prompt_tokens
+    completion_tokens = estimate_tokens(content) if estimated else reported.completion_tokens
+    metrics.LLM_TOKENS.labels("prompt").inc(prompt_tokens)
+    metrics.LLM_TOKENS.labels("completion").inc(completion_tokens)
+    truncated = finish_reason == "length"
+    if truncated:
+        metrics.LLM_TRUNCATED.inc()
+    usage = {
+        "max_tokens": max_tokens,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "estimated": estimated,
+        "tokens_per_s": completion_tokens / request_time if request_time > 0 else None,
+        "first_token_s": first_token_s,
+        "truncated": truncated
+    }
+
+    # A reply cut off at max_tokens is not a usable answer to serve again
+    if not truncated:
+        completion_cache.put(key, content)
+    return content, request_time, False, usage
+
+
+def get_energy_meter() -> EnergyMeter:
+    """Process-wide energy meter; calibrates the host baseline on first use."""
+    global energy_meter
+    with energy_meter_lock:
+        if energy_meter is None:
+            spawn_cmd = None
+            build = build_cache.get_or_build("int main(void) { return 0; }\n", C_COMPILE_FLAGS)
+            if build["exe_path"]:
+                spawn_cmd = [build["exe_path"]]
+            calibration = calibrate_host(path=os.getenv("HOST_CALIBRATION_PATH", DEFAULT_CALIBRATION_PATH), spawn_cmd=spawn_cmd)
+            energy_meter = EnergyMeter(calibration=calibration, watts_per_gb=ENERGY_MEMORY_WATTS_PER_GB)
+            global measurement_host_profile
+            measurement_host_profile = host_profile(host_fingerprint(), energy_meter.to_dict())
+            if measurement_cache is not None:
+                # Results from another host or an earlier calibration are no longer comparable
+                dropped = measurement_cache.retain_profile(measurement_host_profile)
+                if dropped:
+                    print(f"Host profile changed; dropped {dropped} cached measurements")
+            readiness.mark("energy_meter", READY)
+        return energy_meter
+
+
+def build_c(code: str, flags=None) -> dict:
+    """build_cache.get_or_build, with the compile time and any failure recorded in the metrics."""
+    build = build_cache.get_or_build(code, C_COMPILE_FLAGS if flags is None else flags)
+    if not build["cache_hit"]:
+        metrics.observe("compile", build["compile_time_s"], "c")
+    if build["exe_path"] is None:
+        metrics.COMPILE_FAILURES.inc()
+    elif not build["cache_hit"]:
+        readiness.used("compiler")
+    return build
+
+
+def universal_emissions_tracker(executable, bench_settings=None, isolation=None):
+    """
+    CO2 estimate for non-Python code (C) from the child's own CPU time
+    (and RAPL package energy when available), minus the calibrated host baseline.
+    Runs are repeated by the adaptive benchmarking engine, pinned and limited per `isolation` when given.
+    Returns (mean_co2_kg, details) where details holds per-run CO2 and timing statistics.
+    """
+    settings = {**BENCHMARK_SETTINGS, **(bench_settings or {})}
+    meter = get_energy_meter()
+    run_errors = []
+    usages = []
+    on_start = functools.partial(apply_limits, **isolation) if isolation else None
+    timed_out = []
+
+    def run_once():
+        # Provide empty input to prevent hangs on interactive prompts like scanf
+        try:
+            res = run_with_rusage(executable, input_text="", timeout=300, on_start=on_start)
+        except subprocess.TimeoutExpired:
+            metrics.TIMEOUTS.labels("run").inc()
+            timed_out.append(True)
+            raise
+        usages.append(res)
+        if res["returncode"] != 0 and len(run_errors) < 5:
+            run_errors.append(f"Exit code {res['returncode']}: {res['stderr'].strip()[:500]}")
+
     try:
-        for _ in range(num_runs):
-            start_time = time.time()
-            # Provide empty input to prevent hangs on interactive prompts like scanf
-            subprocess.run(executable, input="", capture_output=True, text=True, timeout=300)
-            elapsed = time.time() - start_time
-
-            cpu_count = psutil.cpu_count(logical=True)
-            cpu_power_w = 45 if platform.system() != "Windows" else 65
-            gpu_power_w = 300
-
-            energy_kwh = ((cpu_power_w * cpu_count) + gpu_power_w) * elapsed / 3600
-            co2_kg = energy_kwh * 0.475
-            emissions_list.append(co2_kg)
+        with metrics.stage("benchmark", "c"):
+            bench = adaptive_benchmark(run_once, **settings)
     except Exception as e:
         print(f"Error in universal tracker: {e}")
-        return 0.0
-    return statistics.mean(emissions_list) if emissions_list else 0.0
+        return 0.0, {"errors": [str(e)]}
+    if timed_out:
+        raise MeasurementTimeout("The program did not finish within 300 s")
+
+    # Warm-up runs are excluded from the statistics
+    usages = usages[len(bench["warmup_samples_s"]):][:len(bench["samples_s"])]
+    attributions = [
+        meter.attribute(u["user_s"] + u["sys_s"], u["wall_s"], host=u["host"],
+                        baseline_cpu_s=meter.calibration.get("spawn_cpu_s", 0.0), memory_kb=u["max_rss_kb"])
+        for u in usages
+    ]
+    individual_runs = [a["co2_kg"] for a in attributions]
+    details = {
+        "individual_runs": individual_runs,
+        "errors": bench.pop("errors") + run_errors,
+        "output_digest": output_digest(usages[0]["stdout"]) if usages else None,
+        "benchmark": bench,
+        "resource_usage": summarize_usage(attributions, usages)
+    }
+    details["memory"] = {"peak_rss_kb": details["resource_usage"]["max_rss_kb"]}
+    return (statistics.mean(individual_runs) if individual_runs else 0.0), details
 
 
-def run_code_and_track_emissions(code: str, test_params: dict, language: str) -> float:
+def run_worker_job(job: dict, timeout: float) -> dict:
+    """Run a job on a warm Python worker, or on a one-shot worker when the pool is disabled."""
+    try:
+        with metrics.stage("worker_job", "python"):
+            if python_pool is not None:
+                result = python_pool.run(job, timeout=timeout)
+                if result.get("ok"):
+                    readiness.used("python_workers")
+                return result
+            # One-shot worker speaking the same protocol: handshake line, then one result line
+            usage = run_with_rusage([sys.executable, WORKER_SCRIPT], input_text=json.dumps(job) + "\n", timeout=timeout)
+            return json.loads(usage["stdout"].strip().splitlines()[-1])
+    except (WorkerTimeout, subprocess.TimeoutExpired):
+        metrics.TIMEOUTS.labels("worker_job").inc()
+        raise
+
+
+def profile_hotspots(code: str, test_params: dict, language: str) -> dict:
+    """
+    Where the time goes: top functions and lines by self time, from cProfile plus a
+    line sampler for Python and a gprof-instrumented build for C. Holds a measurement slot.
+    """
+    if not code.strip():
+        return None
+    with measurement_scheduler.slot():
+        try:
+            if language.lower() == "python":
+                function_name = test_params.get("function_name", "dummy_function")
+                entry_point = choose_entry_point(discover_entry_points(code), preferred=function_name)
+                job = {"mode": "hotspots", "code": code, "entry_point": entry_point,
+                       "function_name": entry_point["name"] if entry_point else function_name,
+                       "data_size": entry_point_size(entry_point, test_params.get("data_size", 1000)),
+                       "max_call_s": probe_limit(test_params)}
+                return run_worker_job(job, timeout=300)
+            if language.lower() == "c":
+                code = clean_code(code)
+                build = build_c(code, C_COMPILE_FLAGS + ["-pg", "-g"])
+                if build["exe_path"] is None:
+                    return {"language": "c", "functions": [], "lines": [], "error": f"Compilation failed: {build['error']}"}
+                return profile_c(build["exe_path"], code)
+        except Exception as e:
+            print(f"Hotspot profiling failed: {e}")
+            return {"language": language, "functions": [], "lines": [], "error": str(e)}
+    return None
+
+
+def profile_python_complexity(code: str, entry_point: dict, isolation=None) -> dict:
+    """
+    Empirical scaling curve of a Python entry point: time and energy at COMPLEXITY_SIZES,
+    the best-fitting growth model, and the cost extrapolated to COMPLEXITY_PRODUCTION_SIZES.
+    """
+    job = {"mode": "complexity", "code": code, "entry_point": entry_point, "sizes": COMPLEXITY_SIZES,
+           "max_point_s": COMPLEXITY_MAX_POINT_S, "benchmark": COMPLEXITY_BENCHMARK_SETTINGS,
+           "energy": get_energy_meter().to_dict(), "isolation": isolation}
+    timeout = 300 + COMPLEXITY_BENCHMARK_SETTINGS["time_budget_s"] * len(COMPLEXITY_SIZES)
+    try:
+        result = run_worker_job(job, timeout)
+    except Exception as e:
+        print(f"Complexity profiling failed: {e}")
+        return {"entry_point": entry_point["name"], "points": [], "error": str(e)}
+    profile = summarize_profile(entry_point, result.get("points", []), COMPLEXITY_PRODUCTION_SIZES)
+    profile.update(stop_reason=result.get("stop_reason"), error=result.get("error"))
+    return profile
+
+
+def measurement_cache_key(code: str, test_params: dict, language: str) -> str:
+    """Cache key covering everything that shapes a measurement: inputs, settings, toolchain and host profile."""
+    get_energy_meter()
+    params = {
+        "test_params": {key: value for key, value in test_params.items() if key != "remeasure"},
+        "benchmark": BENCHMARK_SETTINGS,
+        "max_call_s": probe_limit(test_params),
+        "isolate": bool(test_params.get("isolate", ISOLATION_MODE) and core_pool is not None)
+    }
+    if language.lower() == "python":
+        params["python"] = sys.version
+        params["complexity"] = {"enabled": test_params.get("complexity", COMPLEXITY_PROFILE), "sizes": COMPLEXITY_SIZES,
+                                "production_sizes": COMPLEXITY_PRODUCTION_SIZES, "max_point_s": COMPLEXITY_MAX_POINT_S,
+                                "benchmark": COMPLEXITY_BENCHMARK_SETTINGS}
+        params["worker_pool"] = python_pool is not None
+    elif language.lower() == "c":
+        params["compiler"] = [build_cache.compiler, compiler_version(build_cache.compiler)]
+        params["flags"] = C_COMPILE_FLAGS
+    return measurement_key(code, language, params, measurement_host_profile)
+
+
+def run_code_and_track_emissions(code: str, test_params: dict, language: str, dispatch: bool = True):
     """
     Executes code safely and tracks CO2 emissions.
-    Python uses CodeCarbon, C uses universal tracker.
+    Both languages are charged for the measured process's own CPU time;
+    Python also reports CodeCarbon's figure for reference.
+    Identical measurements are served from the measurement cache unless test_params sets "remeasure".
+    Otherwise the job goes to a remote measurement node when one is free (unless dispatch is False or
+    test_params pins "node" to "local"), and runs here when none takes it. A "node" id pins the job to
+    that node alone and bypasses the cache; check measurement_host() of the result, since it still
+    runs here when that node can't take it.
+    Local runs start only once the measurement scheduler admits them; raises SchedulerSaturated when full.
+    Returns (co2_kg, execution_details).
     """
     if not code.strip():
-        return 0.0
+        return 0.0, {}
+    cache_key = None
+    pinned = test_params.get("node") not in (None, "local")
+    if measurement_cache is not None and not pinned:
+        cache_key = measurement_cache_key(code, test_params, language)
+        cached = None if test_params.get("remeasure") else measurement_cache.get(cache_key)
+        if cached is not None:
+            co2_kg, details, measured_at = cached
+            details["queue_wait_s"] = 0.0
+            details["measurement_cache"] = {"hit": True, "measured_at": measured_at, "age_s": time.time() - measured_at}
+            return co2_kg, details
+    remote = None
+    if dispatch and test_params.get("node") != "local" and node_registry.has_nodes():
+        remote = measure_on_node(code, test_params, language)
+    co2_kg, details = remote if remote is not None else measure_locally(code, test_params, language)
+    if cache_key is not None:
+        # Failed runs are not worth remembering, and a node's results belong to its host profile, not this one
+        if not details.get("errors") and remote is None:
+            measurement_cache.put(cache_key, measurement_host_profile, language, co2_kg, details)
+        details["measurement_cache"] = {"hit": False}
+    return co2_kg, details
+
+
+def measurement_host(details: dict) -> str:
+    """Id of the node a measurement ran on, or "local"."""
+    return (details.get("node") or {}).get("id", "local")
+
+
+def measure_on_node(code: str, test_params: dict, language: str):
+    """(co2_kg, details) measured on a remote node, or None when no node took the job."""
+    payload = {"code": code, "language": language,
+               "test_params": {key: value for key, value in test_params.items() if key != "node"}}
+    try:
+        with metrics.stage("node_job", language):
+            body, node = node_registry.dispatch(payload, only=test_params.get("node"))
+    except NodeUnavailable as e:
+        print(f"Measuring locally, no node took the job: {e}")
+        return None
+    if body.get("timeout"):
+        raise MeasurementTimeout(body["timeout"])
+    details = body["details"]
+    details["node"] = node.summary()
+    return body["co2_kg"], details
+
+
+def measure_locally(code: str, test_params: dict, language: str):
+    with measurement_scheduler.slot() as waited:
+        metrics.observe("queue_wait", waited, language)
+        isolate = test_params.get("isolate", ISOLATION_MODE) and core_pool is not None
+        with core_pool.lease() if isolate else contextlib.nullcontext() as isolation:
+            with metrics.stage("measure", language):
+                co2_kg, details = _measure_code(code, test_params, language, isolation)
+            entry_point = details.get("entry_point")
+            if entry_point and entry_point["params"] and test_params.get("complexity", COMPLEXITY_PROFILE):
+                with metrics.stage("complexity", language):
+                    details["complexity"] = profile_python_complexity(code, entry_point, isolation)
+        if isolation:
+            bench = details.get("benchmark") or {}
+            details["isolation"] = {
+                **isolation,
+                # Achieved run-to-run variability under isolation
+                "cv": bench["stddev_s"] / bench["mean_s"] if bench.get("mean_s") else None
+            }
+    details["queue_wait_s"] = waited
+    return co2_kg, details
+
+
+def split_child_result(stdout: str):
+    """(program output, the child's JSON measurement or None) from a fallback run's stdout."""
+    head, marker, tail = stdout.rpartition(CHILD_RESULT_MARKER)
+    if not marker:
+        return stdout, None
+    try:
+        # Drop the newline the wrapper put before the marker
+        return head[:-1], json.loads(tail)
+    except ValueError:
+        return stdout, None
+
+
+def entry_point_size(entry_point, data_size: int) -> int:
+    """data_size for an entry point; an integer size parameter is capped at the largest complexity size."""
+    if entry_point and any(p["kind"] == "size" for p in entry_point["params"]):
+        return min(data_size, max(COMPLEXITY_SIZES))
+    return data_size
+
+
+def probe_limit(test_params: dict):
+    """Longest single call the worker may shrink the input size to, or None when the size is fixed."""
+    return MEASURE_MAX_CALL_S if test_params.get("probe", True) else None
+
+
+def _measure_code(code: str, test_params: dict, language: str, isolation=None):
+    details = {}
 
     temp_file = None
-    exec_file = None
 
     try:
         if language.lower() == "python":
             function_name = test_params.get("function_name", "dummy_function")
             data_size = test_params.get("data_size", 1000)
+            # Call what the code actually defines rather than trusting a fixed name
+            entry_point = choose_entry_point(discover_entry_points(code), preferred=function_name)
+            if entry_point:
+                function_name = entry_point["name"]
+                details["entry_point"] = {"name": entry_point["name"], "params": entry_point["params"]}
+
+            if python_pool is not None:
+                # Warm worker: no interpreter start-up or codecarbon import in the measurement
+                bench_settings = {**BENCHMARK_SETTINGS, **test_params.get("benchmark", {})}
+                job = {"code": code, "function_name": function_name, "data_size": entry_point_size(entry_point, data_size),
+                       "entry_point": entry_point, "max_call_s": probe_limit(test_params), "benchmark": bench_settings,
+                       "energy": get_energy_meter().to_dict(), "isolation": isolation}
+                result = run_worker_job(job, timeout=300 + bench_settings["time_budget_s"])
+                if result.get("data_size") is not None and result["data_size"] != data_size:
+                    details["data_size"] = {"requested": data_size, "measured": result["data_size"]}
+                if result.get("codecarbon_overhead_s") is not None:
+                    metrics.observe("codecarbon", result["codecarbon_overhead_s"], "python")
+                details["duration_s"] = result["duration_s"]
+                details["individual_runs"] = result.get("individual_runs", [])
+                details["errors"] = [result["error"]] if result["error"] else []
+                for key in ("benchmark", "resource_usage", "codecarbon_co2_kg", "memory", "output_digest", "output_stable",
+                            "stdout_digest", "stdout_stable"):
+                    if result.get(key) is not None:
+                        details[key] = result[key]
+                return result["emissions"], details
+
             wrapped_code = f"""
 import sys, traceback, json
 from codecarbon import EmissionsTracker
@@ -111,159 +668,1043 @@ try:
 except Exception as e:
     print("ERROR:", e, file=sys.stderr)
 emissions = tracker.stop()
+# The child's own measurement goes back to the server as the last line of stdout
+print("\\n{CHILD_RESULT_MARKER}" + json.dumps({{"codecarbon_co2_kg": emissions or 0.0}}))
 """
-            with tempfile.NamedTemporaryFile(mode="w", suffix=".py", delete=False) as f:
+            with metrics.stage("write_temp", "python"), \
+                    tempfile.NamedTemporaryFile(mode="w", suffix=".py", delete=False) as f:
                 temp_file = f.name
                 f.write(wrapped_code)
                 f.flush()
 
             executable = [sys.executable, temp_file]
-            
-            tracker = EmissionsTracker(save_to_file=False)
-            tracker.start()
+
+            # Charge only the child's own CPU time, not whatever else the host is doing
+            meter = get_energy_meter()
             # Provide empty input to prevent hangs on interactive prompts like input()
-            subprocess.run(executable, input="", capture_output=True, text=True, timeout=300)
-            emissions = tracker.stop()
-            return emissions if emissions is not None else 0.0
+            try:
+                with metrics.stage("run", "python"):
+                    usage = run_with_rusage(executable, input_text="", timeout=300,
+                                            on_start=functools.partial(apply_limits, **isolation) if isolation else None)
+            except subprocess.TimeoutExpired:
+                metrics.TIMEOUTS.labels("run").inc()
+                raise
+            attribution = meter.attribute(usage["user_s"] + usage["sys_s"], usage["wall_s"], host=usage["host"],
+                                          memory_kb=usage["max_rss_kb"])
+            details["individual_runs"] = [attribution["co2_kg"]]
+            details["resource_usage"] = summarize_usage([attribution], [usage])
+            # Includes the interpreter and codecarbon in this fallback path
+            details["memory"] = {"peak_rss_kb": usage["max_rss_kb"]}
+            program_stdout, child = split_child_result(usage["stdout"])
+            if child is not None:
+                details["codecarbon_co2_kg"] = child["codecarbon_co2_kg"]
+            details["output_digest"] = output_digest(program_stdout)
+            return attribution["co2_kg"], details
 
         elif language.lower() == "c":
             code = clean_code(code)
-            with tempfile.NamedTemporaryFile(mode="w", suffix=".c", delete=False) as f:
-                temp_file = f.name
-                f.write(code) # Use the cleaned code directly without wrapping
-                f.flush()
-
-            exec_file = temp_file.replace(".c", "")
-            compile_res = subprocess.run(["gcc", temp_file, "-o", exec_file],
-                                         capture_output=True, text=True, timeout=120)
-            if compile_res.returncode != 0:
-                print("C compilation failed:", compile_res.stderr)
-                return 0.0
-            return universal_emissions_tracker([exec_file])
+            # Identical sources reuse the cached executable and skip gcc entirely
+            build = build_c(code)
+            details["build_cache_hit"] = build["cache_hit"]
+            details["compile_time_s"] = build["compile_time_s"]
+            if build["exe_path"] is None:
+                print("C compilation failed:", build["error"])
+                details["errors"] = [f"Compilation failed: {build['error']}"]
+                return 0.0, details
+            co2_kg, run_details = universal_emissions_tracker([build["exe_path"]], test_params.get("benchmark"), isolation)
+            details.update(run_details)
+            return co2_kg, details
 
         else:
-            return 0.0
+            return 0.0, details
 
+    except MeasurementTimeout:
+        raise
+    except (WorkerTimeout, subprocess.TimeoutExpired) as e:
+        raise MeasurementTimeout(f"The code did not finish within the time limit: {e}") from e
     except Exception as e:
         print(f"Error: {e}\n{traceback.format_exc()}")
-        return 0.0
+        metrics.ERRORS.labels("measure", type(e).__name__).inc()
+        details.setdefault("errors", []).append(str(e))
+        return 0.0, details
     finally:
         if temp_file and os.path.exists(temp_file):
             os.remove(temp_file)
-        if exec_file and os.path.exists(exec_file):
-            os.remove(exec_file)
 
 # ====================== Flask Endpoints ======================
+def _endpoint_label() -> str:
+    # The route pattern, not the raw path, so ids don't create a series each
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    metrics.REQUESTS_IN_FLIGHT.labels(_endpoint_label()).inc()
+
+
+@app.after_request
+def finish_request_metrics(response):
+    metrics.REQUEST_SECONDS.labels(_endpoint_label(), request.method, str(response.status_code)).observe(
+        time.perf_counter() - g.request_started)
+    if request.headers.get("X-Trace-Id"):
+        response.headers["X-Trace-Id"] = request.headers["X-Trace-Id"]
+    return response
+
+
+@app.teardown_request
+def end_request_metrics(exc):
+    if "request_started" in g:
+        metrics.REQUESTS_IN_FLIGHT.labels(_endpoint_label()).dec()
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Prometheus text exposition of request, stage, error and in-flight metrics."""
+    stats = measurement_scheduler.stats()
+    metrics.MEASUREMENTS_RUNNING.set(stats["running"])
+    metrics.MEASUREMENT_QUEUE_DEPTH.set(stats["queue_depth"])
+    nodes = node_registry.stats()
+    metrics.MEASUREMENT_NODES.labels("healthy").set(nodes["healthy"])
+    metrics.MEASUREMENT_NODES.labels("unhealthy").set(len(nodes["nodes"]) - nodes["healthy"])
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
+
+
 @app.route("/ping", methods=["GET"])
 def ping():
+    """Liveness: the process is up and serving requests."""
     return jsonify({"status": "pong", "message": "Backend is running"}), 200
 
 
+@app.route("/ready", methods=["GET"])
+def ready():
+    """Readiness: which subsystems are warm. Returns 503 until all of them are."""
+    status = readiness.status()
+    return jsonify(status), 200 if status["ready"] else 503
+
+
+@app.route("/startup", methods=["GET"])
+def startup():
+    return jsonify(startup_report.to_dict()), 200
+
+
+@app.route("/scheduler", methods=["GET"])
+def scheduler_stats():
+    return jsonify({"measurements": measurement_scheduler.stats(), "jobs": job_manager.stats(),
+                    "isolation": {"default": ISOLATION_MODE, **core_pool.stats()} if core_pool else None}), 200
+
+
+@app.route("/calibration", methods=["GET"])
+def calibration():
+    meter = get_energy_meter()
+    return jsonify(meter.to_dict()), 200
+
+
+@app.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    return jsonify({
+        "llm": completion_cache.stats(),
+        "build": build_cache.stats(),
+        "measurements": measurement_cache.stats() if measurement_cache else None,
+        "python_workers": python_pool.stats() if python_pool else None
+    }), 200
+
+
+# ====================== Request Handlers ======================
+class RequestError(Exception):
+    """Invalid request; carries the HTTP status to return."""
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class MeasurementTimeout(RequestError):
+    """The measured code did not finish within its time limit; reported instead of a 0.0 CO2 figure."""
+    def __init__(self, message):
+        super().__init__(message, 504)
+
+
+def is_hub_error(e: Exception) -> bool:
+    # Only loaded once the client exists, so there is nothing to check before that
+    if "huggingface_hub" not in sys.modules:
+        return False
+    from huggingface_hub.utils import HfHubHTTPError
+    return isinstance(e, HfHubHTTPError)
+
+
+def describe_error(e: Exception) -> str:
+    if isinstance(e, (RequestError, SchedulerSaturated)):
+        return str(e)
+    if is_hub_error(e):
+        return f"Hugging Face Hub API error: {str(e)}"
+    return f"An unexpected error occurred: {str(e)}"
+
+
+def _no_progress(stage, **partial):
+    pass
+
+
+def validate_codegen_request(data: dict):
+    if not data.get("prompt", ""):
+        raise RequestError("No prompt provided")
+    if not HF_TOKEN and client is None:
+        raise RequestError("Hugging Face API token not set.", 500)
+
+
+def validate_optimize_request(data: dict):
+    if not data.get("code", ""):
+        raise RequestError("No code provided for optimization")
+    candidates = data.get("candidates", 1)
+    if not isinstance(candidates, int) or isinstance(candidates, bool) or not 1 <= candidates <= OPTIMIZE_MAX_CANDIDATES:
+        raise RequestError(f"'candidates' must be an integer from 1 to {OPTIMIZE_MAX_CANDIDATES}")
+    if not HF_TOKEN and client is None:
+        raise RequestError("Hugging Face API token not set.", 500)
+
+
+def saturated_response(e: SchedulerSaturated):
+    response = jsonify({"error": str(e), "retry_after": e.retry_after})
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response, 429
+
+
+def in_background(handler):
+    """Wrap a handler for queued work (jobs, batches): wait for measurement slots instead of rejecting."""
+    def run(data, progress=_no_progress, on_token=None):
+        with measurement_scheduler.waiting():
+            return handler(data, progress, on_token)
+    return run
+
+
+def instrumented(stage_name: str):
+    """
+    Time a request handler as one stage, attributing the stages it runs to a per-request trace.
+    The trace (id and stage timings) is added to the result when the request sets "trace" or "trace_id".
+    """
+    def wrap(handler):
+        @functools.wraps(handler)
+        def run(data, progress=_no_progress, on_token=None):
+            trace_id = data.get("trace_id")
+            trace = metrics.Trace(str(trace_id)[:128] if trace_id else None)
+            with metrics.tracing(trace), metrics.stage(stage_name, str(data.get("language", "python"))):
+                result = handler(data, progress, on_token)
+            if data.get("trace") or trace_id:
+                result["trace"] = trace.to_dict()
+            return result
+        return run
+    return wrap
+
+
+def request_data() -> dict:
+    """The JSON body, taking the trace id from the X-Trace-Id header when the body has none."""
+    data = request.json or {}
+    if request.headers.get("X-Trace-Id") and isinstance(data, dict) and "trace_id" not in data:
+        data["trace_id"] = request.headers["X-Trace-Id"]
+    return data
+
+
+def record_run(run_type: str, language: str, **fields):
+    """Persist a run to the history store; history failures never fail the request."""
+    try:
+        return history_store.record(run_type, language, **fields)
+    except Exception as e:
+        print(f"Could not record run history: {e}")
+        return None
+
+
+@instrumented("codegen")
+def generate_code(data: dict, progress=_no_progress, on_token=None) -> dict:
+    """Generate code with the LLM and measure it. Shared by /codegen and background jobs."""
+    validate_codegen_request(data)
+    prompt = data.get("prompt", "")
+    language = data.get("language", "python")
+    bypass_cache = bool(data.get("bypass_cache", False))
+
+    system_prompt = (f"You are a {language} coding assistant. Reply with one complete, runnable {language} code block "
+                     f"(imports, definitions and a main entry point) with the best time and space complexity and low "
+                     f"energy use. No comments or explanations.")
+    full_prompt = f"Generate a {language} function that {prompt}."
+
+    progress("llm")
+    content, request_time, cached, usage = cached_chat_completion(
+        system_prompt, full_prompt, language, bypass_cache, on_token,
+        max_tokens=output_token_budget(language, LLM_MAX_TOKENS_BY_LANGUAGE, LLM_MAX_TOKENS, ceiling=LLM_MAX_TOKENS_CEILING))
+    reject_truncated(usage)
+    code = clean_code(content)
+
+    # Cached completions cost no new inference
+    llm_co2_kg = 0.0 if cached else estimate_llm_co2(request_time)
+    progress("measure", code=code, llm_co2_kg=llm_co2_kg, cached=cached)
+
+    test_params = {key: bool(data[key]) for key in ("isolate", "complexity", "remeasure") if key in data}
+    execution_co2_kg, execution_details = run_code_and_track_emissions(code, test_params, language)
+
+    if not code:
+        code = f"# No {language} code generated."
+
+    run_id = record_run("generation", language, prompt=prompt, output_code=code, cached=cached,
+                        llm_co2_kg=llm_co2_kg, execution_co2_kg=execution_co2_kg, details=execution_details)
+
+    return {
+        "code": code,
+        "llm_co2_kg": llm_co2_kg,
+        "execution_co2_kg": execution_co2_kg,
+        "total_co2_kg": llm_co2_kg + execution_co2_kg,
+        "execution_details": execution_details,
+        "llm": usage,
+        "cached": cached,
+        "run_id": run_id
+    }
+
+
+def memory_delta(before_details: dict, after_details: dict) -> dict:
+    """After-minus-before for every memory figure both measurements report (negative = saved)."""
+    before = before_details.get("memory") or {}
+    after = after_details.get("memory") or {}
+    return {key: after[key] - before[key] for key in after
+            if isinstance(after[key], (int, float)) and isinstance(before.get(key), (int, float))}
+
+
+def generate_candidates(system_prompt: str, user_prompt: str, language: str, bypass_cache: bool, count: int,
+                        max_tokens=None) -> list:
+    """Ask the model for `count` rewrites concurrently, at temperatures spread over CANDIDATE_TEMPERATURE_RANGE."""
+    low, high = CANDIDATE_TEMPERATURE_RANGE
+    temperatures = [low + (high - low) * i / (count - 1) for i in range(count)] if count > 1 else [low]
+
+    def ask(index):
+        candidate = {"index": index, "temperature": temperatures[index], "code": "", "llm_co2_kg": 0.0,
+                     "cached": False, "usage": None, "status": None, "error": None}
+        try:
+            content, request_time, cached, usage = cached_chat_completion(
+                system_prompt, user_prompt, language, bypass_cache, temperature=temperatures[index],
+                max_tokens=max_tokens)
+        except Exception as e:
+            candidate.update(status="failed", error=describe_error(e))
+            return candidate
+        candidate.update(code=clean_code(content), cached=cached, usage=usage,
+                         llm_co2_kg=0.0 if cached else estimate_llm_co2(request_time))
+        if usage.get("truncated"):
+            candidate.update(status="failed", error=f"Completion cut off at {max_tokens} tokens")
+        return candidate
+
+    with ThreadPoolExecutor(max_workers=count, thread_name_prefix="codeleaf-candidate") as pool:
+        candidates = list(pool.map(metrics.traced(ask), range(count)))
+    if all(c["status"] == "failed" for c in candidates):
+        raise RuntimeError(candidates[0]["error"])
+    return candidates
+
+
+def rank_candidates(candidates: list, test_params: dict, language: str, before_details: dict) -> list:
+    """
+    Measure candidates in parallel (bounded by the measurement slots) and rank the survivors by CO2.
+    A candidate is discarded when it fails to run or its output differs from the original's on the same inputs.
+    The return value is left out of the check when the original's own changed between two runs, and the
+    check is skipped when its stdout did too.
+    """
+    digest_key = "output_digest"
+    if before_details.get("output_stable") is False:
+        digest_key = "stdout_digest" if before_details.get("stdout_stable") is not False else None
+    reference = before_details.get(digest_key) if digest_key else None
+
+    def measure(candidate):
+        if candidate["status"] == "failed":
+            return
+        if not candidate["code"].strip():
+            candidate.update(status="failed", error="Empty completion")
+            return
+        # Part of an admitted request: queue for slots rather than reject
+        try:
+            with measurement_scheduler.waiting():
+                co2_kg, details = run_code_and_track_emissions(candidate["code"], test_params, language)
+        except MeasurementTimeout as e:
+            candidate.update(status="failed", error=str(e))
+            return
+        candidate.update(co2_kg=co2_kg, details=details)
+        if details.get("errors"):
+            candidate.update(status="failed", error=details["errors"][0])
+        elif reference and details.get(digest_key) != reference:
+            candidate.update(status="output_mismatch", error="Output differs from the original code")
+        else:
+            candidate["status"] = "ok"
+
+    with ThreadPoolExecutor(max_workers=len(candidates), thread_name_prefix="codeleaf-candidate") as pool:
+        list(pool.map(metrics.traced(measure), candidates))
+
+    ranked = sorted(candidates, key=lambda c: (c["status"] != "ok", c.get("co2_kg", math.inf)))
+    for rank, candidate in enumerate(ranked, 1):
+        candidate["rank"] = rank if candidate["status"] == "ok" else None
+    return ranked
+
+
+def merge_usage(usages: list) -> dict:
+    """One usage summary for completions requested concurrently (best-of-N): summed tokens, mean tokens/s."""
+    usages = [u for u in usages if u]
+    rates = [u["tokens_per_s"] for u in usages if u.get("tokens_per_s")]
+    counted = [u for u in usages if u.get("completion_tokens") is not None]
+    return {
+        "max_tokens": usages[0]["max_tokens"] if usages else None,
+        "prompt_tokens": sum(u["prompt_tokens"] for u in counted) if counted else None,
+        "completion_tokens": sum(u["completion_tokens"] for u in counted) if counted else None,
+        "estimated": any(u.get("estimated") for u in counted),
+        "tokens_per_s": statistics.fmean(rates) if rates else None,
+        "truncated": any(u.get("truncated") for u in usages)
+    }
+
+
+def candidate_table(ranked: list) -> list:
+    """Ranked candidates without their full measurement details, for the response and history."""
+    return [{
+        "rank": c["rank"],
+        "index": c["index"],
+        "temperature": c["temperature"],
+        "status": c["status"],
+        "co2_kg": c.get("co2_kg"),
+        "host": measurement_host(c.get("details") or {}),
+        "mean_s": ((c.get("details") or {}).get("benchmark") or {}).get("mean_s"),
+        "peak_rss_kb": ((c.get("details") or {}).get("memory") or {}).get("peak_rss_kb"),
+        "llm_co2_kg": c["llm_co2_kg"],
+        "completion_tokens": (c.get("usage") or {}).get("completion_tokens"),
+        "tokens_per_s": (c.get("usage") or {}).get("tokens_per_s"),
+        "cached": c["cached"],
+        "error": c["error"],
+        "code": c["code"]
+    } for c in ranked]
+
+
+def flag_label(flags: list) -> str:
+    return " ".join(flags) or "-O0"
+
+
+def measure_c_build(build: dict, test_params: dict, isolation=None) -> dict:
+    """One row of a flag exploration: a build and, when it compiled, its measurement."""
+    row = {"compile_time_s": build["compile_time_s"], "build_cache_hit": build["cache_hit"],
+           "binary_bytes": os.path.getsize(build["exe_path"]) if build["exe_path"] else None,
+           "co2_kg": None, "energy_j": None, "mean_s": None, "rel_ci95": None, "output_digest": None,
+           "status": "failed", "error": None}
+    if build["exe_path"] is None:
+        row["error"] = f"Compilation failed: {build['error']}"
+        return row
+    try:
+        co2_kg, details = universal_emissions_tracker([build["exe_path"]], test_params.get("benchmark"), isolation)
+    except MeasurementTimeout as e:
+        row["error"] = str(e)
+        return row
+    bench = details.get("benchmark") or {}
+    row.update(co2_kg=co2_kg, energy_j=(details.get("resource_usage") or {}).get("energy_j_mean"),
+               mean_s=bench.get("mean_s"), rel_ci95=bench.get("rel_ci95"), output_digest=details.get("output_digest"))
+    if details.get("errors"):
+        row["error"] = details["errors"][0]
+    else:
+        row["status"] = "ok"
+    return row
+
+
+def explore_c_flags(code: str, test_params: dict, rewritten_code=None) -> dict:
+    """
+    Build C code at every flag set in C_FLAG_SETS in parallel, then measure each build on the usual
+    benchmarking path, one after another within one measurement slot so they share conditions.
+    Builds whose output differs from the baseline (first) flag set are not recommended.
+    With `rewritten_code` (the LLM rewrite), the rewrite is measured in the same pass, at the baseline
+    and the best flags, and a "recommendation" picks the greenest of the four combinations.
+    """
+    code = clean_code(code)
+    flag_sets = [flags.split() for flags in C_FLAG_SETS]
+    with ThreadPoolExecutor(max_workers=len(flag_sets), thread_name_prefix="codeleaf-build") as pool:
+        builds = list(pool.map(metrics.traced(lambda flags: build_c(code, C_COMPILE_FLAGS + flags)), flag_sets))
+    rewrite = clean_code(rewritten_code) if rewritten_code and clean_code(rewritten_code) != code else None
+
+    configurations = []
+    rewrite_rows = {}
+    with measurement_scheduler.slot():
+        isolate = test_params.get("isolate", ISOLATION_MODE) and core_pool is not None
+        with core_pool.lease() if isolate else contextlib.nullcontext() as isolation, \
+                metrics.stage("compiler_flags", "c"):
+            for flags, build in zip(flag_sets, builds):
+                configurations.append({"flags": flag_label(flags), **measure_c_build(build, test_params, isolation)})
+
+            baseline = configurations[0]
+            for config in configurations[1:]:
+                if config["status"] == "ok" and baseline["output_digest"] and config["output_digest"] != baseline["output_digest"]:
+                    config.update(status="output_mismatch", error="Output differs from the baseline build")
+            ranked = sorted((c for c in configurations if c["status"] == "ok"), key=lambda c: c["co2_kg"])
+            best = ranked[0] if ranked else None
+
+            if rewrite is not None:
+                # Same slot, cores and limits as the configurations it is compared with
+                rewrite_rows["rewrite"] = measure_c_build(build_c(rewrite, C_COMPILE_FLAGS + flag_sets[0]),
+                                                          test_params, isolation)
+                if best is not None and best is not baseline:
+                    best_flags = flag_sets[configurations.index(best)]
+                    rewrite_rows["rewrite_with_flags"] = measure_c_build(
+                        build_c(rewrite, C_COMPILE_FLAGS + best_flags), test_params, isolation)
+
+    for config in configurations:
+        config["rank"] = None
+        config["co2_vs_baseline"] = (config["co2_kg"] / baseline["co2_kg"]
+                                     if config["co2_kg"] is not None and baseline["co2_kg"] else None)
+    for rank, config in enumerate(ranked, 1):
+        config["rank"] = rank
+    exploration = {
+        "baseline": baseline["flags"],
+        "recommended": best["flags"] if best else None,
+        "recommended_co2_kg": best["co2_kg"] if best else None,
+        "speedup_vs_baseline": (baseline["mean_s"] / best["mean_s"]
+                                if best and best["mean_s"] and baseline["status"] == "ok" else None),
+        "configurations": configurations
+    }
+    if rewritten_code is not None:
+        exploration["recommendation"] = recommend_c_strategy(exploration, rewrite_rows)
+    return exploration
+
+
+def recommend_c_strategy(exploration: dict, rewrite_rows: dict) -> dict:
+    """
+    Which to use: the original code at the baseline flags, the original at the best flags, the
+    rewrite at the baseline flags, or the rewrite at the best flags. Every figure comes from the
+    same exploration pass; a rewrite whose output differs from the baseline build is left out.
+    """
+    baseline = exploration["configurations"][0]
+    options = {}
+    if baseline["status"] == "ok":
+        options["original"] = baseline["co2_kg"]
+    if exploration.get("recommended") and exploration["recommended"] != baseline["flags"]:
+        options["flags"] = exploration["recommended_co2_kg"]
+    for name, row in rewrite_rows.items():
+        if row["status"] == "ok" and (not baseline["output_digest"] or row["output_digest"] == baseline["output_digest"]):
+            options[name] = row["co2_kg"]
+    if not options:
+        return {"choice": None, "flags": None, "co2_kg": {}}
+    choice = min(options, key=options.get)
+    return {"choice": choice, "flags": exploration["recommended"] if choice in ("flags", "rewrite_with_flags") else None,
+            "co2_kg": options}
+
+
+@instrumented("optimize")
+def optimize_code(data: dict, progress=_no_progress, on_token=None) -> dict:
+    """Measure, optimize with the LLM, and re-measure. Shared by /optimize and background jobs."""
+    validate_optimize_request(data)
+    unoptimized_code = data.get("code", "")
+    language = data.get("language", "python")
+    bypass_cache = bool(data.get("bypass_cache", False))
+
+    test_case_params = {"function_name": "find_first_occurrence", "data_size": 1000000}
+    for key in ("isolate", "complexity", "remeasure"):
+        if key in data:
+            test_case_params[key] = bool(data[key])
+    progress("measure_before")
+    co2_before_kg, before_details = run_code_and_track_emissions(unoptimized_code, test_case_params, language)
+    # Measure the rewrites on the same node (or locally) and at the same input size as the original,
+    # so the numbers compare the same workload
+    test_case_params["node"] = measurement_host(before_details)
+    test_case_params["data_size"] = (before_details.get("data_size") or {}).get("measured", test_case_params["data_size"])
+    test_case_params["probe"] = False
+
+    remeasured_from = None
+
+    def measure_original_here():
+        # The original's node couldn't take the rewrite, which then ran here: so does the original
+        nonlocal co2_before_kg, before_details, remeasured_from
+        remeasured_from = measurement_host(before_details)
+        progress("measure_before")
+        co2_before_kg, before_details = run_code_and_track_emissions(unoptimized_code,
+                                                                     {**test_case_params, "node": "local"}, language)
+
+    hotspots = None
+    if data.get("profile", HOTSPOT_PROFILE):
+        progress("profile", before_co2=co2_before_kg, before_details=before_details)
+        with metrics.stage("profile", language):
+            hotspots = profile_hotspots(unoptimized_code, test_case_params, language)
+    # The model sees the code minified; hotspot line numbers are moved to match
+    compact = data.get("compact_prompt", PROMPT_COMPACTION)
+    prompt_code, line_map = minify_code(unoptimized_code, language) if compact else (unoptimized_code, None)
+    hotspot_notes = format_hotspots(renumber_hotspots(hotspots, line_map))
+
+    optimization_prompt = (f"Optimize this {language} code to cut its energy use and CO2 footprint, with the best "
+                           f"time and space complexity. Reply with only the complete, runnable optimized code in one "
+                           f"code block, without comments or explanations.\n```{language}\n{prompt_code}\n```\n")
+    if hotspot_notes:
+        optimization_prompt += hotspot_notes + "\n"
+    prompt_chars_saved = max(len(unoptimized_code) - len(prompt_code), 0)
+    metrics.PROMPT_CHARS_SAVED.inc(prompt_chars_saved)
+    max_tokens = output_token_budget(language, LLM_MAX_TOKENS_BY_LANGUAGE, LLM_MAX_TOKENS, code=prompt_code,
+                                     ceiling=LLM_MAX_TOKENS_CEILING)
+
+    system_prompt = f"You are a skilled {language} code optimizer. Respond with the optimized code."
+    progress("llm", before_co2=co2_before_kg, before_details=before_details, hotspots=hotspots)
+    candidate_count = data.get("candidates", 1)
+    candidates = selected_candidate = None
+    if candidate_count > 1:
+        # Best-of-N: keep the greenest candidate that runs and matches the original's output,
+        # or the original itself when no candidate beats it
+        generated = generate_candidates(system_prompt, optimization_prompt, language, bypass_cache, candidate_count,
+                                        max_tokens)
+        llm_co2_kg = sum(c["llm_co2_kg"] for c in generated)
+        usage = merge_usage([c["usage"] for c in generated])
+        cached = all(c["cached"] for c in generated)
+        progress("measure_after", llm_co2_kg=llm_co2_kg, cached=cached)
+        entry_point = before_details.get("entry_point")
+        candidate_params = {**test_case_params, "function_name": entry_point["name"]} if entry_point else test_case_params
+        ranked = rank_candidates(generated, candidate_params, language, before_details)
+        best = ranked[0] if ranked[0]["status"] == "ok" else None
+        if best is not None and measurement_host(best["details"]) != measurement_host(before_details):
+            measure_original_here()
+        if best is not None and best["co2_kg"] < co2_before_kg:
+            code_raw, co2_after_kg, after_details = best["code"], best["co2_kg"], best["details"]
+            selected_candidate = best["index"]
+        else:
+            code_raw, co2_after_kg, after_details = unoptimized_code, co2_before_kg, before_details
+        candidates = candidate_table(ranked)
+    else:
+        content, request_time, cached, usage = cached_chat_completion(system_prompt, optimization_prompt, language,
+                                                                      bypass_cache, on_token, max_tokens=max_tokens)
+        reject_truncated(usage)
+        code_raw = clean_code(content)
+
+        # Cached completions cost no new inference
+        llm_co2_kg = 0.0 if cached else estimate_llm_co2(request_time)
+        progress("measure_after", optimized_code=code_raw, llm_co2_kg=llm_co2_kg, cached=cached)
+
+        co2_after_kg, after_details = run_code_and_track_emissions(code_raw, test_case_params, language)
+        if measurement_host(after_details) != measurement_host(before_details):
+            measure_original_here()
+
+    compiler_flags = None
+    if language.lower() == "c" and data.get("compiler_flags", C_FLAG_EXPLORER):
+        # The cheapest win may be the build flags rather than (or as well as) the rewrite
+        progress("compiler_flags", optimized_code=code_raw, after_co2=co2_after_kg, after_details=after_details)
+        compiler_flags = explore_c_flags(unoptimized_code, test_case_params, rewritten_code=code_raw)
+
+    usage.update(prompt_chars=len(system_prompt) + len(optimization_prompt), prompt_chars_saved=prompt_chars_saved,
+                 code_minified=line_map is not None)
+
+    run_id = record_run("optimization", language, input_code=unoptimized_code, output_code=code_raw, cached=cached,
+                        llm_co2_kg=llm_co2_kg, before_co2=co2_before_kg, after_co2=co2_after_kg,
+                        details={"before": before_details, "after": after_details, "hotspots": hotspots,
+                                 "candidates": candidates, "compiler_flags": compiler_flags, "llm": usage})
+
+    return {
+        "optimized_code": code_raw,
+        "before_co2": co2_before_kg,
+        "after_co2": co2_after_kg,
+        "llm_co2_kg": llm_co2_kg,
+        "before_details": before_details,
+        "after_details": after_details,
+        # Whether the runtime change is outside the measurement noise
+        "comparison": {**compare_benchmarks(before_details.get("benchmark"), after_details.get("benchmark")),
+                       "host": measurement_host(after_details), "original_remeasured_from": remeasured_from},
+        "memory_delta": memory_delta(before_details, after_details),
+        "hotspots": hotspots,
+        "candidates": candidates,
+        "selected_candidate": selected_candidate,
+        "compiler_flags": compiler_flags,
+        "llm": usage,
+        "cached": cached,
+        "run_id": run_id
+    }
+
+
+job_manager = JobManager(
+    handlers={"codegen": in_background(generate_code), "optimize": in_background(optimize_code)},
+    max_workers=int(os.getenv("JOB_WORKERS", "4")),
+    retention_seconds=int(os.getenv("JOB_RETENTION_SECONDS", "3600")),
+    format_error=describe_error,
+    max_pending=int(os.getenv("JOB_MAX_PENDING", "100")),
+    store=JobStore(os.getenv("JOB_STORE_PATH", DEFAULT_JOB_STORE_PATH))
+)
+JOB_VALIDATORS = {"codegen": validate_codegen_request, "optimize": validate_optimize_request}
+
+
 @app.route("/codegen", methods=["POST"])
 def codegen():
     try:
-        data = request.json or {}
-        prompt = data.get("prompt", "")
-        language = data.get("language", "python")
-
-        if not prompt:
-            return jsonify({"error": "No prompt provided"}), 400
-        if client is None:
-            return jsonify({"error": "Hugging Face API token not set."}), 500
-
-        system_prompt = f"You are a helpful {language} coding assistant. Generate clear, concise, carbon and power efficient short code. Provide only the code block with best case time and space complexity with proper executable format. Do not include any comments or explanations.Generate full code with necessary imports and definitions like main() dont just generate function definitions only."
-        full_prompt = f"Generate a {language} function that {prompt}."
-
-        start_time = time.time()
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": full_prompt}
-        ]
-        result = client.chat_completion(messages=messages)
-        request_time = time.time() - start_time
-
-        code = clean_code(result.choices[0].message.content)
-
-        # Estimate LLM CO2
-        cpu_count = psutil.cpu_count(logical=True)
-        cpu_power_w = 45 * 0.03
-        gpu_power_w = 300 * 0.03
-        energy_kwh = ((cpu_power_w * cpu_count) + gpu_power_w) * request_time / 3600
-        llm_co2_kg = energy_kwh * 0.475
-
-        execution_co2_kg = run_code_and_track_emissions(code, {}, language)
-
-        if not code:
-            code = f"# No {language} code generated."
-
-        return jsonify({
-            "code": code,
-            "llm_co2_kg": llm_co2_kg,
-            "execution_co2_kg": execution_co2_kg,
-            "total_co2_kg": llm_co2_kg + execution_co2_kg
-        })
-
-    except HfHubHTTPError as e:
-        return jsonify({"error": f"Hugging Face Hub API error: {str(e)}"}), 500
+        return jsonify(generate_code(request_data()))
+    except RequestError as e:
+        return jsonify({"error": str(e)}), e.status
+    except SchedulerSaturated as e:
+        return saturated_response(e)
     except Exception as e:
-        print(traceback.format_exc())
-        return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
+        if not is_hub_error(e):
+            print(traceback.format_exc())
+        return jsonify({"error": describe_error(e)}), 500
 
 
 @app.route("/optimize", methods=["POST"])
 def optimize():
     try:
-        data = request.json or {}
-        unoptimized_code = data.get("code", "")
-        language = data.get("language", "python")
-
-        if not unoptimized_code:
-            return jsonify({"error": "No code provided for optimization"}), 400
-        if client is None:
-            return jsonify({"error": "Hugging Face API token not set."}), 500
-
-        test_case_params = {"function_name": "find_first_occurrence", "data_size": 1000000}
-        co2_before_kg = run_code_and_track_emissions(unoptimized_code, test_case_params, language)
-
-        optimization_prompt = f"""
-The following {language} code is inefficient. Provide an optimized version that reduces energy consumption and CO2 footprint with best-case space and time complexity but without any comments and in proper executable format without any extra text and explanations."
-Unoptimized code:
-{language} {unoptimized_code}
-Provide only the optimized {language} code.
-"""
-
-        start_time = time.time()
-        messages = [
-            {"role": "system", "content": f"You are a skilled {language} code optimizer. Respond with the optimized code."},
-            {"role": "user", "content": optimization_prompt}
-        ]
-        result = client.chat_completion(messages=messages)
-        request_time = time.time() - start_time
-
-        code_raw = clean_code(result.choices[0].message.content)
-
-        # Estimate LLM CO2
-        cpu_count = psutil.cpu_count(logical=True)
-        cpu_power_w = 45 * 0.03
-        gpu_power_w = 300 * 0.03
-        energy_kwh = ((cpu_power_w * cpu_count) + gpu_power_w) * request_time / 3600
-        llm_co2_kg = energy_kwh * 0.475
-
-        co2_after_kg = run_code_and_track_emissions(code_raw, test_case_params, language)
-
-        return jsonify({
-            "optimized_code": code_raw,
-            "before_co2": co2_before_kg,
-            "after_co2": co2_after_kg,
-            "llm_co2_kg": llm_co2_kg
-        })
-
-    except HfHubHTTPError as e:
-        return jsonify({"error": f"Hugging Face Hub API error: {str(e)}"}), 500
+        return jsonify(optimize_code(request_data()))
+    except RequestError as e:
+        return jsonify({"error": str(e)}), e.status
+    except SchedulerSaturated as e:
+        return saturated_response(e)
     except Exception as e:
-        print(traceback.format_exc())
-        return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
+        if not is_hub_error(e):
+            print(traceback.format_exc())
+        return jsonify({"error": describe_error(e)}), 500
+
+
+@app.route("/compile/explore", methods=["POST"])
+def compile_explore():
+    """Flag exploration for a C snippet on its own, without an LLM rewrite."""
+    data = request_data()
+    if not isinstance(data, dict) or not isinstance(data.get("code"), str) or not data["code"].strip():
+        return jsonify({"error": "'code' must be a non-empty string"}), 400
+    test_params = {key: bool(data[key]) for key in ("isolate",) if key in data}
+    try:
+        return jsonify(explore_c_flags(data["code"], test_params)), 200
+    except SchedulerSaturated as e:
+        return saturated_response(e)
+
+
+# ====================== Streaming Endpoints ======================
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def stream_handler(handler, data: dict) -> Response:
+    """
+    Run a request handler on a background thread and forward its tokens and
+    stage changes as server-sent events. The last event is `done` (final payload)
+    or `error`. Work stops at the next token or stage once the client disconnects.
+    """
+    events = queue.Queue()
+    closed = threading.Event()
+    start_time = time.time()
+    first_token_time = []
+
+    def progress(stage, **partial):
+        if closed.is_set():
+            raise JobCancelled()
+        events.put(("stage", {"stage": stage, **partial}))
+
+    def on_token(text):
+        if closed.is_set():
+            raise JobCancelled()
+        if not first_token_time:
+            first_token_time.append(time.time() - start_time)
+        events.put(("token", {"text": text}))
+
+    def run():
+        try:
+            result = handler(data, progress, on_token)
+            result["time_to_first_token_s"] = first_token_time[0] if first_token_time else None
+            events.put(("done", result))
+        except JobCancelled:
+            pass
+        except SchedulerSaturated as e:
+            events.put(("error", {"error": describe_error(e), "retry_after": e.retry_after}))
+        except Exception as e:
+            print(traceback.format_exc())
+            events.put(("error", {"error": describe_error(e)}))
+        finally:
+            events.put(None)
+
+    threading.Thread(target=run, daemon=True).start()
+
+    def generate():
+        try:
+            while True:
+                item = events.get()
+                if item is None:
+                    break
+                yield sse_event(*item)
+        finally:
+            closed.set()
+
+    return Response(generate(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.route("/codegen/stream", methods=["POST"])
+def codegen_stream():
+    data = request_data()
+    try:
+        validate_codegen_request(data)
+    except RequestError as e:
+        return jsonify({"error": str(e)}), e.status
+    return stream_handler(generate_code, data)
+
+
+@app.route("/optimize/stream", methods=["POST"])
+def optimize_stream():
+    data = request_data()
+    try:
+        validate_optimize_request(data)
+    except RequestError as e:
+        return jsonify({"error": str(e)}), e.status
+    return stream_handler(optimize_code, data)
+
+
+# ====================== Batch Endpoints ======================
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+BATCH_MEASURE_CONCURRENCY = int(os.getenv("BATCH_MEASURE_CONCURRENCY", str(psutil.cpu_count(logical=False) or 1)))
+BATCH_STAGE_GROUPS = {"llm": "llm", "measure": "measure", "measure_before": "measure", "profile": "measure",
+                      "measure_after": "measure", "compiler_flags": "measure"}
+
+
+def batch_totals(kind: str, results) -> dict:
+    """
+    Aggregate CO2 figures over the successful items of a batch. Duplicate items share
+    one run (and one result), so each distinct run is counted once.
+    """
+    results = list({id(r): r for r in results}.values())
+    totals = {"llm_co2_kg": sum(r["llm_co2_kg"] for r in results)}
+    if kind == "optimize":
+        totals["before_co2"] = sum(r["before_co2"] for r in results)
+        totals["after_co2"] = sum(r["after_co2"] for r in results)
+        totals["co2_saved"] = totals["before_co2"] - totals["after_co2"]
+    else:
+        totals["execution_co2_kg"] = sum(r["execution_co2_kg"] for r in results)
+        totals["total_co2_kg"] = totals["llm_co2_kg"] + totals["execution_co2_kg"]
+    return totals
+
+
+def batch_response(kind: str, handler):
+    """
+    Stream one NDJSON line per input item as it finishes, then a summary line.
+    Identical items run once; LLM calls and measurements have separate concurrency caps.
+    """
+    data = request.json or {}
+    items = data.get("items")
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Provide a non-empty 'items' list"}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"Too many items: {len(items)} (max {BATCH_MAX_ITEMS})"}), 400
+    if not HF_TOKEN and client is None:
+        return jsonify({"error": "Hugging Face API token not set."}), 500
+
+    defaults = {key: data[key] for key in ("language", "bypass_cache") if key in data}
+    items = [{**defaults, **item} if isinstance(item, dict) else {} for item in items]
+    limiter = StageLimiter({"llm": BATCH_LLM_CONCURRENCY, "measure": BATCH_MEASURE_CONCURRENCY}, BATCH_STAGE_GROUPS)
+    max_workers = BATCH_LLM_CONCURRENCY + BATCH_MEASURE_CONCURRENCY
+
+    def generate():
+        results, failed = [], 0
+        for index, result, error in run_batch(handler, items, limiter, max_workers, describe_error):
+            if error is None:
+                results.append(result)
+                yield json.dumps({"index": index, "ok": True, "result": result}) + "\n"
+            else:
+                failed += 1
+                yield json.dumps({"index": index, "ok": False, "error": error}) + "\n"
+        summary = {"items": len(items), "unique_items": len(dedupe(items)), "succeeded": len(results),
+                   "failed": failed, **batch_totals(kind, results)}
+        yield json.dumps({"summary": summary}) + "\n"
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+
+@app.route("/codegen/batch", methods=["POST"])
+def codegen_batch():
+    return batch_response("codegen", in_background(generate_code))
+
+
+@app.route("/optimize/batch", methods=["POST"])
+def optimize_batch():
+    return batch_response("optimize", in_background(optimize_code))
+
+
+# ====================== History Endpoints ======================
+def history_filters() -> dict:
+    return {
+        "run_type": request.args.get("type") or None,
+        "language": request.args.get("language") or None,
+        "since": parse_time(request.args.get("since")),
+        "until": parse_time(request.args.get("until"))
+    }
+
+
+@app.route("/history", methods=["GET"])
+def history():
+    try:
+        page = history_store.query(
+            page=request.args.get("page", 1),
+            page_size=request.args.get("page_size", 20),
+            include_code=request.args.get("include_code", "").lower() in ("1", "true", "yes"),
+            **history_filters()
+        )
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query parameter: {e}"}), 400
+    return jsonify(page), 200
+
+
+@app.route("/history/<int:run_id>", methods=["GET"])
+def history_run(run_id):
+    record = history_store.get(run_id)
+    if record is None:
+        return jsonify({"error": "Run not found"}), 404
+    return jsonify(record), 200
+
+
+@app.route("/history/rollups", methods=["GET"])
+def history_rollups():
+    granularity = request.args.get("granularity", "daily")
+    if granularity not in ("daily", "weekly"):
+        return jsonify({"error": "granularity must be 'daily' or 'weekly'"}), 400
+    try:
+        rows = history_store.rollups(granularity=granularity, **history_filters())
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query parameter: {e}"}), 400
+    return jsonify({"granularity": granularity, "rollups": rows}), 200
+
+
+@app.route("/history/report/weekly", methods=["GET"])
+def weekly_report():
+    try:
+        return jsonify(history_store.weekly_report(parse_time(request.args.get("at")))), 200
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query parameter: {e}"}), 400
+
+
+# ====================== Job Endpoints ======================
+@app.route("/jobs", methods=["POST"])
+def create_job():
+    data = request_data()
+    kind = data.get("type", "")
+    if kind not in JOB_VALIDATORS:
+        return jsonify({"error": f"Unknown job type: {kind!r}. Use 'codegen' or 'optimize'."}), 400
+    try:
+        JOB_VALIDATORS[kind](data)
+    except RequestError as e:
+        return jsonify({"error": str(e)}), e.status
+    try:
+        job = job_manager.submit(kind, data)
+    except JobQueueFull as e:
+        retry_after = measurement_scheduler.retry_after()
+        response = jsonify({"error": f"Job queue is full: {e}", "retry_after": retry_after})
+        response.headers["Retry-After"] = str(retry_after)
+        return response, 429
+    return jsonify({"id": job.id, "status": job.status}), 202
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found or expired"}), 404
+    return jsonify(job), 200
+
+
+@app.route("/jobs/<job_id>", methods=["DELETE"])
+def cancel_job(job_id):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found or expired"}), 404
+    return jsonify(job), 200
+
+
+# ====================== Measurement Node Endpoints ======================
+def node_denied():
+    """403 response for a node endpoint call without the shared token (or with node mode off), else None."""
+    if NODE_TOKEN is None:
+        return jsonify({"error": "Measurement nodes are disabled; set the same NODE_TOKEN on the server and its nodes"}), 403
+    if not hmac.compare_digest(request.headers.get(NODE_TOKEN_HEADER, ""), NODE_TOKEN):
+        return jsonify({"error": "Invalid node token"}), 403
+    return None
+
+
+def node_info() -> dict:
+    """What this instance advertises when it registers as a measurement node."""
+    return {
+        "url": NODE_PUBLIC_URL,
+        "capacity": MEASURE_SLOTS,
+        "host": {
+            "fingerprint": host_fingerprint(),
+            # Known once the energy meter is calibrated
+            "profile": measurement_host_profile,
+            "cpu_logical": psutil.cpu_count(logical=True),
+            "cpu_physical": psutil.cpu_count(logical=False),
+            "memory_bytes": psutil.virtual_memory().total,
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "compiler": compiler_version(build_cache.compiler)
+        }
+    }
+
+
+@app.route("/nodes", methods=["GET"])
+def list_nodes():
+    return jsonify(node_registry.stats()), 200
+
+
+@app.route("/nodes/register", methods=["POST"])
+def register_node():
+    denied = node_denied()
+    if denied:
+        return denied
+    try:
+        node = node_registry.register(request.json or {})
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"id": node.id, "heartbeat_s": node_registry.heartbeat_s}), 200
+
+
+@app.route("/nodes/<node_id>", methods=["DELETE"])
+def deregister_node(node_id):
+    denied = node_denied()
+    if denied:
+        return denied
+    if not node_registry.deregister(node_id):
+        return jsonify({"error": "Node not found"}), 404
+    return jsonify({"id": node_id, "status": "deregistered"}), 200
+
+
+@app.route("/nodes/measure", methods=["POST"])
+def node_measure():
+    """Measure a job sent by a coordinator, on this host only."""
+    denied = node_denied()
+    if denied:
+        return denied
+    data = request.json or {}
+    if not isinstance(data.get("code"), str) or not isinstance(data.get("test_params", {}), dict):
+        return jsonify({"error": "Provide 'code' and a 'test_params' object"}), 400
+    try:
+        co2_kg, details = run_code_and_track_emissions(data["code"], data.get("test_params", {}),
+                                                       data.get("language", "python"), dispatch=False)
+    except SchedulerSaturated as e:
+        return saturated_response(e)
+    except MeasurementTimeout as e:
+        # The code is too slow, not the node: answer normally so the coordinator doesn't retry elsewhere
+        return jsonify({"timeout": str(e)}), 200
+    return jsonify({"co2_kg": co2_kg, "details": details}), 200
+
+
+# ====================== Warm-up ======================
+def warm_compiler():
+    if not compiler_version(build_cache.compiler):
+        raise RuntimeError(f"{build_cache.compiler} not found")
+    build = build_cache.get_or_build("int main(void) { return 0; }\n", C_COMPILE_FLAGS)
+    if build["exe_path"] is None:
+        raise RuntimeError(build["error"])
+
+
+readiness.register("llm_client", status=PENDING if HF_TOKEN else DISABLED)
+readiness.register("compiler")
+readiness.register("energy_meter")
+readiness.register("python_workers", status=PENDING if python_pool else DISABLED)
+startup_report.mark("app_setup")
+
+# Warm heavy subsystems in the background so the first request doesn't pay for them
+if os.getenv("WARMUP_ON_START", "1") == "1":
+    if HF_TOKEN:
+        readiness.warm("llm_client", get_client)
+    readiness.warm("compiler", warm_compiler)
+    readiness.warm("energy_meter", get_energy_meter)
+    if python_pool:
+        readiness.warm("python_workers", python_pool.wait_ready)
+
+# On a measurement node: register with the coordinator and keep sending heartbeats
+if COORDINATOR_URL and not NODE_TOKEN:
+    print("COORDINATOR_URL is set but NODE_TOKEN is not; not registering as a measurement node")
+elif COORDINATOR_URL:
+    node_agent = NodeAgent(COORDINATOR_URL, node_info, token=NODE_TOKEN,
+                           interval_s=float(os.getenv("NODE_HEARTBEAT_S", "10")))
+    node_agent.start()
+    atexit.register(node_agent.stop)
+
+print(f"CodeLeaf backend start-up timings:\n{startup_report.format()}")
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
+    # Development server only; see the README for running under a production WSGI server
+    app.run(host="0.0.0.0", port=int(os.getenv("PORT", "5000")), debug=os.getenv("FLASK_DEBUG", "0") == "1")
\ No newline at end of file
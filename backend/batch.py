@@ -0,0 +1,61 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# ====================== Batch Processing ======================
+class StageLimiter:
+    """
+    Caps how many items may be in each stage at once (e.g. LLM calls vs measurements).
+    Used as a handler's progress callback: entering a stage releases the slot held
+    for the previous stage and waits for a slot in the new one.
+    """
+
+    def __init__(self, limits: dict, stage_groups: dict):
+        self._semaphores = {group: threading.BoundedSemaphore(limit) for group, limit in limits.items()}
+        self._stage_groups = stage_groups
+        self._held = threading.local()
+
+    def progress(self, stage, **partial):
+        self.release()
+        group = self._stage_groups.get(stage)
+        if group in self._semaphores:
+            self._semaphores[group].acquire()
+            self._held.group = group
+
+    def release(self):
+        group = getattr(self._held, "group", None)
+        if group is not None:
+            self._semaphores[group].release()
+            self._held.group = None
+
+
+def dedupe(items):
+    """Map each distinct item (by canonical JSON) to the indices it appears at."""
+    unique = {}
+    for index, item in enumerate(items):
+        key = json.dumps(item, sort_keys=True)
+        unique.setdefault(key, (item, []))[1].append(index)
+    return list(unique.values())
+
+
+def run_batch(handler, items, limiter: StageLimiter, max_workers: int, format_error=str):
+    """
+    Run handler(item, progress) for every distinct item on a thread pool and
+    yield (index, result, error) for every input index as items finish.
+    One item failing never aborts the others.
+    """
+    def run_one(item):
+        try:
+            return handler(item, limiter.progress), None
+        except Exception as e:
+            return None, format_error(e)
+        finally:
+            limiter.release()
+
+    groups = dedupe(items)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="codeleaf-batch") as executor:
+        futures = {executor.submit(run_one, item): indices for item, indices in groups}
+        for future in as_completed(futures):
+            result, error = future.result()
+            for index in futures[future]:
+                yield index, result, error
@@ -0,0 +1,208 @@
+"""
+Reference snippets for the offline benchmark suite: pairs of an inefficient and an
+efficient version of the same program. The efficient version is what the stub LLM
+returns, so /optimize should always rank it greener than the original.
+Python entries define functions the measurement harness calls with generated inputs;
+C entries are whole programs with a fixed workload.
+"""
+from prompt_prep import minify_code
+
+CORPUS = [
+    {
+        "name": "linear_vs_binary_search",
+        "language": "python",
+        "prompt": "returns the index of the first occurrence of x in a sorted list",
+        "slow": """def find_first_occurrence(arr, n, x):
+    for i in range(n):
+        if arr[i] == x:
+            return i
+    return -1
+""",
+        "fast": """import bisect
+
+def find_first_occurrence(arr, n, x):
+    i = bisect.bisect_left(arr, x, 0, n)
+    return i if i < n and arr[i] == x else -1
+"""
+    },
+    {
+        "name": "recursion_vs_iteration",
+        "language": "python",
+        "prompt": "returns the sum of a list of numbers",
+        "slow": """def total(nums):
+    if len(nums) <= 1:
+        return nums[0] if nums else 0
+    mid = len(nums) // 2
+    return total(nums[:mid]) + total(nums[mid:])
+""",
+        "fast": """def total(nums):
+    result = 0
+    for value in nums:
+        result += value
+    return result
+"""
+    },
+    {
+        "name": "loop_vs_vectorized",
+        "language": "python",
+        "prompt": "returns the sum of the squares of a list of integers",
+        "slow": """def sum_of_squares(nums):
+    total = 0
+    for value in nums:
+        total += value * value
+    return total
+""",
+        "fast": """import numpy as np
+
+def sum_of_squares(nums):
+    values = np.asarray(nums, dtype=np.int64)
+    return int(np.dot(values, values))
+"""
+    },
+    {
+        "name": "list_vs_set_membership",
+        "language": "python",
+        "prompt": "counts how many values of a list are among its first 20 values",
+        "slow": """def count_common(nums):
+    lookup = nums[:20]
+    return sum(1 for value in nums if value in lookup)
+""",
+        "fast": """def count_common(nums):
+    lookup = set(nums[:20])
+    return sum(1 for value in nums if value in lookup)
+"""
+    },
+    {
+        "name": "recursive_vs_iterative_fibonacci",
+        "language": "c",
+        "prompt": "prints the 32nd Fibonacci number",
+        "slow": """#include <stdio.h>
+
+long fib(int n) {
+    return n < 2 ? n : fib(n - 1) + fib(n - 2);
+}
+
+int main(void) {
+    printf("%ld\\n", fib(32));
+    return 0;
+}
+""",
+        "fast": """#include <stdio.h>
+
+int main(void) {
+    long a = 0, b = 1;
+    for (int i = 0; i < 32; i++) {
+        long next = a + b;
+        a = b;
+        b = next;
+    }
+    printf("%ld\\n", a);
+    return 0;
+}
+"""
+    },
+    {
+        "name": "bubble_sort_vs_qsort",
+        "language": "c",
+        "prompt": "sorts 20000 pseudo-random integers and prints the median",
+        "slow": """#include <stdio.h>
+
+#define N 20000
+static int values[N];
+
+int main(void) {
+    unsigned int seed = 42;
+    for (int i = 0; i < N; i++) {
+        seed = seed * 1103515245u + 12345u;
+        values[i] = (int)(seed >> 8);
+    }
+    for (int i = 0; i < N; i++)
+        for (int j = 0; j < N - 1 - i; j++)
+            if (values[j] > values[j + 1]) {
+                int tmp = values[j];
+                values[j] = values[j + 1];
+                values[j + 1] = tmp;
+            }
+    printf("%d\\n", values[N / 2]);
+    return 0;
+}
+""",
+        "fast": """#include <stdio.h>
+#include <stdlib.h>
+
+#define N 20000
+static int values[N];
+
+static int compare(const void *a, const void *b) {
+    int x = *(const int *)a, y = *(const int *)b;
+    return (x > y) - (x < y);
+}
+
+int main(void) {
+    unsigned int seed = 42;
+    for (int i = 0; i < N; i++) {
+        seed = seed * 1103515245u + 12345u;
+        values[i] = (int)(seed >> 8);
+    }
+    qsort(values, N, sizeof(int), compare);
+    printf("%d\\n", values[N / 2]);
+    return 0;
+}
+"""
+    },
+    {
+        "name": "column_vs_row_major",
+        "language": "c",
+        "prompt": "sums a 2000 by 2000 matrix",
+        "slow": """#include <stdio.h>
+
+#define N 2000
+static int matrix[N][N];
+
+int main(void) {
+    long sum = 0;
+    for (int i = 0; i < N; i++)
+        for (int j = 0; j < N; j++)
+            matrix[i][j] = i ^ j;
+    for (int repeat = 0; repeat < 5; repeat++)
+        for (int j = 0; j < N; j++)
+            for (int i = 0; i < N; i++)
+                sum += matrix[i][j];
+    printf("%ld\\n", sum);
+    return 0;
+}
+""",
+        "fast": """#include <stdio.h>
+
+#define N 2000
+static int matrix[N][N];
+
+int main(void) {
+    long sum = 0;
+    for (int i = 0; i < N; i++)
+        for (int j = 0; j < N; j++)
+            matrix[i][j] = i ^ j;
+    for (int repeat = 0; repeat < 5; repeat++)
+        for (int i = 0; i < N; i++)
+            for (int j = 0; j < N; j++)
+                sum += matrix[i][j];
+    printf("%ld\\n", sum);
+    return 0;
+}
+"""
+    }
+]
+
+
+def reply_for(messages) -> str:
+    """
+    Stub LLM policy: answer an optimization prompt with the efficient version of the
+    snippet it contains, and a generation prompt with the matching efficient snippet.
+    """
+    prompt = messages[-1]["content"] if messages else ""
+    for entry in CORPUS:
+        # Optimization prompts carry the snippet minified (or as pasted, with compaction off)
+        if minify_code(entry["slow"], entry["language"])[0] in prompt or entry["slow"].strip() in prompt \
+                or entry["prompt"] in prompt:
+            return f"```{entry['language']}\n{entry['fast']}```"
+    return "```python\ndef dummy_function():\n    return sum(range(1000))\n```"
@@ -0,0 +1,241 @@
+"""
+Offline end-to-end benchmark of the backend.
+
+Starts the stub LLM (stub_llm.py) and the Flask app on local ports with throw-away
+caches, then:
+  1. sends every reference pair in bench_corpus.py through /optimize and checks that
+     the efficient version is ranked greener (before/after CO2 ranking accuracy);
+  2. drives each endpoint with a concurrent load generator and reports throughput,
+     p50/p95/p99 latency and the measurement overhead (time that is neither the LLM
+     nor the measured code itself).
+
+    cd backend
+    python bench_suite.py --requests 20 --concurrency 4 --latency 0.2 --json bench.json
+
+Exits with status 1 when --max-p95-s or --min-accuracy is not met, so CI can gate on it.
+No Hugging Face token or network access is needed.
+"""
+import os
+import sys
+import json
+import math
+import time
+import logging
+import tempfile
+import argparse
+import statistics
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from stub_llm import StubLLM, start_stub_server
+from bench_corpus import CORPUS, reply_for
+
+ENDPOINTS = ("codegen", "optimize")
+
+
+def percentile(values, q: float):
+    """Nearest-rank percentile (q in 0..100), None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(math.ceil(q / 100 * len(ordered)) - 1, 0)]
+
+
+def code_time_s(details: dict) -> float:
+    """Time the measured code itself ran, warm-up runs included."""
+    bench = (details or {}).get("benchmark") or {}
+    return sum(bench.get("samples_s", [])) + sum(bench.get("warmup_samples_s", []))
+
+
+def measurement_details(endpoint: str, body: dict) -> list:
+    if endpoint == "optimize":
+        return [body.get("before_details") or {}, body.get("after_details") or {}]
+    return [body.get("execution_details") or {}]
+
+
+def payload_for(endpoint: str, entry: dict) -> dict:
+    # Every request pays for a real completion and real measurements
+    if endpoint == "optimize":
+        return {"code": entry["slow"], "language": entry["language"], "bypass_cache": True, "remeasure": True}
+    return {"prompt": entry["prompt"], "language": entry["language"], "bypass_cache": True, "remeasure": True}
+
+
+def timed_post(base_url: str, endpoint: str, payload: dict, timeout: float):
+    start = time.perf_counter()
+    try:
+        r = requests.post(f"{base_url}/{endpoint}", json=payload, timeout=timeout)
+        body = r.json() if r.headers.get("Content-Type", "").startswith("application/json") else {}
+        status = r.status_code
+    except requests.RequestException as e:
+        body, status = {"error": str(e)}, None
+    return status, body, time.perf_counter() - start
+
+
+def run_accuracy(base_url: str, timeout: float) -> dict:
+    """Each reference pair once, sequentially: is the efficient version measured as greener?"""
+    rows = []
+    for entry in CORPUS:
+        status, body, latency = timed_post(base_url, "optimize", payload_for("optimize", entry), timeout)
+        correct = status == 200 and body["after_co2"] < body["before_co2"]
+        rows.append({
+            "name": entry["name"],
+            "language": entry["language"],
+            "status": status,
+            "before_co2": body.get("before_co2"),
+            "after_co2": body.get("after_co2"),
+            "correct": correct,
+            "latency_s": latency,
+            "error": body.get("error")
+        })
+    return {"accuracy": sum(r["correct"] for r in rows) / len(rows), "pairs": rows}
+
+
+def run_load(base_url: str, endpoint: str, count: int, concurrency: int, llm_latency_s: float, timeout: float) -> dict:
+    """`count` requests to one endpoint from `concurrency` clients, cycling through the corpus."""
+    payloads = [payload_for(endpoint, CORPUS[i % len(CORPUS)]) for i in range(count)]
+    results = []
+    lock = threading.Lock()
+
+    def send(payload):
+        status, body, latency = timed_post(base_url, endpoint, payload, timeout)
+        with lock:
+            results.append((status, body, latency))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(send, payloads))
+    wall_s = time.perf_counter() - start
+
+    ok = [(body, latency) for status, body, latency in results if status == 200]
+    latencies = [latency for _, latency in ok]
+    overheads, queue_waits = [], []
+    for body, latency in ok:
+        details = measurement_details(endpoint, body)
+        queue_wait = sum(d.get("queue_wait_s") or 0.0 for d in details)
+        queue_waits.append(queue_wait)
+        overheads.append(max(latency - llm_latency_s - queue_wait - sum(code_time_s(d) for d in details), 0.0))
+    return {
+        "requests": count,
+        "ok": len(ok),
+        "rejected": sum(1 for status, _, _ in results if status == 429),
+        "errors": sum(1 for status, _, _ in results if status not in (200, 429)),
+        "wall_s": wall_s,
+        "throughput_rps": len(ok) / wall_s if wall_s > 0 else 0.0,
+        "latency_s": {
+            "mean": statistics.fmean(latencies) if latencies else None,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99)
+        },
+        "queue_wait_s_mean": statistics.fmean(queue_waits) if queue_waits else None,
+        "measurement_overhead_s_mean": statistics.fmean(overheads) if overheads else None,
+        "measurement_overhead_ratio": (sum(overheads) / sum(latencies)) if latencies else None
+    }
+
+
+def format_report(report: dict) -> str:
+    def ms(value):
+        return f"{value * 1000:9.1f}" if value is not None else f"{'-':>9}"
+
+    if report["accuracy"]["accuracy"] is None:
+        lines = ["Ranking accuracy: skipped"]
+    else:
+        lines = [f"Ranking accuracy: {report['accuracy']['accuracy'] * 100:.0f}% "
+                 f"({sum(p['correct'] for p in report['accuracy']['pairs'])}/{len(report['accuracy']['pairs'])} pairs)"]
+    for pair in report["accuracy"]["pairs"]:
+        mark = "ok  " if pair["correct"] else "FAIL"
+        lines.append(f"  {mark} {pair['name']:<36}{pair['language']:<8}"
+                     f"before {pair['before_co2'] or 0:.3e}  after {pair['after_co2'] or 0:.3e}")
+    lines.append("")
+    lines.append(f"  {'endpoint':<12}{'ok':>5}{'429':>5}{'err':>5}{'req/s':>8}{'p50 ms':>10}{'p95 ms':>10}"
+                 f"{'p99 ms':>10}{'overhead ms':>13}")
+    for endpoint, stats in report["load"].items():
+        lines.append(f"  {endpoint:<12}{stats['ok']:>5}{stats['rejected']:>5}{stats['errors']:>5}"
+                     f"{stats['throughput_rps']:>8.2f}{ms(stats['latency_s']['p50'])} {ms(stats['latency_s']['p95'])}"
+                     f" {ms(stats['latency_s']['p99'])}   {ms(stats['measurement_overhead_s_mean'])}")
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark with a stub LLM")
+    parser.add_argument("--requests", type=int, default=14, help="requests per endpoint in the load phase")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="comma-separated, e.g. codegen,optimize")
+    parser.add_argument("--latency", type=float, default=0.2, help="stub LLM seconds per completion")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra uniform stub latency, seconds")
+    parser.add_argument("--timeout", type=float, default=600.0, help="per-request timeout, seconds")
+    parser.add_argument("--skip-accuracy", action="store_true")
+    parser.add_argument("--json", help="write the full report to this file")
+    parser.add_argument("--max-p95-s", type=float, help="fail when any endpoint's p95 latency exceeds this")
+    parser.add_argument("--min-accuracy", type=float, help="fail when ranking accuracy (0..1) is below this")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    stub = StubLLM(responder=reply_for, latency_s=args.latency, jitter_s=args.jitter)
+    stub_server, stub_url = start_stub_server(stub)
+
+    # Throw-away state, and the backend pointed at the stub before it is imported
+    workdir = tempfile.mkdtemp(prefix="codeleaf-bench-")
+    os.environ.update(
+        HF_TOKEN="offline-benchmark",
+        HF_MODEL=stub_url,
+        LLM_CACHE_PATH=os.path.join(workdir, "llm_cache.sqlite3"),
+        BUILD_CACHE_DIR=os.path.join(workdir, "build_cache"),
+        HISTORY_DB_PATH=os.path.join(workdir, "history.sqlite3"),
+        MEASUREMENT_CACHE_PATH=os.path.join(workdir, "measurement_cache.sqlite3"),
+        HOST_CALIBRATION_PATH=os.path.join(workdir, "host_calibration.json")
+    )
+    os.environ.setdefault("WARMUP_ON_START", "0")
+    os.environ.setdefault("COMPLEXITY_PROFILE", "0")
+    import app as backend
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, backend.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="backend", daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    try:
+        report = {
+            "settings": vars(args),
+            "accuracy": {"accuracy": None, "pairs": []} if args.skip_accuracy else run_accuracy(base_url, args.timeout),
+            "load": {}
+        }
+        llm_latency_s = args.latency + args.jitter / 2
+        for endpoint in [e.strip() for e in args.endpoints.split(",") if e.strip()]:
+            report["load"][endpoint] = run_load(base_url, endpoint, args.requests, args.concurrency,
+                                                llm_latency_s, args.timeout)
+        report["stub_requests"] = stub.requests
+    finally:
+        server.shutdown()
+        stub_server.shutdown()
+        if backend.python_pool is not None:
+            backend.python_pool.shutdown()
+
+    print(format_report(report))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failures = []
+    if args.max_p95_s is not None:
+        for endpoint, stats in report["load"].items():
+            p95 = stats["latency_s"]["p95"]
+            if p95 is None:
+                failures.append(f"{endpoint}: no successful requests")
+            elif p95 > args.max_p95_s:
+                failures.append(f"{endpoint} p95 {p95:.3f} s > {args.max_p95_s} s")
+    accuracy = report["accuracy"]["accuracy"]
+    if args.min_accuracy is not None and accuracy is not None and accuracy < args.min_accuracy:
+        failures.append(f"ranking accuracy {accuracy:.2f} < {args.min_accuracy}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
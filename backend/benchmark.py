@@ -0,0 +1,188 @@
+import time
+import math
+import hashlib
+import itertools
+import statistics
+from collections.abc import Iterable, Mapping
+
+# ====================== Adaptive Benchmarking Engine ======================
+# Two-sided 95% Student t critical values by degrees of freedom
+_T_95 = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262,
+    10: 2.228, 11: 2.201, 12: 2.179, 13: 2.160, 14: 2.145, 15: 2.131, 16: 2.120, 17: 2.110,
+    18: 2.101, 19: 2.093, 20: 2.086, 21: 2.080, 22: 2.074, 23: 2.069, 24: 2.064, 25: 2.060,
+    26: 2.056, 27: 2.052, 28: 2.048, 29: 2.045, 30: 2.042
+}
+
+DEFAULT_SETTINGS = {
+    "warmup_runs": 1,
+    "min_runs": 3,
+    "max_runs": 20,
+    "target_rel_ci": 0.05,
+    "time_budget_s": 10.0
+}
+
+
+def t_critical(df: int) -> float:
+    if df <= 0:
+        return math.inf
+    return _T_95.get(df, 1.96)
+
+
+def count_outliers(samples) -> int:
+    """Samples outside the 1.5 x IQR fences."""
+    if len(samples) < 4:
+        return 0
+    q1, _, q3 = statistics.quantiles(samples, n=4)
+    iqr = q3 - q1
+    low, high = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+    return sum(1 for x in samples if x < low or x > high)
+
+
+def summarize(samples) -> dict:
+    n = len(samples)
+    if n == 0:
+        return {"runs": 0, "mean_s": 0.0, "median_s": 0.0, "stddev_s": 0.0, "min_s": 0.0, "max_s": 0.0,
+                "ci95_half_width_s": None, "rel_ci95": None, "outliers": 0}
+    mean = statistics.fmean(samples)
+    stddev = statistics.stdev(samples) if n > 1 else 0.0
+    half_width = t_critical(n - 1) * stddev / math.sqrt(n) if n > 1 else None
+    return {
+        "runs": n,
+        "mean_s": mean,
+        "median_s": statistics.median(samples),
+        "stddev_s": stddev,
+        "min_s": min(samples),
+        "max_s": max(samples),
+        "ci95_half_width_s": half_width,
+        "rel_ci95": (half_width / mean) if half_width is not None and mean > 0 else None,
+        "outliers": count_outliers(samples)
+    }
+
+
+def adaptive_benchmark(run_once, warmup_runs=1, min_runs=3, max_runs=20, target_rel_ci=0.05, time_budget_s=10.0,
+                       setup=None) -> dict:
+    """
+    Time run_once() until the 95% confidence interval of the mean is within
+    target_rel_ci of the mean, max_runs is reached, or time_budget_s is spent.
+    run_once is timed with a monotonic clock; if it raises, benchmarking stops
+    and the error is reported. Warm-up runs are timed but excluded from the stats.
+    With setup, run_once(setup()) is called and only run_once is timed.
+    """
+    budget_start = time.perf_counter()
+    warmup_samples, samples, errors = [], [], []
+    stop_reason = "max_runs"
+
+    def timed():
+        if setup is not None:
+            prepared = setup()
+            start = time.perf_counter()
+            run_once(prepared)
+        else:
+            start = time.perf_counter()
+            run_once()
+        return time.perf_counter() - start
+
+    try:
+        for _ in range(warmup_runs):
+            warmup_samples.append(timed())
+            if time.perf_counter() - budget_start > time_budget_s:
+                break
+
+        while len(samples) < max_runs:
+            samples.append(timed())
+            if len(samples) >= min_runs:
+                stats = summarize(samples)
+                if stats["rel_ci95"] is not None and stats["rel_ci95"] <= target_rel_ci:
+                    stop_reason = "converged"
+                    break
+            if time.perf_counter() - budget_start > time_budget_s:
+                stop_reason = "time_budget"
+                break
+    except Exception as e:
+        errors.append(f"{type(e).__name__}: {e}")
+        stop_reason = "error"
+
+    result = summarize(samples)
+    result.update({
+        "samples_s": samples,
+        "warmup_samples_s": warmup_samples,
+        "stop_reason": stop_reason,
+        "errors": errors
+    })
+    return result
+
+
+def compare(before: dict, after: dict) -> dict:
+    """
+    Compare two benchmark summaries. The difference is called significant
+    when the 95% confidence intervals of the two means do not overlap.
+    """
+    if not before or not after or not before.get("runs") or not after.get("runs"):
+        return {"speedup": None, "significant": False}
+    speedup = before["mean_s"] / after["mean_s"] if after["mean_s"] > 0 else None
+    before_hw = before.get("ci95_half_width_s")
+    after_hw = after.get("ci95_half_width_s")
+    significant = False
+    if before_hw is not None and after_hw is not None:
+        significant = (before["mean_s"] - before_hw > after["mean_s"] + after_hw or
+                       after["mean_s"] - after_hw > before["mean_s"] + before_hw)
+    return {"speedup": speedup, "significant": significant}
+
+
+# Return values are compared after normalize_output: floats to this many significant digits,
+# and at most this many items taken from an iterator
+OUTPUT_FLOAT_DIGITS = 9
+MAX_OUTPUT_ITEMS = 1_000_000
+_PLAIN_TYPES = (type(None), bool, int, str, bytes)
+
+
+def normalize_output(value, depth=0):
+    """
+    A return value reduced to what equivalent code would agree on: iterators and other
+    containers become lists, numpy scalars and arrays become Python values, floats are
+    rounded, and objects without their own repr are compared by type and attributes
+    instead of by address.
+    """
+    if isinstance(value, _PLAIN_TYPES):
+        return value
+    if isinstance(value, float):
+        # + 0.0 folds -0.0 into 0.0
+        return float(format(value, f".{OUTPUT_FLOAT_DIGITS}g")) + 0.0
+    if isinstance(value, complex):
+        return complex(normalize_output(value.real), normalize_output(value.imag))
+    if depth > 50:
+        return repr(value)
+    if hasattr(value, "dtype") and hasattr(value, "tolist"):
+        return normalize_output(value.item() if getattr(value, "ndim", None) == 0 else value.tolist(), depth + 1)
+    if isinstance(value, Mapping):
+        items = [(normalize_output(k, depth + 1), normalize_output(v, depth + 1)) for k, v in value.items()]
+        return ("mapping", sorted(items, key=repr))
+    if isinstance(value, (set, frozenset)):
+        return ("set", sorted((normalize_output(item, depth + 1) for item in value), key=repr))
+    if isinstance(value, (list, tuple)) and all(type(item) in _PLAIN_TYPES for item in value):
+        return list(value)
+    if isinstance(value, Iterable):
+        items = []
+        try:
+            for item in itertools.islice(value, MAX_OUTPUT_ITEMS + 1):
+                items.append(normalize_output(item, depth + 1))
+        except Exception as e:
+            items.append(("raised", type(e).__name__))
+        return items
+    if type(value).__repr__ is object.__repr__:
+        return ("object", type(value).__qualname__, normalize_output(getattr(value, "__dict__", None), depth + 1))
+    return repr(value)
+
+
+def output_digest(stdout: str, returned=None) -> str:
+    """Fingerprint of what a run produced (stdout and, for Python, the entry point's normalized return value)."""
+    h = hashlib.sha256(stdout.encode("utf-8", "replace"))
+    if returned is not None:
+        h.update(b"\0")
+        try:
+            normalized = normalize_output(returned)
+        except Exception:
+            normalized = repr(returned)
+        h.update(repr(normalized).encode("utf-8", "replace"))
+    return h.hexdigest()
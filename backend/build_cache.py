@@ -0,0 +1,145 @@
+import os
+import time
+import hashlib
+import tempfile
+import threading
+import subprocess
+from functools import lru_cache
+
+# ====================== Compiled Artifact Cache ======================
+DEFAULT_BUILD_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "build_cache")
+
+
+@lru_cache(maxsize=None)
+def compiler_version(compiler: str = "gcc") -> str:
+    """First line of `<compiler> --version`, used as part of the cache key."""
+    try:
+        res = subprocess.run([compiler, "--version"], capture_output=True, text=True, timeout=30)
+        return res.stdout.splitlines()[0].strip() if res.stdout else ""
+    except Exception as e:
+        print(f"Could not determine {compiler} version: {e}")
+        return ""
+
+
+def build_key(source: str, compiler: str, flags) -> str:
+    """Hash of (source, compiler version, flags)."""
+    h = hashlib.sha256()
+    for part in (source, compiler, compiler_version(compiler), "\0".join(flags)):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class BuildCache:
+    """
+    On-disk cache of compiled executables.
+    Binaries are published with an atomic rename, so concurrent builders of the
+    same source never see a half-written file; eviction is LRU by mtime.
+    """
+
+    def __init__(self, directory=DEFAULT_BUILD_CACHE_DIR, max_entries=500, max_bytes=256 * 1024 * 1024, compiler="gcc"):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.compiler = compiler
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get_or_build(self, source: str, flags=()):
+        """
+        Returns a dict with exe_path, cache_hit, compile_time_s and error.
+        exe_path is None when compilation failed.
+        """
+        flags = list(flags)
+        key = build_key(source, self.compiler, flags)
+        exe_path = os.path.join(self.directory, key)
+        result = {"exe_path": None, "cache_hit": False, "compile_time_s": 0.0, "error": None}
+
+        with self._key_lock(key):
+            if os.path.exists(exe_path):
+                os.utime(exe_path)
+                with self._lock:
+                    self.hits += 1
+                result.update(exe_path=exe_path, cache_hit=True)
+                return result
+
+            with self._lock:
+                self.misses += 1
+
+            src_file = None
+            tmp_exe = None
+            try:
+                with tempfile.NamedTemporaryFile(mode="w", suffix=".c", delete=False) as f:
+                    src_file = f.name
+                    f.write(source)
+                tmp_exe = os.path.join(self.directory, f".{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+                start = time.perf_counter()
+                compile_res = subprocess.run([self.compiler, src_file, "-o", tmp_exe, *flags],
+                                             capture_output=True, text=True, timeout=120)
+                result["compile_time_s"] = time.perf_counter() - start
+                if compile_res.returncode != 0:
+                    result["error"] = compile_res.stderr
+                    return result
+                os.replace(tmp_exe, exe_path)
+                tmp_exe = None
+                result["exe_path"] = exe_path
+            finally:
+                for path in (src_file, tmp_exe):
+                    if path and os.path.exists(path):
+                        os.remove(path)
+
+        self._evict(keep=key)
+        return result
+
+    def _evict(self, keep: str = None):
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                if name.startswith("."):
+                    continue
+                try:
+                    st = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, name))
+            count = len(entries)
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if count <= self.max_entries and total <= self.max_bytes:
+                    break
+                if name == keep:
+                    continue
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+                count -= 1
+                total -= size
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        names = [n for n in os.listdir(self.directory) if not n.startswith(".")]
+        total = 0
+        for name in names:
+            try:
+                total += os.path.getsize(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+        return {
+            "entries": len(names),
+            "bytes": total,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "compiler": compiler_version(self.compiler),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
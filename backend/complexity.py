@@ -0,0 +1,178 @@
+import ast
+import math
+
+# ====================== Empirical Complexity Profiling ======================
+# Candidate growth models, simplest first; fits prefer the simpler model on near-ties
+MODELS = {
+    "O(1)": lambda n: 1.0,
+    "O(log n)": lambda n: math.log2(n),
+    "O(n)": lambda n: float(n),
+    "O(n log n)": lambda n: n * math.log2(n),
+    "O(n^2)": lambda n: float(n) ** 2,
+    "O(n^3)": lambda n: float(n) ** 3
+}
+TIE_TOLERANCE = 1.25
+
+# Doubling sizes from 256 to 256Ki; profiling stops early once calls get slow
+DEFAULT_SIZES = [2 ** k for k in range(8, 19)]
+DEFAULT_PRODUCTION_SIZES = [1_000_000, 10_000_000, 100_000_000]
+
+# Parameter names that suggest what kind of input an entry point expects
+_LIST_NAMES = {"a", "arr", "array", "nums", "numbers", "data", "items", "lst", "values", "xs", "seq",
+               "sequence", "elements", "iterable", "collection"}
+_STR_NAMES = {"s", "text", "string", "word", "chars", "sentence"}
+_SIZE_NAMES = {"n", "size", "length", "count", "k", "limit", "num", "m", "steps"}
+_TARGET_NAMES = {"x", "target", "key", "value", "val", "item", "element", "needle"}
+
+
+def _param_kind(name: str, annotation, position: int) -> str:
+    ann = (annotation or "").lower()
+    if any(t in ann for t in ("list", "sequence", "iterable", "tuple")):
+        return "list"
+    if "str" in ann:
+        return "str"
+    if "dict" in ann or "mapping" in ann:
+        return "dict"
+    if "float" in ann:
+        return "float"
+    lowered = name.lower()
+    if lowered in _LIST_NAMES:
+        return "list"
+    if lowered in _STR_NAMES:
+        return "str"
+    if lowered in _TARGET_NAMES:
+        return "target"
+    if lowered in _SIZE_NAMES or "int" in ann:
+        return "size"
+    # Unknown names follow the original harness: func(list(range(n)), n, n // 2)
+    return ("list", "size")[position] if position < 2 else "target"
+
+
+def discover_entry_points(source: str) -> list:
+    """
+    Top-level functions in source with their positional parameters, found with ast
+    (the code is not executed). Each parameter gets a kind used to synthesize inputs.
+    """
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return []
+    entry_points = []
+    for node in tree.body:
+        if not isinstance(node, ast.FunctionDef):
+            continue
+        args = node.args.posonlyargs + node.args.args
+        required = len(args) - len(node.args.defaults)
+        params = []
+        for position, arg in enumerate(args):
+            if position >= required:
+                break  # Parameters with defaults keep their defaults
+            annotation = ast.unparse(arg.annotation) if arg.annotation is not None else None
+            params.append({"name": arg.arg, "annotation": annotation,
+                           "kind": _param_kind(arg.arg, annotation, position)})
+        entry_points.append({"name": node.name, "params": params, "lineno": node.lineno})
+    return entry_points
+
+
+def choose_entry_point(entry_points: list, preferred=None):
+    """
+    The function to measure: `preferred` when the code defines it, otherwise the first
+    public function whose inputs scale with n. None when nothing can be scaled.
+    """
+    by_name = {e["name"]: e for e in entry_points}
+    if preferred in by_name:
+        return by_name[preferred]
+    for entry in entry_points:
+        if entry["name"].startswith("_") or entry["name"] == "main":
+            continue
+        if any(p["kind"] in ("list", "str", "dict", "size") for p in entry["params"]):
+            return entry
+    return None
+
+
+def synthesize_args(params: list, n: int) -> list:
+    """Fresh arguments of size n for an entry point's parameters."""
+    args = []
+    for param in params:
+        kind = param["kind"]
+        if kind == "list":
+            args.append(list(range(n)))
+        elif kind == "str":
+            args.append("ab" * (n // 2) + "a" * (n % 2))
+        elif kind == "dict":
+            args.append({i: i for i in range(n)})
+        elif kind == "float":
+            args.append(float(n))
+        elif kind == "target":
+            args.append(n // 2)
+        else:
+            args.append(n)
+    return args
+
+
+def fit(sizes, values) -> dict:
+    """
+    Fit value = intercept + coefficient * f(n) for each growth model by least squares
+    on relative error (points span orders of magnitude) and pick the best one.
+    Also reports the log-log slope between the two largest sizes as an empirical exponent.
+    """
+    points = [(n, v) for n, v in zip(sizes, values) if n > 1 and v is not None and v > 0]
+    if len(points) < 3:
+        return {"model": None, "intercept": None, "coefficient": None, "rel_rmse": None,
+                "exponent": None, "candidates": {}}
+
+    candidates = {}
+    for name, f in MODELS.items():
+        # Weighted least squares, weights 1/v^2
+        sw = swx = swy = swxx = swxy = 0.0
+        for n, v in points:
+            w, x = 1.0 / (v * v), f(n)
+            sw += w
+            swx += w * x
+            swy += w * v
+            swxx += w * x * x
+            swxy += w * x * v
+        denom = sw * swxx - swx * swx
+        if name == "O(1)" or abs(denom) < 1e-300:
+            intercept, coefficient = swy / sw, 0.0
+        else:
+            coefficient = (sw * swxy - swx * swy) / denom
+            intercept = (swy - coefficient * swx) / sw
+            if coefficient < 0:
+                continue  # Shrinking with n: not this model
+        rel_rmse = math.sqrt(sum(((intercept + coefficient * f(n)) / v - 1.0) ** 2 for n, v in points) / len(points))
+        candidates[name] = {"intercept": intercept, "coefficient": coefficient, "rel_rmse": rel_rmse}
+
+    best_error = min(c["rel_rmse"] for c in candidates.values())
+    model = next(name for name, c in candidates.items() if c["rel_rmse"] <= best_error * TIE_TOLERANCE + 1e-9)
+    (n1, v1), (n2, v2) = sorted(points)[-2:]
+    return {
+        "model": model,
+        "intercept": candidates[model]["intercept"],
+        "coefficient": candidates[model]["coefficient"],
+        "rel_rmse": candidates[model]["rel_rmse"],
+        "exponent": math.log(v2 / v1) / math.log(n2 / n1),
+        "candidates": {name: c["rel_rmse"] for name, c in candidates.items()}
+    }
+
+
+def predict(fitted: dict, n: int):
+    if not fitted or fitted.get("model") is None:
+        return None
+    return fitted["intercept"] + fitted["coefficient"] * MODELS[fitted["model"]](n)
+
+
+def summarize_profile(entry_point: dict, points: list, production_sizes=DEFAULT_PRODUCTION_SIZES) -> dict:
+    """Scaling curve for time and energy, with the cost extrapolated to production input sizes."""
+    sizes = [p["n"] for p in points]
+    time_fit = fit(sizes, [p["time_s"] for p in points])
+    energy_fit = fit(sizes, [p["co2_kg"] for p in points])
+    return {
+        "entry_point": entry_point["name"],
+        "params": entry_point["params"],
+        "points": points,
+        "time": time_fit,
+        "energy": energy_fit,
+        "extrapolated": [{"n": n, "time_s": predict(time_fit, n), "co2_kg": predict(energy_fit, n)}
+                         for n in production_sizes]
+    }
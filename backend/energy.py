@@ -0,0 +1,371 @@
+import os
+import json
+import glob
+import time
+import socket
+import platform
+import statistics
+import threading
+import subprocess
+from contextlib import contextmanager
+
+import psutil
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ====================== Per-Process Energy Attribution ======================
+POWERCAP_ROOT = "/sys/class/powercap"
+CARBON_KG_PER_KWH = 0.475
+DEFAULT_CALIBRATION_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "host_calibration.json")
+
+
+def default_watts_per_core() -> float:
+    """CPU package TDP spread over physical cores (CPU_TDP_W, default 65 W)."""
+    tdp_w = float(os.getenv("CPU_TDP_W", "65"))
+    cores = psutil.cpu_count(logical=False) or psutil.cpu_count(logical=True) or 1
+    return tdp_w / cores
+
+
+def host_fingerprint() -> str:
+    return f"{socket.gethostname()}|{platform.machine()}|{platform.processor()}|{psutil.cpu_count(logical=True)}"
+
+
+def read_powercap():
+    """
+    Readable top-level RAPL package counters as {domain: (energy_uj, max_range_uj)},
+    or None when /sys/class/powercap is missing or unreadable.
+    """
+    counters = {}
+    for domain in glob.glob(os.path.join(POWERCAP_ROOT, "intel-rapl:*")):
+        if os.path.basename(domain).count(":") != 1:
+            continue  # sub-domains (core, uncore, dram) are already included in the package
+        try:
+            with open(os.path.join(domain, "energy_uj")) as f:
+                energy = int(f.read())
+            with open(os.path.join(domain, "max_energy_range_uj")) as f:
+                max_range = int(f.read())
+        except (OSError, ValueError):
+            continue
+        counters[domain] = (energy, max_range)
+    return counters or None
+
+
+def powercap_delta_j(before, after):
+    """Joules between two read_powercap() snapshots, handling counter wrap-around."""
+    if not before or not after:
+        return None
+    total_uj = 0
+    for domain, (energy, max_range) in after.items():
+        if domain not in before:
+            continue
+        delta = energy - before[domain][0]
+        if delta < 0:
+            delta += max_range
+        total_uj += delta
+    return total_uj / 1e6
+
+
+def host_busy_cpu_s() -> float:
+    """Total non-idle CPU seconds across all cores since boot."""
+    t = psutil.cpu_times()
+    return sum(t) - t.idle - getattr(t, "iowait", 0.0)
+
+
+def snapshot() -> dict:
+    """Host-wide counters taken around a measured run."""
+    return {"powercap": read_powercap(), "host_busy_s": host_busy_cpu_s()}
+
+
+def run_with_rusage(cmd, input_text="", timeout=300, on_start=None) -> dict:
+    """
+    Run cmd and return its output together with the child's own resource usage
+    (user/system CPU time, peak RSS and context switches from wait4).
+    on_start(pid) is called from this process as soon as the child exists (e.g. to pin it
+    and set its limits), before it is given its input.
+    Raises subprocess.TimeoutExpired like subprocess.run.
+    """
+    before = snapshot()
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if on_start is not None:
+        try:
+            on_start(proc.pid)
+        except ProcessLookupError:
+            pass  # Already gone; wait4 still reports its usage
+
+    if not hasattr(os, "wait4"):
+        # No wait4 on Windows: fall back to wall time on one core
+        try:
+            stdout, stderr = proc.communicate(input_text, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+            raise
+        wall = time.perf_counter() - start
+        return {"returncode": proc.returncode, "stdout": stdout, "stderr": stderr, "wall_s": wall,
+                "user_s": wall, "sys_s": 0.0, "max_rss_kb": None, "ctx_voluntary": None, "ctx_involuntary": None,
+                "host": (before, snapshot())}
+
+    output = {}
+
+    def drain(name, stream):
+        output[name] = stream.read()
+        stream.close()
+
+    readers = [threading.Thread(target=drain, args=(name, stream), daemon=True)
+               for name, stream in (("stdout", proc.stdout), ("stderr", proc.stderr))]
+    for reader in readers:
+        reader.start()
+    try:
+        proc.stdin.write(input_text)
+        proc.stdin.close()
+    except BrokenPipeError:
+        pass
+
+    timed_out = threading.Event()
+
+    def kill_on_timeout():
+        timed_out.set()
+        proc.kill()
+
+    timer = threading.Timer(timeout, kill_on_timeout)
+    timer.start()
+    try:
+        _, status, usage = os.wait4(proc.pid, 0)
+    finally:
+        timer.cancel()
+    wall = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    for reader in readers:
+        reader.join()
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(cmd, timeout)
+
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    max_rss_kb = usage.ru_maxrss / 1024 if platform.system() == "Darwin" else usage.ru_maxrss
+    return {
+        "returncode": proc.returncode,
+        "stdout": output.get("stdout", ""),
+        "stderr": output.get("stderr", ""),
+        "wall_s": wall,
+        "user_s": usage.ru_utime,
+        "sys_s": usage.ru_stime,
+        "max_rss_kb": max_rss_kb,
+        "ctx_voluntary": usage.ru_nvcsw,
+        "ctx_involuntary": usage.ru_nivcsw,
+        "host": (before, snapshot())
+    }
+
+
+def self_usage() -> dict:
+    """Resource usage of the current process, for in-process (worker) measurements."""
+    if resource is not None:
+        # getrusage has microsecond resolution; os.times only counts clock ticks
+        ru = resource.getrusage(resource.RUSAGE_SELF)
+        return {"user_s": ru.ru_utime, "sys_s": ru.ru_stime, "ctx_voluntary": ru.ru_nvcsw, "ctx_involuntary": ru.ru_nivcsw}
+    times = os.times()
+    return {"user_s": times.user, "sys_s": times.system, "ctx_voluntary": None, "ctx_involuntary": None}
+
+
+def reset_peak_rss() -> bool:
+    """Reset this process's peak RSS (VmHWM) so the next reading covers one run. Linux only."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_kb():
+    """Peak RSS of this process in KiB: VmHWM (resettable) on Linux, otherwise the lifetime ru_maxrss."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    if resource is not None:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss / 1024 if platform.system() == "Darwin" else max_rss
+    return None
+
+
+def usage_delta(before: dict, after: dict) -> dict:
+    return {key: (after[key] - before[key]) if before[key] is not None and after[key] is not None else None
+            for key in ("user_s", "sys_s", "ctx_voluntary", "ctx_involuntary")}
+
+
+def summarize_usage(attributions, usages) -> dict:
+    """Mean per-run resource usage and energy for execution_details."""
+    def mean_of(values):
+        values = [v for v in values if v is not None]
+        return statistics.fmean(values) if values else None
+    rss = [u["max_rss_kb"] for u in usages if u.get("max_rss_kb") is not None]
+    return {
+        "method": attributions[0]["method"] if attributions else None,
+        "energy_j_mean": mean_of(a["energy_j"] for a in attributions),
+        "memory_j_mean": mean_of(a.get("memory_j") for a in attributions),
+        "max_rss_kb": max(rss) if rss else None,
+        "cpu_s_mean": mean_of(a["cpu_s"] for a in attributions),
+        "user_s_mean": mean_of(u["user_s"] for u in usages),
+        "sys_s_mean": mean_of(u["sys_s"] for u in usages),
+        "ctx_voluntary_mean": mean_of(u["ctx_voluntary"] for u in usages),
+        "ctx_involuntary_mean": mean_of(u["ctx_involuntary"] for u in usages)
+    }
+
+
+class EnergyMeter:
+    """
+    Converts a run's own CPU time (and, when available, RAPL package energy)
+    into energy and CO2, after subtracting the calibrated host baseline.
+    """
+
+    def __init__(self, watts_per_core=None, carbon_kg_per_kwh=CARBON_KG_PER_KWH, calibration=None, watts_per_gb=0.0):
+        self.watts_per_core = watts_per_core or default_watts_per_core()
+        self.carbon_kg_per_kwh = carbon_kg_per_kwh
+        self.calibration = calibration or {}
+        self.watts_per_gb = watts_per_gb
+
+    def to_dict(self) -> dict:
+        """Parameters in a JSON-friendly form, so workers can rebuild the same meter."""
+        return {"watts_per_core": self.watts_per_core, "carbon_kg_per_kwh": self.carbon_kg_per_kwh,
+                "calibration": self.calibration, "watts_per_gb": self.watts_per_gb}
+
+    def attribute(self, cpu_s: float, wall_s: float, host=None, baseline_cpu_s: float = 0.0, memory_kb=None) -> dict:
+        """
+        Energy for one run. With powercap counters, the package energy above the
+        idle baseline is split by the run's share of all busy CPU time on the host;
+        otherwise CPU seconds are charged at watts_per_core.
+        With watts_per_gb set, the run's peak memory is charged for its wall time on top.
+        """
+        cpu_s = max(cpu_s - baseline_cpu_s, 0.0)
+        energy_j, method = cpu_s * self.watts_per_core, "cpu_time"
+
+        if host is not None:
+            before, after = host
+            rapl_j = powercap_delta_j(before["powercap"], after["powercap"])
+            host_busy_s = after["host_busy_s"] - before["host_busy_s"]
+            idle_w = self.calibration.get("idle_package_w")
+            if rapl_j is not None and idle_w is not None and host_busy_s > 0:
+                dynamic_j = max(rapl_j - idle_w * wall_s, 0.0)
+                energy_j = dynamic_j * min(cpu_s / host_busy_s, 1.0)
+                method = "powercap"
+
+        memory_j = 0.0
+        if self.watts_per_gb and memory_kb:
+            memory_j = self.watts_per_gb * memory_kb / 1024 ** 2 * wall_s
+            energy_j += memory_j
+
+        return {
+            "energy_j": energy_j,
+            "co2_kg": energy_j / 3.6e6 * self.carbon_kg_per_kwh,
+            "cpu_s": cpu_s,
+            "memory_j": memory_j,
+            "method": method
+        }
+
+
+class CodeCarbonSession:
+    """
+    One long-lived codecarbon tracker per process, handing out task-scoped measurements.
+    The tracker (and its hardware and region detection) is created once, on first use or
+    by warm(); each task() then only reads the energy counters at its start and stop.
+    codecarbon measures one task at a time, so tasks are serialized.
+    """
+
+    def __init__(self, **tracker_options):
+        self.tracker_options = {"save_to_file": False, "allow_multiple_runs": True, **tracker_options}
+        self.tasks = 0
+        self._tracker = None
+        self._lock = threading.Lock()
+
+    def warm(self):
+        if self._tracker is None:
+            # Heavy import, only paid by processes that report codecarbon figures
+            from codecarbon import EmissionsTracker
+            tracker = EmissionsTracker(**self.tracker_options)
+            # The first task sets up the emissions engine and hardware; do it now rather than in a measurement
+            tracker.start_task("warm-up")
+            tracker.stop_task()
+            self._tracker = tracker
+        return self._tracker
+
+    @contextmanager
+    def task(self, name=None):
+        """
+        Measure the enclosed block. Yields a dict that holds co2_kg, energy_kwh and duration_s
+        once the block exits, plus overhead_s: the time spent in codecarbon itself.
+        """
+        measurement = {"co2_kg": 0.0, "energy_kwh": 0.0, "duration_s": 0.0, "overhead_s": 0.0}
+        with self._lock:
+            start = time.perf_counter()
+            tracker = self.warm()
+            tracker.start_task(name)
+            measurement["overhead_s"] = time.perf_counter() - start
+            try:
+                yield measurement
+            finally:
+                start = time.perf_counter()
+                data = tracker.stop_task()
+                measurement["overhead_s"] += time.perf_counter() - start
+                self.tasks += 1
+                if data is not None:
+                    measurement.update(co2_kg=data.emissions or 0.0, energy_kwh=data.energy_consumed or 0.0,
+                                       duration_s=data.duration or 0.0)
+
+
+def calibrate_host(path=DEFAULT_CALIBRATION_PATH, spawn_cmd=None, idle_window_s=1.0, spawn_runs=5, force=False) -> dict:
+    """
+    Measure the host's idle baseline once and cache it on disk:
+    idle RAPL package power, background busy cores, and the CPU/wall cost of
+    spawning a trivial process (subtracted from each measured run).
+    The cache is reused until the host fingerprint changes.
+    """
+    fingerprint = host_fingerprint()
+    if not force and os.path.exists(path):
+        try:
+            with open(path) as f:
+                cached = json.load(f)
+            if cached.get("host") == fingerprint:
+                return cached
+        except (OSError, ValueError):
+            pass
+
+    before_cap, before_busy = read_powercap(), host_busy_cpu_s()
+    time.sleep(idle_window_s)
+    after_cap, after_busy = read_powercap(), host_busy_cpu_s()
+    rapl_j = powercap_delta_j(before_cap, after_cap)
+
+    calibration = {
+        "host": fingerprint,
+        "calibrated_at": time.time(),
+        "powercap_available": rapl_j is not None,
+        "idle_package_w": rapl_j / idle_window_s if rapl_j is not None else None,
+        "idle_busy_cores": (after_busy - before_busy) / idle_window_s,
+        "spawn_cpu_s": 0.0,
+        "spawn_wall_s": 0.0
+    }
+
+    if spawn_cmd:
+        runs = []
+        for _ in range(spawn_runs):
+            try:
+                runs.append(run_with_rusage(spawn_cmd, timeout=30))
+            except Exception as e:
+                print(f"Spawn calibration failed: {e}")
+                break
+        if runs:
+            calibration["spawn_cpu_s"] = statistics.median(r["user_s"] + r["sys_s"] for r in runs)
+            calibration["spawn_wall_s"] = statistics.median(r["wall_s"] for r in runs)
+
+    try:
+        with open(path, "w") as f:
+            json.dump(calibration, f, indent=2)
+    except OSError as e:
+        print(f"Could not save host calibration: {e}")
+    return calibration
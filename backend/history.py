@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+# ====================== Run History Store ======================
+DEFAULT_HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "history.sqlite3")
+
+SUMMARY_COLUMNS = ("id", "created_at", "type", "language", "prompt", "cached",
+                   "llm_co2_kg", "execution_co2_kg", "before_co2", "after_co2", "co2_saved")
+ROLLUP_METRICS = ("runs", "llm_co2_kg", "execution_co2_kg", "before_co2", "after_co2", "co2_saved")
+
+
+def parse_time(value):
+    """Accept epoch seconds or an ISO-8601 string; None passes through."""
+    if value in (None, ""):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        dt = datetime.fromisoformat(str(value))
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt.timestamp()
+
+
+def period_keys(ts: float):
+    """UTC day and ISO week keys for a timestamp."""
+    dt = datetime.fromtimestamp(ts, tz=timezone.utc)
+    year, week, _ = dt.isocalendar()
+    return dt.strftime("%Y-%m-%d"), f"{year}-W{week:02d}"
+
+
+class HistoryStore:
+    """
+    SQLite store of every generation and optimization run.
+    Runs are indexed by time, type and language; daily and weekly CO2 rollups
+    are maintained on insert so reports never scan the run table.
+    """
+
+    def __init__(self, path=DEFAULT_HISTORY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at REAL NOT NULL,
+                type TEXT NOT NULL,
+                language TEXT NOT NULL,
+                prompt TEXT,
+                input_code TEXT,
+                output_code TEXT,
+                cached INTEGER NOT NULL DEFAULT 0,
+                llm_co2_kg REAL NOT NULL DEFAULT 0,
+                execution_co2_kg REAL,
+                before_co2 REAL,
+                after_co2 REAL,
+                co2_saved REAL,
+                details TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_runs_created ON runs(created_at);
+            CREATE INDEX IF NOT EXISTS idx_runs_type_created ON runs(type, created_at);
+            CREATE INDEX IF NOT EXISTS idx_runs_language_created ON runs(language, created_at);
+            CREATE TABLE IF NOT EXISTS rollups (
+                granularity TEXT NOT NULL,
+                period TEXT NOT NULL,
+                type TEXT NOT NULL,
+                language TEXT NOT NULL,
+                runs INTEGER NOT NULL DEFAULT 0,
+                llm_co2_kg REAL NOT NULL DEFAULT 0,
+                execution_co2_kg REAL NOT NULL DEFAULT 0,
+                before_co2 REAL NOT NULL DEFAULT 0,
+                after_co2 REAL NOT NULL DEFAULT 0,
+                co2_saved REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (granularity, period, type, language)
+            );
+        """)
+        self._conn.commit()
+
+    def record(self, run_type: str, language: str, *, prompt=None, input_code=None, output_code=None,
+               cached=False, llm_co2_kg=0.0, execution_co2_kg=None, before_co2=None, after_co2=None,
+               details=None, created_at=None) -> int:
+        """Insert a run and fold it into the daily and weekly rollups; returns the run id."""
+        created_at = created_at or time.time()
+        language = (language or "").lower()
+        co2_saved = (before_co2 - after_co2) if before_co2 is not None and after_co2 is not None else None
+        day, week = period_keys(created_at)
+        with self._lock:
+            cur = self._conn.execute(
+                """INSERT INTO runs (created_at, type, language, prompt, input_code, output_code, cached,
+                                     llm_co2_kg, execution_co2_kg, before_co2, after_co2, co2_saved, details)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (created_at, run_type, language, prompt, input_code, output_code, int(bool(cached)),
+                 llm_co2_kg, execution_co2_kg, before_co2, after_co2, co2_saved,
+                 json.dumps(details) if details is not None else None)
+            )
+            for granularity, period in (("daily", day), ("weekly", week)):
+                self._conn.execute(
+                    """INSERT INTO rollups (granularity, period, type, language, runs, llm_co2_kg,
+                                            execution_co2_kg, before_co2, after_co2, co2_saved)
+                       VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?, ?)
+                       ON CONFLICT (granularity, period, type, language) DO UPDATE SET
+                           runs = runs + 1,
+                           llm_co2_kg = llm_co2_kg + excluded.llm_co2_kg,
+                           execution_co2_kg = execution_co2_kg + excluded.execution_co2_kg,
+                           before_co2 = before_co2 + excluded.before_co2,
+                           after_co2 = after_co2 + excluded.after_co2,
+                           co2_saved = co2_saved + excluded.co2_saved""",
+                    (granularity, period, run_type, language, llm_co2_kg, execution_co2_kg or 0.0,
+                     before_co2 or 0.0, after_co2 or 0.0, co2_saved or 0.0)
+                )
+            self._conn.commit()
+            return cur.lastrowid
+
+    @staticmethod
+    def _filters(run_type=None, language=None, since=None, until=None):
+        clauses, params = [], []
+        if run_type:
+            clauses.append("type = ?")
+            params.append(run_type)
+        if language:
+            clauses.append("language = ?")
+            params.append(language.lower())
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("created_at < ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(self, page=1, page_size=20, run_type=None, language=None, since=None, until=None,
+              include_code=False) -> dict:
+        """Newest-first page of runs; code bodies are only included on request."""
+        page, page_size = max(int(page), 1), min(max(int(page_size), 1), 200)
+        where, params = self._filters(run_type, language, since, until)
+        columns = list(SUMMARY_COLUMNS) + (["input_code", "output_code"] if include_code else [])
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM runs{where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT {', '.join(columns)} FROM runs{where} ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?",
+                params + [page_size, (page - 1) * page_size]
+            ).fetchall()
+        return {
+            "items": [self._row_to_dict(row) for row in rows],
+            "page": page,
+            "page_size": page_size,
+            "total": total,
+            "pages": (total + page_size - 1) // page_size
+        }
+
+    def get(self, run_id: int):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
+        if row is None:
+            return None
+        record = self._row_to_dict(row)
+        record["details"] = json.loads(record["details"]) if record.get("details") else None
+        return record
+
+    def rollups(self, granularity="daily", run_type=None, language=None, since=None, until=None) -> list:
+        """Precomputed per-period CO2 totals, oldest first, summed over matching types/languages."""
+        clauses, params = ["granularity = ?"], [granularity]
+        if run_type:
+            clauses.append("type = ?")
+            params.append(run_type)
+        if language:
+            clauses.append("language = ?")
+            params.append(language.lower())
+        if since is not None:
+            clauses.append("period >= ?")
+            params.append(period_keys(since)[0 if granularity == "daily" else 1])
+        if until is not None:
+            clauses.append("period <= ?")
+            params.append(period_keys(until)[0 if granularity == "daily" else 1])
+        sums = ", ".join(f"SUM({metric}) AS {metric}" for metric in ROLLUP_METRICS)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT period, {sums} FROM rollups WHERE {' AND '.join(clauses)} GROUP BY period ORDER BY period",
+                params
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def weekly_report(self, ts=None) -> dict:
+        """Green Report for the ISO week containing ts (default: now), split by type and language."""
+        week = period_keys(ts or time.time())[1]
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT type, language, {', '.join(ROLLUP_METRICS)} FROM rollups WHERE granularity = 'weekly' AND period = ?",
+                (week,)
+            ).fetchall()
+        breakdown = [dict(row) for row in rows]
+        totals = {metric: sum(row[metric] for row in breakdown) for metric in ROLLUP_METRICS}
+        return {"week": week, "totals": totals, "breakdown": breakdown}
+
+    @staticmethod
+    def _row_to_dict(row) -> dict:
+        record = dict(row)
+        record["cached"] = bool(record.get("cached"))
+        record["timestamp"] = datetime.fromtimestamp(record["created_at"], tz=timezone.utc).isoformat()
+        return record
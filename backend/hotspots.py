@@ -0,0 +1,156 @@
+import os
+import re
+import sys
+import pstats
+import tempfile
+import threading
+import subprocess
+from collections import Counter
+
+# ====================== Hotspot Profiling ======================
+SNIPPET_FILENAME = "<snippet>"
+# The measurement harness itself (argument synthesis, dispatch) is not part of the report
+HARNESS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_TOP = 8
+
+_GPROF_ROW = re.compile(
+    r"^\s*([\d.]+)\s+([\d.]+)\s+([\d.]+)\s+(?:(\d+)\s+([\d.]+)\s+([\d.]+)\s+)?(\S.*)$")
+_GPROF_LINE = re.compile(r"^(.*?) \((?:.*?):(\d+) @ [0-9a-f]+\)$")
+
+
+class LineSampler:
+    """
+    Samples the line a thread is executing every `interval` seconds. Time spent
+    in library or built-in code is charged to the snippet line that called it,
+    so the counts are self time per snippet line.
+    """
+
+    def __init__(self, thread_id: int, interval=0.001, filename=SNIPPET_FILENAME):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.filename = filename
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            while frame is not None and frame.f_code.co_filename != self.filename:
+                frame = frame.f_back
+            if frame is not None:
+                self.samples[frame.f_lineno] += 1
+
+    def __enter__(self):
+        self._switch_interval = sys.getswitchinterval()
+        # Let the sampler take the GIL often enough to see short lines
+        sys.setswitchinterval(min(self._switch_interval, self.interval))
+        self._thread = threading.Thread(target=self._run, name="hotspot-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        sys.setswitchinterval(self._switch_interval)
+        return False
+
+
+def function_hotspots(profiler, top=DEFAULT_TOP) -> list:
+    """Top functions by self time from a cProfile.Profile."""
+    stats = pstats.Stats(profiler).stats
+    rows = []
+    for (filename, lineno, name), (_, calls, self_s, cumulative_s, _) in stats.items():
+        if name == "<method 'disable' of '_lsprof.Profiler' objects>" or filename.startswith(HARNESS_DIR):
+            continue
+        in_snippet = filename == SNIPPET_FILENAME
+        rows.append({"function": name, "line": lineno if in_snippet else None, "in_snippet": in_snippet,
+                     "calls": calls, "self_s": self_s, "cumulative_s": cumulative_s})
+    total = sum(r["self_s"] for r in rows) or 1.0
+    rows.sort(key=lambda r: r["self_s"], reverse=True)
+    for r in rows:
+        r["self_pct"] = 100.0 * r["self_s"] / total
+    return rows[:top]
+
+
+def line_hotspots(samples: Counter, source: str, top=DEFAULT_TOP) -> list:
+    total = sum(samples.values())
+    if not total:
+        return []
+    lines = source.splitlines()
+    return [{"line": lineno, "code": lines[lineno - 1].strip() if 0 < lineno <= len(lines) else "",
+             "samples": count, "self_pct": 100.0 * count / total}
+            for lineno, count in samples.most_common(top)]
+
+
+def parse_gprof_flat(text: str, top=DEFAULT_TOP) -> list:
+    """Rows of a `gprof -b -p` flat profile (with -l, names carry the source line)."""
+    rows = []
+    for raw in text.splitlines():
+        match = _GPROF_ROW.match(raw)
+        if not match:
+            continue
+        pct, _, self_s, calls, _, _, name = match.groups()
+        line = None
+        located = _GPROF_LINE.match(name.strip())
+        if located:
+            name, line = located.group(1), int(located.group(2))
+        rows.append({"function": name.strip(), "line": line, "calls": int(calls) if calls else None,
+                     "self_s": float(self_s), "self_pct": float(pct)})
+    return rows[:top]
+
+
+def profile_c(exe_path: str, source: str, timeout=300, top=DEFAULT_TOP) -> dict:
+    """
+    Run a binary built with -pg -g and read its gprof flat profile, per function and
+    per source line. gprof samples every 10 ms, so very short programs only report calls.
+    """
+    report = {"language": "c", "tool": "gprof", "functions": [], "lines": [], "error": None}
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            # gmon.out is written to the working directory on exit
+            run = subprocess.run([exe_path], input="", capture_output=True, text=True, cwd=workdir, timeout=timeout)
+            gmon = os.path.join(workdir, "gmon.out")
+            if not os.path.exists(gmon):
+                report["error"] = f"No profile written (exit code {run.returncode})"
+                return report
+            flat = subprocess.run(["gprof", "-b", "-p", exe_path, gmon], capture_output=True, text=True, timeout=60)
+            by_line = subprocess.run(["gprof", "-b", "-p", "-l", exe_path, gmon], capture_output=True, text=True,
+                                     timeout=60)
+        except (OSError, subprocess.SubprocessError) as e:
+            report["error"] = str(e)
+            return report
+    report["functions"] = parse_gprof_flat(flat.stdout, top)
+    lines = source.splitlines()
+    report["lines"] = [
+        {"line": row["line"], "code": lines[row["line"] - 1].strip() if 0 < row["line"] <= len(lines) else "",
+         "function": row["function"], "self_s": row["self_s"], "self_pct": row["self_pct"]}
+        for row in parse_gprof_flat(by_line.stdout, top) if row["line"] is not None
+    ]
+    return report
+
+
+def renumber(report: dict, line_map: dict) -> dict:
+    """Copy of a report with line numbers moved to another version of the source (line_map: old -> new)."""
+    if not report or not line_map:
+        return report
+
+    def moved(row):
+        return {**row, "line": line_map.get(row["line"])} if row.get("line") else row
+    return {**report, "functions": [moved(row) for row in report.get("functions") or []],
+            "lines": [moved(row) for row in report.get("lines") or [] if line_map.get(row["line"])]}
+
+
+def format_for_prompt(report: dict, limit=5, min_pct=1.0) -> str:
+    """Short, model-readable summary of a hotspot report; empty when there is nothing useful."""
+    if not report or (not report.get("functions") and not report.get("lines")):
+        return ""
+    out = ["Profiling the unoptimized code shows where the time goes:"]
+    for row in [r for r in report.get("functions") or [] if r["self_pct"] >= min_pct][:limit]:
+        where = f" (line {row['line']})" if row.get("line") else ""
+        calls = f", {row['calls']} calls" if row.get("calls") is not None else ""
+        out.append(f"- function {row['function']}{where}: {row['self_pct']:.1f}% self time{calls}")
+    for row in [r for r in report.get("lines") or [] if r["self_pct"] >= min_pct][:limit]:
+        out.append(f"- line {row['line']} `{row['code']}`: {row['self_pct']:.1f}% self time")
+    out.append("Focus the optimization on these hotspots.")
+    return "\n".join(out)
@@ -0,0 +1,239 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# ====================== Background Job Manager ======================
+DEFAULT_JOB_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs.sqlite3")
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, kind: str, payload: dict):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.payload = payload
+        self.status = QUEUED
+        self.stage = None
+        self.partial = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_requested = False
+        self.future = None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "type": self.kind,
+            "status": self.status,
+            "stage": self.stage,
+            "partial": self.partial,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+
+class JobStore:
+    """
+    SQLite copy of every job's state, shared by all server processes on a host. A job
+    runs in the process that accepted it; any process can report it or request its
+    cancellation, which the owning process picks up at the job's next stage.
+    """
+
+    def __init__(self, path=DEFAULT_JOB_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                record TEXT NOT NULL,
+                status TEXT NOT NULL,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def save(self, record: dict):
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO jobs (id, record, status, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET record = excluded.record, status = excluded.status,
+                                              updated_at = excluded.updated_at
+            """, (record["id"], json.dumps(record, default=str), record["status"], time.time()))
+            self._conn.commit()
+
+    def load(self, job_id: str):
+        with self._lock:
+            row = self._conn.execute("SELECT record FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def request_cancel(self, job_id: str):
+        """Flag an unfinished job for cancellation; returns its last saved state, or None if unknown."""
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET cancel_requested = 1 WHERE id = ? "
+                               f"AND status NOT IN ({', '.join('?' * len(FINISHED_STATES))})",
+                               (job_id, *FINISHED_STATES))
+            self._conn.commit()
+        return self.load(job_id)
+
+    def cancel_requested(self, job_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def purge(self, cutoff: float):
+        """Drop jobs last updated before cutoff, including unfinished ones whose process has gone away."""
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE updated_at < ?", (cutoff,))
+            self._conn.commit()
+
+
+class JobManager:
+    """
+    Runs long generate/optimize requests on a bounded thread pool.
+    Handlers are called as handler(payload, progress) where progress(stage, **partial)
+    records intermediate results and raises JobCancelled once cancellation is requested.
+    Finished jobs are dropped after retention_seconds; submit() raises
+    JobQueueFull once max_pending jobs are waiting to start. With a JobStore, job state is
+    also visible to (and cancellable from) the other server processes sharing it.
+    """
+
+    def __init__(self, handlers: dict, max_workers=4, retention_seconds=3600, format_error=str, max_pending=100,
+                 store: JobStore = None):
+        self.handlers = handlers
+        self.store = store
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+        self.format_error = format_error
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="codeleaf-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+    def submit(self, kind: str, payload: dict) -> Job:
+        if kind not in self.handlers:
+            raise KeyError(kind)
+        job = Job(kind, payload)
+        with self._lock:
+            self._purge_locked()
+            pending = sum(1 for j in self._jobs.values() if j.status == QUEUED)
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"{pending} jobs already queued")
+            self._jobs[job.id] = job
+        self._save(job)
+        job.future = self._executor.submit(self._run, job)
+        return job
+
+    def _save(self, job: Job):
+        if self.store is not None:
+            # Snapshots are written in the order they were taken, so a stale one never wins
+            with self._save_lock:
+                with self._lock:
+                    record = job.to_dict()
+                self.store.save(record)
+
+    def _cancel_requested(self, job: Job) -> bool:
+        if self.store is not None and not job.cancel_requested and self.store.cancel_requested(job.id):
+            with self._lock:
+                job.cancel_requested = True
+        return job.cancel_requested
+
+    def _run(self, job: Job):
+        self._cancel_requested(job)
+        with self._lock:
+            if job.cancel_requested:
+                job.status = CANCELLED
+                job.finished_at = time.time()
+            else:
+                job.status = RUNNING
+                job.started_at = time.time()
+        self._save(job)
+        if job.status == CANCELLED:
+            return
+
+        def progress(stage, **partial):
+            with self._lock:
+                job.stage = stage
+                job.partial.update(partial)
+            self._save(job)
+            if self._cancel_requested(job):
+                raise JobCancelled()
+
+        try:
+            result = self.handlers[job.kind](job.payload, progress)
+            status, error = SUCCEEDED, None
+        except JobCancelled:
+            result, status, error = None, CANCELLED, None
+        except Exception as e:
+            result, status, error = None, FAILED, self.format_error(e)
+
+        with self._lock:
+            job.result = result
+            job.status = status
+            job.error = error
+            job.finished_at = time.time()
+        self._save(job)
+
+    def get(self, job_id: str):
+        with self._lock:
+            self._purge_locked()
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return job.to_dict()
+        return self.store.load(job_id) if self.store is not None else None
+
+    def cancel(self, job_id: str):
+        """Request cancellation; queued jobs never start, running jobs stop at the next stage."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.status not in FINISHED_STATES:
+                job.cancel_requested = True
+                if job.status == QUEUED and job.future is not None and job.future.cancel():
+                    job.status = CANCELLED
+                    job.finished_at = time.time()
+        if job is not None:
+            self._save(job)
+            return self.get(job_id)
+        # Owned by another server process: it stops the job at its next stage
+        return self.store.request_cancel(job_id) if self.store is not None else None
+
+    def _purge_locked(self):
+        cutoff = time.time() - self.retention_seconds
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.status in FINISHED_STATES and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+        if self.store is not None:
+            self.store.purge(cutoff)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return {"jobs": counts, "max_pending": self.max_pending, "retention_seconds": self.retention_seconds}
@@ -0,0 +1,119 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+# ====================== LLM Completion Cache ======================
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_cache.sqlite3")
+
+
+def completion_key(model: str, system_prompt: str, user_prompt: str, language: str, temperature=None,
+                   max_tokens=None) -> str:
+    """Content-addressed key for a completion request (default-temperature, uncapped keys are unchanged)."""
+    parts = [model, system_prompt, user_prompt, language.lower()]
+    if temperature is not None:
+        parts.append(round(float(temperature), 3))
+    if max_tokens is not None:
+        # A completion cut off at a smaller budget must not answer a request with a larger one
+        parts.append({"max_tokens": int(max_tokens)})
+    payload = json.dumps(parts, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """
+    SQLite-backed cache of LLM completions with TTL and LRU eviction.
+    Survives restarts; safe to share between Flask request threads.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=5000, max_bytes=64 * 1024 * 1024, ttl_seconds=7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                content TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_completions_last_access ON completions(last_access)")
+        self._conn.commit()
+
+    def get(self, key: str):
+        """Return the cached completion text, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT content, created_at FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            content, created_at = row
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                self._conn.commit()
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE completions SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return content
+
+    def put(self, key: str, content: str):
+        """Store a completion and evict least-recently-used entries over the limits."""
+        now = time.time()
+        size = len(content.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, content, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, content, size, now, now)
+            )
+            self._evict_locked(now)
+            self._conn.commit()
+
+    def _evict_locked(self, now: float):
+        if self.ttl_seconds:
+            cur = self._conn.execute("DELETE FROM completions WHERE created_at < ?", (now - self.ttl_seconds,))
+            self.evictions += max(cur.rowcount, 0)
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM completions ORDER BY last_access ASC").fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM completions")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": count,
+            "bytes": total,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,338 @@
+"""
+Long-lived Python measurement worker.
+
+Reads one JSON job per line on stdin and writes one JSON result per line on
+the original stdout. codecarbon's tracker is set up once at start-up so jobs don't pay
+interpreter, import or hardware-detection cost; each job is one codecarbon task.
+Each snippet runs in a fresh namespace, but all of them share the interpreter: a job that
+replaces a module, a builtin or a function the worker relies on gets the worker recycled.
+A job's "mode" selects a complexity profile or hotspot report instead of a measurement.
+"""
+import gc
+import io
+import os
+import sys
+import json
+import types
+import builtins
+import time
+import tracemalloc
+import logging
+import cProfile
+import threading
+import statistics
+import traceback
+import contextlib
+
+import psutil
+
+from benchmark import adaptive_benchmark, summarize, output_digest
+from complexity import synthesize_args
+from hotspots import LineSampler, function_hotspots, line_hotspots, SNIPPET_FILENAME, DEFAULT_TOP
+from energy import CodeCarbonSession, EnergyMeter, snapshot, self_usage, usage_delta, summarize_usage, reset_peak_rss, peak_rss_kb
+from isolation import isolated_self
+
+logging.getLogger("codecarbon").setLevel(logging.INFO)
+
+MAX_CAPTURED_OUTPUT = 64 * 1024
+# Smallest input size tried when probing how large an entry point's input can be
+PROBE_START_SIZE = 256
+PROCESS = psutil.Process()
+# One tracker for the worker's lifetime; every measurement is a task on it
+CODECARBON = CodeCarbonSession()
+# The protocol's own encoder and decoder, bound before any snippet can patch json.dumps / json.loads
+ENCODE_RESULT = json.JSONEncoder().encode
+DECODE_JOB = json.JSONDecoder().decode
+# Modules whose functions the worker itself calls while measuring and reporting
+GUARDED_MODULES = ("json", "json.encoder", "json.decoder", "io", "gc", "time", "statistics", "contextlib",
+                   "tracemalloc", "cProfile", "traceback", "psutil", "benchmark", "complexity", "hotspots",
+                   "energy", "isolation", __name__)
+
+
+def shared_state() -> tuple:
+    """
+    Identities of everything a snippet could swap out for later jobs: sys.modules, builtins,
+    and the functions and classes of the guarded modules. Plain data (counters, caches) is ignored.
+    """
+    guarded = {}
+    for name in GUARDED_MODULES:
+        module = sys.modules.get(name)
+        if module is not None:
+            guarded[name] = {key: id(value) for key, value in vars(module).items()
+                             if callable(value) or isinstance(value, types.ModuleType)}
+    return ({name: id(module) for name, module in list(sys.modules.items())},
+            {name: id(value) for name, value in vars(builtins).items()}, guarded)
+
+
+def call_entry_point(namespace: dict, function_name: str, entry_point, data_size: int):
+    func = namespace.get(function_name)
+    if callable(func):
+        if entry_point:
+            return func(*synthesize_args(entry_point["params"], data_size))
+        try:
+            return func(list(range(data_size)), data_size, data_size // 2)
+        except TypeError:
+            return func()
+    return None
+
+
+def probe_size(code, function_name: str, entry_point: dict, data_size: int, max_call_s: float) -> int:
+    """
+    Input size for an entry point: doubles from PROBE_START_SIZE up to data_size and stops at the last
+    size whose single call took at most max_call_s, so e.g. an O(n^2) pairs(n) is not run at n = 1,000,000.
+    """
+    namespace = {"__name__": "__codeleaf_probe__", "__builtins__": __builtins__}
+    n = previous = min(PROBE_START_SIZE, data_size)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            exec(code, namespace)
+            func = namespace.get(function_name)
+            if not callable(func):
+                return data_size
+            while True:
+                args = synthesize_args(entry_point["params"], n)
+                start = time.perf_counter()
+                func(*args)
+                if time.perf_counter() - start > max_call_s:
+                    return previous
+                if n >= data_size:
+                    return n
+                previous, n = n, min(2 * n, data_size)
+    except (Exception, SystemExit):
+        # The measurement itself reports the error
+        return n
+
+
+def run_job(job: dict) -> dict:
+    code = compile(job["code"], SNIPPET_FILENAME, "exec")
+    function_name = job.get("function_name", "dummy_function")
+    data_size = job.get("data_size", 1000)
+    entry_point = job.get("entry_point")
+    if entry_point and job.get("max_call_s"):
+        data_size = probe_size(code, function_name, entry_point, data_size, job["max_call_s"])
+    meter = EnergyMeter(**job.get("energy", {}))
+    outputs = []
+    returns = []
+    usages = []
+
+    def run_once():
+        # Fresh namespace per run so module-level state never leaks between runs
+        namespace = {"__name__": "__main__", "__builtins__": __builtins__}
+        captured = io.StringIO()
+        rss_before_kb = PROCESS.memory_info().rss / 1024
+        reset_peak_rss()
+        host_before, usage_before, start = snapshot(), self_usage(), time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(captured):
+                exec(code, namespace)
+                returned = call_entry_point(namespace, function_name, entry_point, data_size)
+            if len(returns) < 2:
+                returns.append(returned)
+        except SystemExit:
+            pass
+        finally:
+            usage = usage_delta(usage_before, self_usage())
+            peak_kb = peak_rss_kb()
+            usage.update(wall_s=time.perf_counter() - start, host=(host_before, snapshot()), max_rss_kb=peak_kb,
+                         rss_growth_kb=max(peak_kb - rss_before_kb, 0.0) if peak_kb is not None else None)
+            usages.append(usage)
+            if len(outputs) < 2:
+                outputs.append(captured.getvalue()[:MAX_CAPTURED_OUTPUT])
+
+    with CODECARBON.task() as codecarbon, isolated_self(job.get("isolation")) as isolation:
+        bench = adaptive_benchmark(run_once, **job.get("benchmark", {}))
+    codecarbon_kg = codecarbon["co2_kg"]
+
+    # Charge each run for this process's own CPU time (and memory growth); warm-up runs are excluded
+    usages = usages[len(bench["warmup_samples_s"]):][:len(bench["samples_s"])]
+    attributions = [meter.attribute(u["user_s"] + u["sys_s"], u["wall_s"], host=u["host"], memory_kb=u["rss_growth_kb"])
+                    for u in usages]
+    individual_runs = [a["co2_kg"] for a in attributions]
+    errors = bench.pop("errors")
+    for u in usages:
+        u.pop("host")
+
+    return {
+        "ok": not errors,
+        "emissions": statistics.fmean(individual_runs) if individual_runs else 0.0,
+        "duration_s": bench["mean_s"],
+        "individual_runs": individual_runs,
+        "benchmark": bench,
+        "resource_usage": summarize_usage(attributions, usages),
+        "codecarbon_co2_kg": codecarbon_kg / len(bench["samples_s"]) if bench["samples_s"] else codecarbon_kg,
+        "codecarbon_overhead_s": codecarbon["overhead_s"],
+        "memory": memory_profile(code, function_name, entry_point, data_size, usages) if job.get("trace_memory", True) else None,
+        "data_size": data_size,
+        "stdout": outputs[0] if outputs else "",
+        **output_fingerprints(outputs, returns),
+        "error": "; ".join(errors) if errors else None,
+        # Still at the isolated nice value: the pool replaces this worker
+        "recycle": not isolation["restored"]
+    }
+
+
+def output_fingerprints(outputs: list, returns: list) -> dict:
+    """
+    Digests of the first run's output with and without the return value, and whether the
+    second run reproduced each. Unstable output (e.g. a timestamp) can't be checked against.
+    """
+    combined = [output_digest(out, returns[i] if i < len(returns) else None) for i, out in enumerate(outputs)]
+    stdout = [output_digest(out) for out in outputs]
+    return {
+        "output_digest": combined[0] if combined else None,
+        "output_stable": combined[0] == combined[1] if len(combined) > 1 else None,
+        "stdout_digest": stdout[0] if stdout else None,
+        "stdout_stable": stdout[0] == stdout[1] if len(stdout) > 1 else None
+    }
+
+
+def profile_job(job: dict) -> dict:
+    """
+    Time the entry point alone at each input size (module code runs once, inputs are
+    built outside the timed region) for the empirical complexity profile.
+    Sizes stop growing once a call takes longer than max_point_s.
+    """
+    meter = EnergyMeter(**job.get("energy", {}))
+    entry_point = job["entry_point"]
+    namespace = {"__name__": "__codeleaf_profile__", "__builtins__": __builtins__}
+    with contextlib.redirect_stdout(io.StringIO()):
+        exec(compile(job["code"], SNIPPET_FILENAME, "exec"), namespace)
+    func = namespace[entry_point["name"]]
+    points, errors = [], []
+    stop_reason = "sizes"
+
+    with isolated_self(job.get("isolation")) as isolation:
+        for n in job["sizes"]:
+            usages = []
+
+            def call(args):
+                host_before, usage_before = snapshot(), self_usage()
+                # Like timeit: no garbage collection pauses inside the timed call
+                gc_was_enabled = gc.isenabled()
+                gc.disable()
+                start = time.perf_counter()
+                try:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        func(*args)
+                finally:
+                    wall_s = time.perf_counter() - start
+                    if gc_was_enabled:
+                        gc.enable()
+                    usage = usage_delta(usage_before, self_usage())
+                    usage.update(wall_s=wall_s, host=(host_before, snapshot()))
+                    usages.append(usage)
+
+            bench = adaptive_benchmark(call, setup=lambda: synthesize_args(entry_point["params"], n),
+                                       **job.get("benchmark", {}))
+            if bench["errors"]:
+                errors.extend(f"n={n}: {e}" for e in bench["errors"])
+                stop_reason = "error"
+                break
+            usages = usages[len(bench["warmup_samples_s"]):][:len(bench["samples_s"])]
+            attributions = [meter.attribute(u["user_s"] + u["sys_s"], u["wall_s"], host=u["host"]) for u in usages]
+            # Time the call alone, without the counter snapshots around it
+            timing = summarize([u["wall_s"] for u in usages])
+            points.append({
+                "n": n,
+                "runs": timing["runs"],
+                "time_s": timing["mean_s"],
+                "ci95_half_width_s": timing["ci95_half_width_s"],
+                "cpu_s": statistics.fmean(a["cpu_s"] for a in attributions),
+                "energy_j": statistics.fmean(a["energy_j"] for a in attributions),
+                "co2_kg": statistics.fmean(a["co2_kg"] for a in attributions)
+            })
+            if timing["mean_s"] > job.get("max_point_s", 0.5):
+                stop_reason = "max_point_s"
+                break
+
+    return {"ok": not errors, "points": points, "stop_reason": stop_reason,
+            "error": "; ".join(errors) if errors else None, "recycle": not isolation["restored"]}
+
+
+def memory_profile(code, function_name, entry_point, data_size, usages) -> dict:
+    """
+    Peak RSS of the measured runs, plus one extra untimed run under tracemalloc
+    (which slows execution too much to trace the timed runs) for allocation figures.
+    """
+    namespace = {"__name__": "__main__", "__builtins__": __builtins__}
+    blocks_before = sys.getallocatedblocks()
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            exec(code, namespace)
+            call_entry_point(namespace, function_name, entry_point, data_size)
+    except (Exception, SystemExit):
+        pass
+    finally:
+        retained_bytes, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    peaks = [u["max_rss_kb"] for u in usages if u.get("max_rss_kb") is not None]
+    growths = [u["rss_growth_kb"] for u in usages if u.get("rss_growth_kb") is not None]
+    return {
+        "peak_rss_kb": max(peaks) if peaks else None,
+        "peak_rss_growth_kb": max(growths) if growths else None,
+        "tracemalloc_peak_bytes": peak_bytes,
+        "tracemalloc_retained_bytes": retained_bytes,
+        # Blocks still allocated after the run, including the snippet's namespace
+        "allocated_blocks": sys.getallocatedblocks() - blocks_before
+    }
+
+
+def hotspot_job(job: dict) -> dict:
+    """One run under cProfile (functions) and a line sampler (lines), for the hotspot report."""
+    code = compile(job["code"], SNIPPET_FILENAME, "exec")
+    top = job.get("top", DEFAULT_TOP)
+    function_name = job.get("function_name", "dummy_function")
+    data_size = job.get("data_size", 1000)
+    if job.get("entry_point") and job.get("max_call_s"):
+        data_size = probe_size(code, function_name, job["entry_point"], data_size, job["max_call_s"])
+    namespace = {"__name__": "__main__", "__builtins__": __builtins__}
+    profiler = cProfile.Profile()
+    error = None
+    with contextlib.redirect_stdout(io.StringIO()), LineSampler(threading.get_ident()) as sampler:
+        profiler.enable()
+        try:
+            exec(code, namespace)
+            call_entry_point(namespace, function_name, job.get("entry_point"), data_size)
+        except SystemExit:
+            pass
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            profiler.disable()
+    return {"ok": error is None, "language": "python", "tool": "cProfile",
+            "functions": function_hotspots(profiler, top), "lines": line_hotspots(sampler.samples, job["code"], top),
+            "error": error}
+
+
+JOB_MODES = {"complexity": profile_job, "hotspots": hotspot_job}
+
+
+def main():
+    # Keep a private handle on the real stdout for the protocol, and point
+    # fd 1 / stdin at /dev/null so snippets can't corrupt the pipe or block on input().
+    proto_out = os.fdopen(os.dup(sys.stdout.fileno()), "w", buffering=1)
+    jobs_in = sys.stdin
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, sys.stdout.fileno())
+    sys.stdin = io.StringIO("")
+
+    CODECARBON.warm()
+    baseline = shared_state()
+    proto_out.write(ENCODE_RESULT({"ready": True, "pid": os.getpid()}) + "\n")
+    for line in jobs_in:
+        if not line.strip():
+            continue
+        try:
+            job = DECODE_JOB(line)
+            result = JOB_MODES.get(job.get("mode"), run_job)(job)
+        except Exception:
+            result = {"ok": False, "emissions": 0.0, "duration_s": 0.0, "stdout": "", "error": traceback.format_exc()}
+        if shared_state() != baseline:
+            # The snippet imported or patched something later jobs would inherit: the pool replaces this worker
+            result["recycle"] = True
+        proto_out.write(ENCODE_RESULT(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
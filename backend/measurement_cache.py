@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+# ====================== Measurement Result Cache ======================
+DEFAULT_MEASUREMENT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "measurement_cache.sqlite3")
+# Bump when a change to the measurement code makes earlier results incomparable
+ENGINE_VERSION = "1"
+
+
+def normalize_code(code: str) -> str:
+    """Line endings, trailing whitespace and surrounding blank lines don't change what code measures."""
+    lines = [line.rstrip() for line in code.replace("\r\n", "\n").replace("\r", "\n").split("\n")]
+    return "\n".join(lines).strip("\n")
+
+
+def host_profile(fingerprint: str, meter_settings: dict) -> str:
+    """Hash of the host and the energy model's parameters; recalibrating the host changes it."""
+    payload = json.dumps([fingerprint, meter_settings], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def measurement_key(code: str, language: str, params: dict, profile: str, engine_version=ENGINE_VERSION) -> str:
+    payload = json.dumps([normalize_code(code), language.lower(), params, profile, engine_version],
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MeasurementCache:
+    """
+    SQLite-backed cache of complete measurement records (CO2 and execution details,
+    with the benchmark's variance), with TTL and LRU eviction. Each entry remembers the
+    host profile it was measured under, so entries from another profile can be dropped.
+    """
+
+    def __init__(self, path=DEFAULT_MEASUREMENT_CACHE_PATH, max_entries=2000, ttl_seconds=7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS measurements (
+                key TEXT PRIMARY KEY,
+                host_profile TEXT NOT NULL,
+                language TEXT NOT NULL,
+                co2_kg REAL NOT NULL,
+                details TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_measurements_last_access ON measurements(last_access)")
+        self._conn.commit()
+
+    def get(self, key: str):
+        """Return (co2_kg, details, created_at), or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT co2_kg, details, created_at FROM measurements WHERE key = ?",
+                                     (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            co2_kg, details, created_at = row
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM measurements WHERE key = ?", (key,))
+                self._conn.commit()
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE measurements SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return co2_kg, json.loads(details), created_at
+
+    def put(self, key: str, profile: str, language: str, co2_kg: float, details: dict):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO measurements (key, host_profile, language, co2_kg, details, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, profile, language.lower(), co2_kg, json.dumps(details), now, now)
+            )
+            self._evict_locked(now)
+            self._conn.commit()
+
+    def retain_profile(self, profile: str) -> int:
+        """Drop every entry measured under a different host profile. Returns how many were dropped."""
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM measurements WHERE host_profile != ?", (profile,))
+            self._conn.commit()
+            dropped = max(cur.rowcount, 0)
+            self.invalidations += dropped
+        return dropped
+
+    def _evict_locked(self, now: float):
+        if self.ttl_seconds:
+            cur = self._conn.execute("DELETE FROM measurements WHERE created_at < ?", (now - self.ttl_seconds,))
+            self.evictions += max(cur.rowcount, 0)
+        count = self._conn.execute("SELECT COUNT(*) FROM measurements").fetchone()[0]
+        if count > self.max_entries:
+            cur = self._conn.execute(
+                "DELETE FROM measurements WHERE key IN (SELECT key FROM measurements ORDER BY last_access ASC LIMIT ?)",
+                (count - self.max_entries,))
+            self.evictions += max(cur.rowcount, 0)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM measurements")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM measurements").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": count,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "engine_version": ENGINE_VERSION,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
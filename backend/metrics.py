@@ -0,0 +1,123 @@
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+
+# ====================== Metrics & Request Tracing ======================
+# One registry per process; under a multi-worker WSGI server each worker exposes its own figures
+REGISTRY = CollectorRegistry(auto_describe=True)
+
+# Stages span sub-millisecond cache hits to multi-minute benchmarks
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+REQUEST_SECONDS = Histogram("codeleaf_request_duration_seconds", "HTTP request latency until the response is returned",
+                            ["endpoint", "method", "status"], buckets=STAGE_BUCKETS, registry=REGISTRY)
+REQUESTS_IN_FLIGHT = Gauge("codeleaf_requests_in_flight", "HTTP requests being handled", ["endpoint"],
+                           registry=REGISTRY)
+STAGE_SECONDS = Histogram("codeleaf_stage_duration_seconds", "Time spent in one stage of a request",
+                          ["stage", "language"], buckets=STAGE_BUCKETS, registry=REGISTRY)
+STAGES_IN_FLIGHT = Gauge("codeleaf_stages_in_flight", "Stages currently running", ["stage"], registry=REGISTRY)
+ERRORS = Counter("codeleaf_errors_total", "Failed stages by exception type", ["stage", "kind"], registry=REGISTRY)
+TIMEOUTS = Counter("codeleaf_timeouts_total", "Measured runs or worker jobs that hit their timeout", ["stage"],
+                   registry=REGISTRY)
+COMPILE_FAILURES = Counter("codeleaf_compile_failures_total", "C sources that did not compile", registry=REGISTRY)
+# Set from the measurement scheduler and node registry on each scrape of /metrics
+MEASUREMENTS_RUNNING = Gauge("codeleaf_measurements_running", "Measurements holding a slot", registry=REGISTRY)
+MEASUREMENT_QUEUE_DEPTH = Gauge("codeleaf_measurement_queue_depth", "Measurements waiting for a slot",
+                                registry=REGISTRY)
+MEASUREMENT_NODES = Gauge("codeleaf_measurement_nodes", "Registered remote measurement nodes", ["state"],
+                          registry=REGISTRY)
+LLM_COMPLETIONS = Counter("codeleaf_llm_completions_total", "LLM completions by cache outcome", ["cached"],
+                          registry=REGISTRY)
+LLM_TOKENS = Counter("codeleaf_llm_tokens_total", "Tokens sent to and generated by the LLM (uncached completions)",
+                     ["kind"], registry=REGISTRY)
+LLM_TRUNCATED = Counter("codeleaf_llm_truncated_total", "Completions cut off at their max_tokens budget",
+                        registry=REGISTRY)
+PROMPT_CHARS_SAVED = Counter("codeleaf_prompt_chars_saved_total", "Characters removed from prompts by minifying code",
+                             registry=REGISTRY)
+
+
+class Trace:
+    """Stage timings of one request, returned to the client when it asks for them."""
+
+    def __init__(self, trace_id=None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.started_at = time.perf_counter()
+        self.stages = []
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            self.stages.append((stage, seconds))
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            stages = list(self.stages)
+        totals = {}
+        for stage, seconds in stages:
+            totals[stage] = totals.get(stage, 0.0) + seconds
+        return {
+            "trace_id": self.trace_id,
+            "elapsed_s": time.perf_counter() - self.started_at,
+            # Stages can overlap (candidates run in parallel), so totals may exceed elapsed_s
+            "stage_totals_s": totals,
+            "stages": [{"stage": stage, "seconds": seconds} for stage, seconds in stages]
+        }
+
+
+_local = threading.local()
+
+
+def current_trace():
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def tracing(trace):
+    """Attribute the stages timed on this thread to `trace` (None detaches)."""
+    previous = current_trace()
+    _local.trace = trace
+    try:
+        yield trace
+    finally:
+        _local.trace = previous
+
+
+def traced(fn):
+    """Wrap fn so it runs under the calling thread's trace, for work handed to a thread pool."""
+    trace = current_trace()
+
+    def run(*args, **kwargs):
+        with tracing(trace):
+            return fn(*args, **kwargs)
+    return run
+
+
+def observe(stage: str, seconds: float, language: str = ""):
+    """Record a duration measured elsewhere (e.g. reported by a worker)."""
+    STAGE_SECONDS.labels(stage, language).observe(seconds)
+    trace = current_trace()
+    if trace is not None:
+        trace.record(stage, seconds)
+
+
+@contextmanager
+def stage(name: str, language: str = ""):
+    """Time a stage, count it as in flight while it runs, and count the exception if it fails."""
+    STAGES_IN_FLIGHT.labels(name).inc()
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        ERRORS.labels(name, type(e).__name__).inc()
+        raise
+    finally:
+        STAGES_IN_FLIGHT.labels(name).dec()
+        observe(name, time.perf_counter() - start, language)
+
+
+def render():
+    """(body, content type) of every metric in the Prometheus text exposition format."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
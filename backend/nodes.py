@@ -0,0 +1,270 @@
+import time
+import uuid
+import threading
+
+# ====================== Remote Measurement Nodes ======================
+# Protocol (JSON over HTTP; every call carries X-Node-Token when a token is configured):
+#   node -> coordinator  POST   /nodes/register     {"id"?, "url", "capacity", "host"}  -> {"id", "heartbeat_s"}
+#                        DELETE /nodes/<id>
+#   coordinator -> node  GET    /ping               health check
+#                        POST   /nodes/measure      {"code", "test_params", "language"} -> {"co2_kg", "details"}
+#                                                   or {"timeout"} when the code ran out of time
+#                                                   429 when the node's measurement slots are full
+# Registration doubles as the heartbeat: nodes re-register every heartbeat_s seconds.
+TOKEN_HEADER = "X-Node-Token"
+
+
+def _http():
+    # requests is imported only once nodes are in use, keeping it off the server's start-up path
+    import requests
+    return requests
+
+
+class NodeUnavailable(Exception):
+    """No registered node accepted the job."""
+
+
+class Node:
+    def __init__(self, node_id: str, url: str, capacity: int, host: dict):
+        self.id = node_id
+        self.url = url.rstrip("/")
+        self.capacity = max(int(capacity), 1)
+        self.host = host or {}
+        self.registered_at = time.time()
+        self.last_heartbeat = self.registered_at
+        self.healthy = True
+        self.failures = 0
+        self.in_flight = 0
+        self.jobs = 0
+        self.errors = 0
+        self.busy_rejections = 0
+
+    def load(self) -> float:
+        return self.in_flight / self.capacity
+
+    def summary(self) -> dict:
+        """What a measurement records about where it ran."""
+        return {"id": self.id, "url": self.url, "host_profile": self.host.get("profile")}
+
+    def to_dict(self) -> dict:
+        return {**self.summary(), "capacity": self.capacity, "host": self.host, "healthy": self.healthy,
+                "in_flight": self.in_flight, "jobs": self.jobs, "errors": self.errors,
+                "busy_rejections": self.busy_rejections, "consecutive_failures": self.failures,
+                "registered_at": self.registered_at, "last_heartbeat": self.last_heartbeat}
+
+
+class NodeRegistry:
+    """
+    Measurement nodes registered with this backend. Jobs go to the least loaded healthy node
+    (in-flight jobs relative to its advertised capacity) and move on to the next node when one
+    is busy or fails. A node is taken out of rotation after `max_failures` consecutive failed jobs
+    or health checks, returns once it answers a health check, and is forgotten when its
+    heartbeats stop for `expiry_s`.
+    """
+
+    def __init__(self, token=None, job_timeout_s=900, max_attempts=3, max_failures=2, heartbeat_s=10,
+                 expiry_s=60, health_interval_s=10, health_timeout_s=5):
+        self.token = token
+        self.job_timeout_s = job_timeout_s
+        self.max_attempts = max(int(max_attempts), 1)
+        self.max_failures = max(int(max_failures), 1)
+        self.heartbeat_s = heartbeat_s
+        self.expiry_s = expiry_s
+        self.health_interval_s = health_interval_s
+        self.health_timeout_s = health_timeout_s
+        self.dispatched = 0
+        self.retries = 0
+        self.unplaced = 0
+        self._nodes = {}
+        self._lock = threading.Lock()
+        self._session = None
+        self._stop = threading.Event()
+        self._health_thread = None
+
+    def _headers(self) -> dict:
+        return {TOKEN_HEADER: self.token} if self.token else {}
+
+    def _client(self):
+        if self._session is None:
+            self._session = _http().Session()
+        return self._session
+
+    def register(self, info: dict) -> Node:
+        """Add a node, or refresh a known one (its heartbeat)."""
+        url = str(info.get("url") or "").rstrip("/")
+        if not url.startswith(("http://", "https://")):
+            raise ValueError("'url' must be an http(s) URL the backend can reach")
+        with self._lock:
+            node = self._nodes.get(info.get("id")) or next((n for n in self._nodes.values() if n.url == url), None)
+            if node is None:
+                node = Node(info.get("id") or uuid.uuid4().hex[:12], url, info.get("capacity", 1), info.get("host"))
+                self._nodes[node.id] = node
+            else:
+                node.url = url
+                node.capacity = max(int(info.get("capacity", node.capacity)), 1)
+                node.host = info.get("host") or node.host
+                node.last_heartbeat = time.time()
+            return node
+
+    def deregister(self, node_id: str) -> bool:
+        with self._lock:
+            return self._nodes.pop(node_id, None) is not None
+
+    def has_nodes(self) -> bool:
+        with self._lock:
+            return any(node.healthy for node in self._nodes.values())
+
+    def _claim(self, tried: set, only=None):
+        """Reserve a slot on the best untried healthy node with free capacity (or on node `only`), or None."""
+        with self._lock:
+            candidates = [n for n in self._nodes.values()
+                          if n.healthy and n.id not in tried and n.in_flight < n.capacity and only in (None, n.id)]
+            if not candidates:
+                return None
+            candidates.sort(key=lambda n: (n.load(), n.jobs))
+            node = candidates[0]
+            node.in_flight += 1
+            return node
+
+    def _release(self, node: Node, ok: bool, busy=False):
+        with self._lock:
+            node.in_flight -= 1
+            if ok:
+                node.jobs += 1
+                node.failures = 0
+            elif busy:
+                node.busy_rejections += 1
+            else:
+                node.errors += 1
+                node.failures += 1
+                if node.failures >= self.max_failures:
+                    node.healthy = False
+
+    def dispatch(self, payload: dict, only=None):
+        """
+        Run a measurement job on a node, trying up to max_attempts nodes, or only on node `only`
+        (e.g. the one that measured the code being compared against).
+        Returns (response body, node); raises NodeUnavailable when none took it.
+        """
+        http = _http()
+        tried, errors = set(), []
+        for attempt in range(self.max_attempts):
+            node = self._claim(tried, only)
+            if node is None:
+                break
+            tried.add(node.id)
+            if attempt:
+                self.retries += 1
+            try:
+                response = self._client().post(f"{node.url}/nodes/measure", json=payload, headers=self._headers(),
+                                               timeout=self.job_timeout_s)
+            except http.RequestException as e:
+                self._release(node, ok=False)
+                errors.append(f"{node.id}: {type(e).__name__}: {e}")
+                continue
+            if response.status_code == 429:
+                self._release(node, ok=False, busy=True)
+                errors.append(f"{node.id}: busy")
+                continue
+            if response.status_code != 200:
+                self._release(node, ok=False)
+                errors.append(f"{node.id}: HTTP {response.status_code}")
+                continue
+            self._release(node, ok=True)
+            self.dispatched += 1
+            return response.json(), node
+        self.unplaced += 1
+        raise NodeUnavailable("; ".join(errors) or "no healthy node with free capacity")
+
+    def check_health(self):
+        """One round of health checks; also forgets nodes whose heartbeats stopped."""
+        now = time.time()
+        with self._lock:
+            for node_id in [n.id for n in self._nodes.values() if now - n.last_heartbeat > self.expiry_s]:
+                del self._nodes[node_id]
+            nodes = list(self._nodes.values())
+        if not nodes:
+            return
+        http = _http()
+        for node in nodes:
+            try:
+                ok = self._client().get(f"{node.url}/ping", timeout=self.health_timeout_s).status_code == 200
+            except http.RequestException:
+                ok = False
+            with self._lock:
+                if ok:
+                    node.healthy, node.failures = True, 0
+                else:
+                    node.failures += 1
+                    if node.failures >= self.max_failures:
+                        node.healthy = False
+
+    def start_health_checks(self):
+        def loop():
+            while not self._stop.wait(self.health_interval_s):
+                try:
+                    self.check_health()
+                except Exception as e:
+                    print(f"Node health check failed: {e}")
+
+        self._health_thread = threading.Thread(target=loop, name="node-health", daemon=True)
+        self._health_thread.start()
+
+    def shutdown(self):
+        self._stop.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            nodes = [node.to_dict() for node in self._nodes.values()]
+        return {
+            "nodes": nodes,
+            "healthy": sum(1 for node in nodes if node["healthy"]),
+            "capacity": sum(node["capacity"] for node in nodes if node["healthy"]),
+            "dispatched": self.dispatched,
+            "retries": self.retries,
+            "unplaced": self.unplaced
+        }
+
+
+class NodeAgent:
+    """Node side of the protocol: registers with the coordinator and keeps re-registering as a heartbeat."""
+
+    def __init__(self, coordinator_url: str, info, token=None, interval_s=10):
+        self.coordinator_url = coordinator_url.rstrip("/")
+        self.info = info  # callable returning {"url", "capacity", "host"}
+        self.token = token
+        self.interval_s = interval_s
+        self.node_id = None
+        self._stop = threading.Event()
+
+    def _headers(self) -> dict:
+        return {TOKEN_HEADER: self.token} if self.token else {}
+
+    def heartbeat(self):
+        response = _http().post(f"{self.coordinator_url}/nodes/register", json={**self.info(), "id": self.node_id},
+                                 headers=self._headers(), timeout=10)
+        response.raise_for_status()
+        body = response.json()
+        self.node_id = body["id"]
+        self.interval_s = body.get("heartbeat_s", self.interval_s)
+
+    def start(self):
+        def loop():
+            while True:
+                try:
+                    self.heartbeat()
+                except (_http().RequestException, ValueError, KeyError) as e:
+                    print(f"Could not register with coordinator {self.coordinator_url}: {e}")
+                if self._stop.wait(self.interval_s):
+                    return
+
+        threading.Thread(target=loop, name="node-agent", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        if self.node_id:
+            http = _http()
+            try:
+                http.delete(f"{self.coordinator_url}/nodes/{self.node_id}", headers=self._headers(), timeout=5)
+            except http.RequestException:
+                pass
@@ -0,0 +1,148 @@
+import io
+import ast
+import math
+import tokenize
+
+# ====================== Prompt Preparation ======================
+# Code pasted into a prompt is minified first: comments, docstrings, blank lines and trailing
+# whitespace cost input tokens (and latency) without telling the model anything it needs.
+# Line structure is otherwise kept, so the result still runs and reads like the original.
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token) for when the model reports no usage."""
+    return math.ceil(len(text or "") / 4)
+
+
+def output_token_budget(language: str, budgets: dict, default: int, code=None, ceiling=None) -> int:
+    """
+    max_tokens for a completion: the language's budget, raised for long input code so a
+    rewrite has room for about twice the code's size, and capped at `ceiling`.
+    """
+    budget = budgets.get(language.lower(), default)
+    if code:
+        budget = max(budget, 2 * estimate_tokens(code))
+    return min(budget, ceiling) if ceiling else budget
+
+
+def _docstrings(tree):
+    """(owner node, docstring statement) for every module, class and function docstring, in walk order."""
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)) and node.body:
+            first = node.body[0]
+            if isinstance(first, ast.Expr) and isinstance(first.value, ast.Constant) \
+                    and isinstance(first.value.value, str):
+                yield node, first
+
+
+def _compact_lines(lines: list, keep) -> tuple:
+    """Drop blank lines unless keep(row) says otherwise; returns (lines, {original row: new row})."""
+    kept, line_map = [], {}
+    for row, line in enumerate(lines, 1):
+        if line.strip() or keep(row):
+            kept.append(line)
+            line_map[row] = len(kept)
+    return kept, line_map
+
+
+def minify_python(code: str):
+    """
+    Python without comments, docstrings, blank lines or trailing whitespace.
+    Returns (code, line_map), or None when the code does not parse or minifying would change its AST.
+    """
+    try:
+        tree, reference = ast.parse(code), ast.parse(code)
+    except SyntaxError:
+        return None
+    lines = code.split("\n")
+
+    # Docstrings that occupy whole lines are removed; `pass` keeps a docstring-only body valid
+    for (_, doc), (ref_owner, ref_doc) in zip(list(_docstrings(tree)), list(_docstrings(reference))):
+        first, last = lines[doc.lineno - 1].encode("utf-8"), lines[doc.end_lineno - 1].encode("utf-8")
+        if first[:doc.col_offset].strip() or last[doc.end_col_offset:].strip():
+            continue
+        indent = first[:doc.col_offset].decode("utf-8")
+        only_statement = len(ref_owner.body) == 1
+        for row in range(doc.lineno, doc.end_lineno + 1):
+            lines[row - 1] = ""
+        if only_statement and not isinstance(ref_owner, ast.Module):
+            lines[doc.lineno - 1] = indent + "pass"
+        ref_owner.body.remove(ref_doc)
+        if only_statement and not isinstance(ref_owner, ast.Module):
+            ref_owner.body.append(ast.Pass())
+
+    # Comments go; rows inside multi-line strings are kept byte for byte
+    protected = set()
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO("\n".join(lines)).readline):
+            if tok.type == tokenize.COMMENT:
+                row, col = tok.start
+                lines[row - 1] = lines[row - 1][:col]
+            elif tok.start[0] != tok.end[0]:
+                protected.update(range(tok.start[0], tok.end[0] + 1))
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        return None
+    lines = [line if row in protected else line.rstrip() for row, line in enumerate(lines, 1)]
+    kept, line_map = _compact_lines(lines, lambda row: row in protected)
+    minified = "\n".join(kept)
+
+    try:
+        if ast.dump(ast.parse(minified)) != ast.dump(reference):
+            return None
+    except SyntaxError:
+        return None
+    return minified, line_map
+
+
+def minify_c(code: str):
+    """
+    C without comments, blank lines or trailing whitespace. Each comment becomes a space, so
+    tokens on either side stay apart. Returns (code, line_map), or None on an unterminated
+    string, character literal or comment.
+    """
+    out, i, n = [], 0, len(code)
+    while i < n:
+        ch = code[i]
+        if ch in "\"'":
+            j = i + 1
+            while j < n and code[j] != ch:
+                if code[j] == "\n":
+                    return None
+                j += 2 if code[j] == "\\" else 1
+            if j >= n:
+                return None
+            out.append(code[i:j + 1])
+            i = j + 1
+        elif code.startswith("//", i):
+            # A backslash-newline continues a line comment onto the next line
+            j = i
+            while j < n and not (code[j] == "\n" and code[j - 1] != "\\"):
+                j += 1
+            out.append(" " + "\n" * code.count("\n", i, j))
+            i = j
+        elif code.startswith("/*", i):
+            j = code.find("*/", i + 2)
+            if j < 0:
+                return None
+            out.append(" " + "\n" * code.count("\n", i, j))
+            i = j + 2
+        else:
+            out.append(ch)
+            i += 1
+
+    lines = [line.rstrip() for line in "".join(out).split("\n")]
+    # A blank line after a backslash-continued line (e.g. in a macro) ends the continuation; keep it
+    kept, line_map = _compact_lines(lines, lambda row: row > 1 and lines[row - 2].endswith("\\"))
+    return "\n".join(kept), line_map
+
+
+def minify_code(code: str, language: str):
+    """
+    Returns (code to put in the prompt, line_map from original to minified line numbers).
+    Languages without a minifier, and code a minifier cannot handle, come back unchanged
+    (line endings normalized) with a line_map of None.
+    """
+    code = code.replace("\r\n", "\n").replace("\r", "\n").strip("\n")
+    minifier = {"python": minify_python, "c": minify_c}.get(language.lower())
+    result = minifier(code) if minifier else None
+    return result if result is not None else (code, None)
@@ -0,0 +1,160 @@
+import os
+import math
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: slots are only enforced within one process
+    fcntl = None
+
+# ====================== Measurement Admission Control ======================
+class SchedulerSaturated(Exception):
+    """Every slot is busy and the wait queue is full."""
+    def __init__(self, retry_after: int):
+        super().__init__(f"Measurement capacity exhausted; retry in {retry_after} s")
+        self.retry_after = retry_after
+
+
+class MeasurementScheduler:
+    """
+    Caps concurrent measurements at `slots` and queues up to `max_queue`
+    waiters in FIFO order; beyond that, slot() raises SchedulerSaturated
+    unless the caller opts to wait. When lock_dir is set, slots are also
+    claimed as file locks so several server processes on one host share
+    the same budget; a caller that can't get one within host_wait_s is
+    rejected too (background work waits as long as it takes).
+    """
+
+    def __init__(self, slots: int, max_queue: int, lock_dir=None, host_wait_s=30.0):
+        self.slots = max(int(slots), 1)
+        self.max_queue = max(int(max_queue), 0)
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self.host_wait_s = host_wait_s
+        self._cond = threading.Condition()
+        self._running = 0
+        # Holding a slot here while waiting for a host-wide one (another process has them all)
+        self._host_waiting = 0
+        self._waiters = deque()
+        self._local = threading.local()
+        self.admitted = 0
+        self.rejected = 0
+        self.host_wait_timeouts = 0
+        self._wait_times = deque(maxlen=500)
+        self._run_times = deque(maxlen=500)
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    @contextmanager
+    def waiting(self):
+        """Within this block, slot() queues without a depth limit instead of rejecting (background work)."""
+        previous = getattr(self._local, "wait", False)
+        self._local.wait = True
+        try:
+            yield
+        finally:
+            self._local.wait = previous
+
+    def retry_after(self) -> int:
+        """Seconds until a newly queued request would likely start."""
+        with self._cond:
+            return self._retry_after_locked()
+
+    @contextmanager
+    def slot(self):
+        """Hold one measurement slot for the duration of the block; yields the seconds spent waiting."""
+        if getattr(self._local, "held", False):
+            # Re-entrant: nested measurements reuse the caller's slot
+            yield 0.0
+            return
+        wait_start = time.perf_counter()
+        ticket = object()
+        with self._cond:
+            if self._running >= self.slots or self._waiters:
+                if len(self._waiters) >= self.max_queue and not getattr(self._local, "wait", False):
+                    self.rejected += 1
+                    raise SchedulerSaturated(self._retry_after_locked())
+                self._waiters.append(ticket)
+                while self._running >= self.slots or self._waiters[0] is not ticket:
+                    self._cond.wait()
+                self._waiters.popleft()
+            self._running += 1
+            self.admitted += 1
+            self._cond.notify_all()
+
+        lock_file = None
+        try:
+            lock_file = self._acquire_host_slot(wait=getattr(self._local, "wait", False))
+            waited = time.perf_counter() - wait_start
+            run_start = time.perf_counter()
+            self._local.held = True
+            try:
+                yield waited
+            finally:
+                self._local.held = False
+                run_time = time.perf_counter() - run_start
+                with self._cond:
+                    self._wait_times.append(waited)
+                    self._run_times.append(run_time)
+        finally:
+            if lock_file is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+            with self._cond:
+                self._running -= 1
+                self._cond.notify_all()
+
+    def _retry_after_locked(self) -> int:
+        run_times = list(self._run_times)
+        mean_run = sum(run_times) / len(run_times) if run_times else 1.0
+        return max(1, math.ceil(mean_run * (len(self._waiters) + 1) / self.slots))
+
+    def _acquire_host_slot(self, wait=False):
+        """
+        Claim one of the host-wide slot files, polling until one is free. Raises SchedulerSaturated
+        after host_wait_s unless the caller waits without limit.
+        """
+        if not self.lock_dir:
+            return None
+        deadline = None if wait else time.monotonic() + self.host_wait_s
+        with self._cond:
+            self._host_waiting += 1
+        try:
+            while True:
+                for index in range(self.slots):
+                    f = open(os.path.join(self.lock_dir, f"slot-{index}.lock"), "a")
+                    try:
+                        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        return f
+                    except OSError:
+                        f.close()
+                if deadline is not None and time.monotonic() > deadline:
+                    with self._cond:
+                        self.rejected += 1
+                        self.host_wait_timeouts += 1
+                        raise SchedulerSaturated(self._retry_after_locked())
+                time.sleep(0.05)
+        finally:
+            with self._cond:
+                self._host_waiting -= 1
+
+    def stats(self) -> dict:
+        with self._cond:
+            wait_times = sorted(self._wait_times)
+            stats = {
+                "slots": self.slots,
+                # Only measurements that also hold a host-wide slot are actually running
+                "running": self._running - self._host_waiting,
+                "queue_depth": len(self._waiters),
+                "host_waiting": self._host_waiting,
+                "host_wait_timeouts": self.host_wait_timeouts,
+                "max_queue": self.max_queue,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "host_wide": self.lock_dir is not None
+            }
+        stats["wait_s_mean"] = sum(wait_times) / len(wait_times) if wait_times else 0.0
+        stats["wait_s_p95"] = wait_times[math.ceil(0.95 * len(wait_times)) - 1] if wait_times else 0.0
+        return stats
@@ -0,0 +1,94 @@
+import time
+import threading
+from contextlib import contextmanager
+
+# ====================== Start-up Timing & Readiness ======================
+PENDING = "pending"
+WARMING = "warming"
+READY = "ready"
+FAILED = "failed"
+DISABLED = "disabled"
+
+
+class StartupReport:
+    """Durations of the named phases of module start-up, for tracking import regressions."""
+
+    def __init__(self, started_at: float):
+        self.started_at = started_at
+        self.phases = []
+        self._last = started_at
+
+    def mark(self, name: str):
+        """Record the time since the previous mark (or process start) as a phase."""
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self.phases.append((name, now - start))
+            self._last = now
+
+    def to_dict(self) -> dict:
+        return {
+            "phases": [{"name": name, "seconds": seconds} for name, seconds in self.phases],
+            "total_s": self._last - self.started_at
+        }
+
+    def format(self) -> str:
+        lines = [f"  {name:<24}{seconds * 1000:9.1f} ms" for name, seconds in self.phases]
+        lines.append(f"  {'total':<24}{(self._last - self.started_at) * 1000:9.1f} ms")
+        return "\n".join(lines)
+
+
+class Readiness:
+    """Tracks which subsystems are warm, so a readiness probe can report them."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subsystems = {}
+
+    def register(self, name: str, status: str = PENDING):
+        with self._lock:
+            self._subsystems[name] = {"status": status, "seconds": None, "error": None}
+
+    def mark(self, name: str, status: str, seconds=None, error=None):
+        with self._lock:
+            entry = self._subsystems.setdefault(name, {"status": PENDING, "seconds": None, "error": None})
+            entry.update(status=status, seconds=seconds, error=error)
+
+    def used(self, name: str):
+        """A subsystem that just worked in real use is ready, even if it was never warmed."""
+        with self._lock:
+            entry = self._subsystems.get(name)
+            if entry is not None and entry["status"] not in (READY, DISABLED):
+                entry.update(status=READY, error=None)
+
+    def warm(self, name: str, fn, background: bool = True):
+        """Run fn to warm a subsystem, recording its status and duration."""
+        def run():
+            self.mark(name, WARMING)
+            start = time.perf_counter()
+            try:
+                fn()
+            except Exception as e:
+                print(f"Warm-up of {name} failed: {e}")
+                self.mark(name, FAILED, time.perf_counter() - start, str(e))
+            else:
+                self.mark(name, READY, time.perf_counter() - start)
+
+        if background:
+            threading.Thread(target=run, name=f"warmup-{name}", daemon=True).start()
+        else:
+            run()
+
+    def status(self) -> dict:
+        with self._lock:
+            subsystems = {name: dict(entry) for name, entry in self._subsystems.items()}
+        ready = all(entry["status"] in (READY, DISABLED) for entry in subsystems.values())
+        return {"ready": ready, "subsystems": subsystems}
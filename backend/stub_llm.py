@@ -0,0 +1,125 @@
+"""
+Local stand-in for the Hugging Face chat-completion endpoint, for offline benchmarks.
+
+Serves POST /v1/chat/completions (plain and streamed) in the format
+InferenceClient.chat_completion expects, after a configurable latency.
+Point the backend at it with HF_MODEL=http://127.0.0.1:<port> and any HF_TOKEN.
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = "def dummy_function():\n    return sum(range(1000))\n"
+
+
+class StubLLM:
+    """
+    Reply policy and latency model. `responder(messages)` returns the completion text;
+    each request waits latency_s (+ uniform jitter_s) and streamed replies spread
+    that wait across their chunks.
+    """
+
+    def __init__(self, responder=None, latency_s=0.2, jitter_s=0.0, chunk_chars=16, seed=0):
+        self.responder = responder or (lambda messages: DEFAULT_REPLY)
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self.chunk_chars = chunk_chars
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self) -> float:
+        with self._lock:
+            self.requests += 1
+            return self.latency_s + (self._random.uniform(0, self.jitter_s) if self.jitter_s else 0.0)
+
+
+def _handler_for(stub: StubLLM):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, status: int, body: dict):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/v1/chat/completions"):
+                self._send_json(404, {"error": f"Unknown path {self.path}"})
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            messages = request.get("messages", [])
+            content = stub.responder(messages)
+            delay = stub.delay()
+            created = int(time.time())
+            model = request.get("model") or "stub"
+            # Token counts at about four characters per token; replies are cut off at max_tokens
+            finish_reason = "stop"
+            if request.get("max_tokens") and len(content) > request["max_tokens"] * 4:
+                content, finish_reason = content[:request["max_tokens"] * 4], "length"
+            prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4
+            completion_tokens = (len(content) + 3) // 4
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                     "total_tokens": prompt_tokens + completion_tokens}
+
+            if not request.get("stream"):
+                time.sleep(delay)
+                self._send_json(200, {
+                    "id": "stub", "object": "chat.completion", "created": created, "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                 "finish_reason": finish_reason}],
+                    "usage": usage
+                })
+                return
+
+            chunks = [content[i:i + stub.chunk_chars] for i in range(0, len(content), stub.chunk_chars)] or [""]
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for index, chunk in enumerate(chunks):
+                time.sleep(delay / len(chunks))
+                event = {"id": "stub", "object": "chat.completion.chunk", "created": created, "model": model,
+                         "choices": [{"index": 0, "delta": {"role": "assistant", "content": chunk},
+                                      "finish_reason": finish_reason if index == len(chunks) - 1 else None}]}
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            if (request.get("stream_options") or {}).get("include_usage"):
+                event = {"id": "stub", "object": "chat.completion.chunk", "created": created, "model": model,
+                         "choices": [], "usage": usage}
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+
+    return Handler
+
+
+def start_stub_server(stub: StubLLM, host="127.0.0.1", port=0):
+    """Serve the stub on a background thread. Returns (server, base_url); call server.shutdown() to stop."""
+    server = ThreadingHTTPServer((host, port), _handler_for(stub))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-llm", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub chat-completion server for offline runs")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per completion")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra uniform random latency, seconds")
+    args = parser.parse_args()
+    server, url = start_stub_server(StubLLM(latency_s=args.latency, jitter_s=args.jitter), port=args.port)
+    print(f"Stub LLM listening on {url} (set HF_MODEL={url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
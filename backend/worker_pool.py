@@ -0,0 +1,173 @@
+import os
+import sys
+import json
+import time
+import queue
+import threading
+import subprocess
+
+# ====================== Python Measurement Worker Pool ======================
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "measure_worker.py")
+
+
+class WorkerCrashed(Exception):
+    pass
+
+
+class WorkerTimeout(Exception):
+    pass
+
+
+class _Worker:
+    """One pre-warmed interpreter speaking line-delimited JSON over pipes."""
+
+    def __init__(self):
+        self.jobs_done = 0
+        self.retire = False
+        self.proc = subprocess.Popen(
+            [sys.executable, "-u", WORKER_SCRIPT],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1
+        )
+        self._lines = queue.Queue()
+        self.ready = threading.Event()
+        # A reader thread keeps timeouts portable (select() doesn't work on pipes on Windows)
+        threading.Thread(target=self._read_loop, daemon=True).start()
+
+    def _read_loop(self):
+        for line in self.proc.stdout:
+            if not self.ready.is_set():
+                # The first line is the worker's start-up handshake
+                self.ready.set()
+                continue
+            self._lines.put(line)
+        self._lines.put(None)
+
+    def _read(self, timeout):
+        try:
+            line = self._lines.get(timeout=timeout)
+        except queue.Empty:
+            raise WorkerTimeout(f"worker {self.proc.pid} did not answer within {timeout} s")
+        if line is None:
+            try:
+                code = self.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                code = None
+            raise WorkerCrashed(f"worker {self.proc.pid} exited with code {code}")
+        try:
+            result = json.loads(line)
+        except ValueError:
+            result = None
+        if not isinstance(result, dict):
+            # A snippet broke the worker's side of the protocol; nothing it sends can be trusted now
+            raise WorkerCrashed(f"worker {self.proc.pid} sent an unreadable reply: {line[:200]!r}")
+        return result
+
+    def wait_ready(self, timeout):
+        deadline = time.monotonic() + timeout
+        while not self.ready.wait(0.1):
+            if not self.alive():
+                raise WorkerCrashed(f"worker {self.proc.pid} exited during start-up with code {self.proc.poll()}")
+            if time.monotonic() > deadline:
+                raise WorkerTimeout(f"worker {self.proc.pid} did not start within {timeout} s")
+
+    def run(self, job: dict, timeout: float) -> dict:
+        try:
+            self.proc.stdin.write(json.dumps(job) + "\n")
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise WorkerCrashed(str(e))
+        result = self._read(timeout)
+        self.jobs_done += 1
+        # The worker could not undo a job's isolation (e.g. its raised nice value), or the job
+        # changed modules or builtins that later jobs would share
+        self.retire = self.retire or bool(result.get("recycle"))
+        return result
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def kill(self):
+        if self.alive():
+            self.proc.kill()
+        try:
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+
+
+class PythonWorkerPool:
+    """
+    Pool of long-lived Python workers with codecarbon already imported.
+    Workers are recycled after max_jobs jobs, on crash (including an unreadable reply), on timeout,
+    when a job's isolation could not be undone, or when a job changed the interpreter's shared state.
+    """
+
+    def __init__(self, size=2, max_jobs=50, startup_timeout=120):
+        self.size = size
+        self.max_jobs = max_jobs
+        self.startup_timeout = startup_timeout
+        self.recycled = 0
+        self.crashes = 0
+        self.timeouts = 0
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(_Worker())
+
+    def run(self, job: dict, timeout: float = 300) -> dict:
+        """
+        Run one job on an idle worker; blocks until a worker is free.
+        A crash comes back as an error result; a timeout replaces the worker and raises WorkerTimeout.
+        """
+        worker = self._idle.get()
+        try:
+            worker.wait_ready(self.startup_timeout)
+            result = worker.run(job, timeout)
+        except WorkerTimeout:
+            self.timeouts += 1
+            worker.kill()
+            worker = _Worker()
+            raise
+        except WorkerCrashed as e:
+            self.crashes += 1
+            worker.kill()
+            worker = _Worker()
+            return {"ok": False, "emissions": 0.0, "duration_s": 0.0, "stdout": "", "error": str(e)}
+        finally:
+            if worker.jobs_done >= self.max_jobs or worker.retire or not worker.alive():
+                self.recycled += 1
+                worker.kill()
+                worker = _Worker()
+            self._idle.put(worker)
+        return result
+
+    def wait_ready(self, timeout=None):
+        """Block until every idle worker has finished start-up (used for warm-up)."""
+        deadline = time.monotonic() + (timeout or self.startup_timeout)
+        while True:
+            with self._idle.mutex:
+                workers = list(self._idle.queue)
+            if all(worker.ready.is_set() for worker in workers):
+                return
+            if time.monotonic() > deadline:
+                raise WorkerTimeout(f"python workers did not start within {timeout or self.startup_timeout} s")
+            time.sleep(0.1)
+
+    def shutdown(self):
+        while True:
+            try:
+                self._idle.get_nowait().kill()
+            except queue.Empty:
+                break
+
+    def stats(self) -> dict:
+        with self._idle.mutex:
+            ready = sum(1 for worker in self._idle.queue if worker.ready.is_set())
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize(),
+            "ready_idle": ready,
+            "max_jobs_per_worker": self.max_jobs,
+            "recycled": self.recycled,
+            "crashes": self.crashes,
+            "timeouts": self.timeouts
+        }
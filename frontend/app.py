@@ -1,6 +1,7 @@
 import streamlit as st
 import requests
 import json
+import time
 import pandas as pd
 from datetime import datetime
 from streamlit_option_menu import option_menu
@@ -43,8 +44,8 @@ light_theme = {
 # ======================
 # Session State Initialization
 # ======================
-if "history" not in st.session_state:
-    st.session_state.history = []
+if "loaded_runs" not in st.session_state:
+    st.session_state.loaded_runs = set()
 if "language" not in st.session_state:
     st.session_state.language = "python"
 # Initialize theme state
@@ -52,6 +53,182 @@ if "theme" not in st.session_state:
     st.session_state.theme = "dark"
 
 
+# ======================
+# Backend Job Helpers
+# ======================
+BACKEND_URL = "http://127.0.0.1:5000"
+JOB_STAGE_LABELS = {
+    "llm": "asking the model",
+    "measure": "measuring emissions",
+    "measure_before": "measuring the original code",
+    "profile": "profiling hotspots",
+    "measure_after": "measuring the optimized code",
+    "compiler_flags": "exploring compiler flags"
+}
+
+
+def run_backend_job(job_type, payload, status_placeholder, poll_interval=1.0, timeout=900):
+    """Submit a background job and poll it until it finishes; returns the final payload."""
+    r = requests.post(f"{BACKEND_URL}/jobs", json={"type": job_type, **payload}, timeout=10)
+    if r.status_code >= 400:
+        raise RuntimeError(r.json().get("error", r.text))
+    job_id = r.json()["id"]
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        time.sleep(poll_interval)
+        job = requests.get(f"{BACKEND_URL}/jobs/{job_id}", timeout=10).json()
+        if job.get("status") == "succeeded":
+            status_placeholder.empty()
+            return job["result"]
+        if job.get("status") in ("failed", "cancelled"):
+            status_placeholder.empty()
+            raise RuntimeError(job.get("error") or f"Job {job['status']}")
+        status_placeholder.caption(f"⏳ {job.get('status', 'queued').capitalize()}: {JOB_STAGE_LABELS.get(job.get('stage'), 'waiting for a worker')}...")
+
+    requests.delete(f"{BACKEND_URL}/jobs/{job_id}", timeout=10)
+    status_placeholder.empty()
+    raise TimeoutError(f"Job did not finish within {timeout} s and was cancelled.")
+
+
+def benchmark_summary(details):
+    """One-line summary of the backend's benchmark statistics, or None."""
+    bench = (details or {}).get("benchmark")
+    if not bench or not bench.get("runs"):
+        return None
+    summary = f"{bench['runs']} runs · median {bench['median_s'] * 1000:.2f} ms · σ {bench['stddev_s'] * 1000:.2f} ms"
+    if bench.get("rel_ci95") is not None:
+        summary += f" · 95% CI ±{bench['rel_ci95'] * 100:.1f}%"
+    if bench.get("outliers"):
+        summary += f" · {bench['outliers']} outlier(s)"
+    return summary
+
+
+def memory_summary(details):
+    """One-line summary of peak memory (and traced allocations for Python), or None."""
+    memory = (details or {}).get("memory")
+    if not memory or memory.get("peak_rss_kb") is None:
+        return None
+    summary = f"Peak RSS {memory['peak_rss_kb'] / 1024:.1f} MiB"
+    if memory.get("peak_rss_growth_kb") is not None:
+        summary += f" (+{memory['peak_rss_growth_kb'] / 1024:.1f} MiB during the run)"
+    if memory.get("tracemalloc_peak_bytes") is not None:
+        summary += f" · traced peak {memory['tracemalloc_peak_bytes'] / 1024 ** 2:.2f} MiB"
+    return summary
+
+
+def complexity_summary(details):
+    """One-line summary of the fitted scaling curve and its largest extrapolation, or None."""
+    profile = (details or {}).get("complexity")
+    if not profile or not profile.get("time", {}).get("model"):
+        return None
+    summary = f"Scaling of {profile['entry_point']}(): time {profile['time']['model']}"
+    if profile.get("energy", {}).get("model"):
+        summary += f", energy {profile['energy']['model']}"
+    largest = profile["extrapolated"][-1] if profile.get("extrapolated") else None
+    if largest and largest["time_s"] is not None:
+        summary += f" · at n={largest['n']:,}: ~{largest['time_s']:.3g} s"
+        if largest["co2_kg"] is not None:
+            summary += f", {largest['co2_kg']:.3e} kg CO₂"
+    return summary
+
+
+def measurement_cache_note(details):
+    """Caption for a measurement served from the backend's measurement cache, or None."""
+    cache = (details or {}).get("measurement_cache")
+    if not cache or not cache.get("hit"):
+        return None
+    return f"Measurement reused from cache (taken {cache['age_s'] / 60:.0f} min ago)"
+
+
+def llm_usage_summary(usage):
+    """One-line summary of the completion's token use and speed, or None for cached completions."""
+    if not usage or usage.get("completion_tokens") is None:
+        return None
+    parts = [f"{usage['prompt_tokens']} prompt + {usage['completion_tokens']} output tokens"
+             + (" (estimated)" if usage.get("estimated") else "")]
+    if usage.get("tokens_per_s"):
+        parts.append(f"{usage['tokens_per_s']:.0f} tokens/s")
+    if usage.get("prompt_chars_saved"):
+        parts.append(f"prompt trimmed by {usage['prompt_chars_saved']} characters")
+    if usage.get("truncated"):
+        parts.append(f"cut off at the {usage['max_tokens']}-token budget")
+    return ", ".join(parts)
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def fetch_history_page(page, page_size, run_type, language):
+    """One page of run summaries from the backend (no code bodies)."""
+    params = {"page": page, "page_size": page_size}
+    if run_type:
+        params["type"] = run_type
+    if language:
+        params["language"] = language
+    r = requests.get(f"{BACKEND_URL}/history", params=params, timeout=10)
+    r.raise_for_status()
+    return r.json()
+
+
+@st.cache_data(show_spinner=False)
+def fetch_run(run_id):
+    """Full record of a single run; runs never change once recorded."""
+    r = requests.get(f"{BACKEND_URL}/history/{run_id}", timeout=10)
+    r.raise_for_status()
+    return r.json()
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def fetch_rollups(granularity, run_type, language):
+    """Per-period CO₂ totals aggregated by the backend."""
+    params = {"granularity": granularity}
+    if run_type:
+        params["type"] = run_type
+    if language:
+        params["language"] = language
+    r = requests.get(f"{BACKEND_URL}/history/rollups", params=params, timeout=10)
+    r.raise_for_status()
+    return r.json()["rollups"]
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def fetch_weekly_report():
+    r = requests.get(f"{BACKEND_URL}/history/report/weekly", timeout=10)
+    r.raise_for_status()
+    return r.json()
+
+
+def invalidate_dashboard_cache():
+    fetch_history_page.clear()
+    fetch_rollups.clear()
+    fetch_weekly_report.clear()
+
+
+def stream_backend(path, payload, code_placeholder, status_placeholder, language, timeout=900):
+    """Call a streaming endpoint, rendering code tokens as they arrive; returns the final payload."""
+    with requests.post(f"{BACKEND_URL}{path}", json=payload, stream=True, timeout=(10, timeout)) as r:
+        if r.status_code >= 400:
+            raise RuntimeError(r.json().get("error", r.text))
+        event, streamed = None, ""
+        for line in r.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data = json.loads(line[len("data:"):].strip())
+                if event == "token":
+                    streamed += data["text"]
+                    code_placeholder.code(streamed, language=language)
+                elif event == "stage":
+                    status_placeholder.caption(f"⏳ {JOB_STAGE_LABELS.get(data['stage'], data['stage']).capitalize()}...")
+                elif event == "error":
+                    status_placeholder.empty()
+                    raise RuntimeError(data["error"])
+                elif event == "done":
+                    status_placeholder.empty()
+                    code_placeholder.empty()
+                    return data
+    raise RuntimeError("The backend closed the stream before sending a result.")
+
+
 # ======================
 # 🌿 Header and Theme Switch Logic
 # This section is now reordered to fix the theme toggler bug.
@@ -195,42 +372,50 @@ if selected_option == "Code Generation":
             key="codegen_prompt"
         )
 
+    stream_codegen = st.checkbox("Stream code as it is generated", value=True, key="codegen_stream")
+
     if st.button("⚡ Generate Code", key="generate_code"):
         if prompt.strip():
             with st.spinner("🌱 Growing your code..."):
                 try:
-                    r = requests.post("http://127.0.0.1:5000/codegen", json={"prompt": prompt, "language": st.session_state.language})
-                    r.raise_for_status()
-                    data = r.json()
+                    payload = {"prompt": prompt, "language": st.session_state.language}
+                    if stream_codegen:
+                        data = stream_backend("/codegen/stream", payload, st.empty(), st.empty(), st.session_state.language)
+                    else:
+                        data = run_backend_job("codegen", payload, st.empty())
 
                     st.markdown('<div class="output-card">', unsafe_allow_html=True)
                     st.subheader("📝 Generated Code")
                     st.code(data["code"], language=st.session_state.language)
                     st.success(f"🌍 Estimated Total CO₂: {data['total_co2_kg']:.6f} kg")
+                    if llm_usage_summary(data.get("llm")):
+                        st.caption(f"🤖 {llm_usage_summary(data['llm'])}")
 
                     # Show execution details
                     if 'execution_details' in data:
+                        if 'build_cache_hit' in data['execution_details']:
+                            build_note = "cache hit" if data['execution_details']['build_cache_hit'] else f"compiled in {data['execution_details']['compile_time_s']:.3f} s"
+                            st.caption(f"Build: {build_note}")
+                        if measurement_cache_note(data['execution_details']):
+                            st.caption(f"♻️ {measurement_cache_note(data['execution_details'])}")
+                        if benchmark_summary(data['execution_details']):
+                            st.caption(f"⏱️ {benchmark_summary(data['execution_details'])}")
+                        if memory_summary(data['execution_details']):
+                            st.caption(f"🧠 {memory_summary(data['execution_details'])}")
+                        if complexity_summary(data['execution_details']):
+                            st.caption(f"📈 {complexity_summary(data['execution_details'])}")
                         runs = data['execution_details'].get('individual_runs', [])
                         errors = data['execution_details'].get('errors', [])
                         if runs:
-                            st.markdown(f"**Per-run CO₂ emissions:** {['{:.6f}'.format(x) for x in runs]} kg")
+                            st.markdown(f"**Per-run CO₂ emissions:** {['{:.3e}'.format(x) for x in runs]} kg")
                         if errors:
                             with st.expander("⚠️ Execution Errors"):
                                 for err in errors:
                                     st.warning(err)
                     st.markdown('</div>', unsafe_allow_html=True)
 
-                    # Save to history
-                    st.session_state.history.insert(0, {
-                        "type": "generation",
-                        "language": st.session_state.language,
-                        "prompt": prompt,
-                        "code": data["code"],
-                        "llm_co2_kg": data["llm_co2_kg"],
-                        "execution_co2_kg": data["execution_co2_kg"],
-                        "execution_details": data.get("execution_details", {}),
-                        "timestamp": datetime.now()
-                    })
+                    # The backend records the run; refresh the cached dashboard data
+                    invalidate_dashboard_cache()
                 except requests.exceptions.ConnectionError:
                     st.error("❌ Could not connect to the backend server. Please make sure it is running.")
                 except Exception as e:
@@ -250,14 +435,27 @@ elif selected_option == "Code Optimization":
 
     unoptimized_code = st.text_area("Paste your code here:", height=300, key="unoptimized_code_input")
 
+    stream_optimize = st.checkbox("Stream code as it is optimized", value=True, key="optimize_stream")
+    profile_optimize = st.checkbox("Profile hotspots and point the model at them", value=False, key="optimize_profile")
+    remeasure_optimize = st.checkbox("Re-measure instead of reusing cached measurements", value=False,
+                                     key="optimize_remeasure")
+    explore_flags = st.checkbox("Explore compiler flags (C only)", value=False, key="optimize_compiler_flags",
+                                disabled=st.session_state.language != "c")
+    candidate_count = st.number_input("Candidates to try (best of N)", min_value=1, max_value=5, value=1, step=1,
+                                      key="optimize_candidates")
+
     if st.button("♻️ Optimize & Compare", key="optimize_code"):
         if unoptimized_code.strip():
             with st.spinner("🌿 Optimizing your code..."):
                 try:
-                    payload = {"code": unoptimized_code, "language": st.session_state.language}
-                    r = requests.post("http://127.0.0.1:5000/optimize", json=payload)
-                    r.raise_for_status()
-                    data = r.json()
+                    payload = {"code": unoptimized_code, "language": st.session_state.language, "profile": profile_optimize,
+                               "candidates": int(candidate_count), "remeasure": remeasure_optimize}
+                    if explore_flags and st.session_state.language == "c":
+                        payload["compiler_flags"] = True
+                    if stream_optimize:
+                        data = stream_backend("/optimize/stream", payload, st.empty(), st.empty(), st.session_state.language)
+                    else:
+                        data = run_backend_job("optimize", payload, st.empty())
 
                     st.markdown('<div class="optimization-card">', unsafe_allow_html=True)
                     st.subheader(f"✅ Optimized {st.session_state.language.capitalize()} Code")
@@ -272,18 +470,61 @@ elif selected_option == "Code Optimization":
                         st.success(f"After CO₂: {data['after_co2']:.6f} kg")
 
                     st.markdown(f"**CO₂ Saved:** :green[**{(data['before_co2'] - data['after_co2']):.6f} kg**]")
+                    if llm_usage_summary(data.get("llm")):
+                        st.caption(f"🤖 {llm_usage_summary(data['llm'])}")
+
+                    # Build cache and benchmark details for each side of the comparison
+                    for label, details in (("Before", data.get("before_details", {})), ("After", data.get("after_details", {}))):
+                        if "build_cache_hit" in details:
+                            build_note = "cache hit" if details["build_cache_hit"] else f"compiled in {details['compile_time_s']:.3f} s"
+                            st.caption(f"{label} build: {build_note}")
+                        if measurement_cache_note(details):
+                            st.caption(f"♻️ {label}: {measurement_cache_note(details)}")
+                        if benchmark_summary(details):
+                            st.caption(f"⏱️ {label}: {benchmark_summary(details)}")
+                        if memory_summary(details):
+                            st.caption(f"🧠 {label}: {memory_summary(details)}")
+                        if complexity_summary(details):
+                            st.caption(f"📈 {label}: {complexity_summary(details)}")
+                    if data.get("memory_delta", {}).get("peak_rss_kb") is not None:
+                        st.markdown(f"**Peak memory change:** {data['memory_delta']['peak_rss_kb'] / 1024:+.1f} MiB")
+
+                    if data.get("candidates"):
+                        if data.get("selected_candidate") is None:
+                            st.warning("No candidate beat the original code while producing the same output; the original is kept.")
+                        with st.expander(f"🏁 Ranked candidates ({len(data['candidates'])})"):
+                            table = pd.DataFrame(data["candidates"]).drop(columns=["code"])
+                            st.dataframe(table, use_container_width=True, hide_index=True)
+
+                    compiler_flags = data.get("compiler_flags")
+                    if compiler_flags:
+                        recommendation = compiler_flags.get("recommendation") or {}
+                        with st.expander(f"🛠️ Compiler flags (recommended: {compiler_flags.get('recommended') or 'none'})"):
+                            choice = {"original": "keep the original code and build flags",
+                                      "rewrite": "use the optimized code with the default flags",
+                                      "flags": f"keep the original code, built with `{recommendation.get('flags')}`",
+                                      "rewrite_with_flags": f"use the optimized code, built with `{recommendation.get('flags')}`"}
+                            if recommendation.get("choice") in choice:
+                                st.markdown(f"**Greenest option:** {choice[recommendation['choice']]}")
+                            if compiler_flags.get("speedup_vs_baseline"):
+                                st.caption(f"{compiler_flags['speedup_vs_baseline']:.2f}× faster than `{compiler_flags['baseline']}`")
+                            table = pd.DataFrame(compiler_flags["configurations"]).drop(columns=["output_digest"], errors="ignore")
+                            st.dataframe(table, use_container_width=True, hide_index=True)
+
+                    hotspots = data.get("hotspots")
+                    if hotspots and (hotspots.get("functions") or hotspots.get("lines")):
+                        with st.expander(f"🔥 Hotspots in the original code ({hotspots.get('tool', 'profiler')})"):
+                            if hotspots.get("functions"):
+                                st.markdown("**Functions by self time**")
+                                st.dataframe(pd.DataFrame(hotspots["functions"]), use_container_width=True, hide_index=True)
+                            if hotspots.get("lines"):
+                                st.markdown("**Lines by self time**")
+                                st.dataframe(pd.DataFrame(hotspots["lines"]), use_container_width=True, hide_index=True)
+                    elif hotspots and hotspots.get("error"):
+                        st.caption(f"Hotspot profiling failed: {hotspots['error']}")
                     st.markdown('</div>', unsafe_allow_html=True)
 
-                    st.session_state.history.insert(0, {
-                        "type": "optimization",
-                        "language": st.session_state.language,
-                        "unoptimized_code": unoptimized_code,
-                        "optimized_code": data["optimized_code"],
-                        "llm_co2_kg": data["llm_co2_kg"],
-                        "co2_before_kg": data["before_co2"],
-                        "co2_after_kg": data["after_co2"],
-                        "timestamp": datetime.now()
-                    })
+                    invalidate_dashboard_cache()
                 except requests.exceptions.ConnectionError:
                     st.error("❌ Could not connect to the backend server. Please make sure it is running.")
                 except Exception as e:
@@ -297,45 +538,86 @@ elif selected_option == "Code Optimization":
 elif selected_option == "Dashboard":
     st.header("📊 Your Green Dashboard")
 
-    if st.session_state.history:
-        generation_data = [item for item in st.session_state.history if item["type"] == "generation"]
-        if generation_data:
-            chart_data = [{
-                "Timestamp": item["timestamp"].strftime("%H:%M:%S"),
-                "Total CO₂ (kg)": item["llm_co2_kg"] + item["execution_co2_kg"]
-            } for item in generation_data]
-
-            df = pd.DataFrame(chart_data)
-            st.subheader("Last Code Generations by CO₂ Footprint")
-            fig = px.bar(df, x="Timestamp", y="Total CO₂ (kg)", text="Total CO₂ (kg)", color="Total CO₂ (kg)", color_continuous_scale="greens")
+    col_type, col_lang_dash, col_bucket, col_size = st.columns(4)
+    with col_type:
+        run_type = {"All": None, "Generations": "generation", "Optimizations": "optimization"}[
+            st.selectbox("Type", ("All", "Generations", "Optimizations"), key="dash_type")]
+    with col_lang_dash:
+        dash_language = {"All": None, "Python": "python", "C": "c"}[
+            st.selectbox("Language", ("All", "Python", "C"), key="dash_lang")]
+    with col_bucket:
+        granularity = st.selectbox("Chart buckets", ("daily", "weekly"), key="dash_bucket")
+    with col_size:
+        page_size = st.selectbox("Runs per page", (10, 20, 50), index=1, key="dash_page_size")
+
+    try:
+        report = fetch_weekly_report()
+        rollups = fetch_rollups(granularity, run_type, dash_language)
+
+        st.subheader(f"🌿 Green Report · {report['week']}")
+        col_runs, col_saved, col_llm = st.columns(3)
+        col_runs.metric("Runs this week", report["totals"]["runs"])
+        col_saved.metric("CO₂ saved", f"{report['totals']['co2_saved']:.3e} kg")
+        col_llm.metric("LLM CO₂", f"{report['totals']['llm_co2_kg']:.3e} kg")
+
+        if rollups:
+            # One bar per time bucket, so the chart stays small however long the history grows
+            df = pd.DataFrame([{
+                "Period": row["period"],
+                "Generated CO₂ (kg)": row["llm_co2_kg"] + row["execution_co2_kg"],
+                "CO₂ Saved (kg)": row["co2_saved"]
+            } for row in rollups])
+            st.subheader(f"CO₂ by {'day' if granularity == 'daily' else 'week'}")
+            fig = px.bar(df, x="Period", y=["Generated CO₂ (kg)", "CO₂ Saved (kg)"], barmode="group",
+                         color_discrete_sequence=[theme['secondary_color'], theme['primary_color']])
             st.plotly_chart(fig, use_container_width=True)
 
         st.subheader("📜 History Log")
-        for item in st.session_state.history:
-            with st.expander(f"🔹 {item['language'].capitalize()} {item['type'].capitalize()} @ {item['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}"):
-                if item["type"] == "generation":
-                    st.markdown(f"**Prompt:** {item['prompt']}")
-                    st.code(item["code"], language=item["language"])
+        first_page = fetch_history_page(1, page_size, run_type, dash_language)
+        if first_page["total"] == 0:
+            st.info("No history yet. Start generating or optimizing some code!")
+        else:
+            page = st.number_input(f"Page (of {first_page['pages']})", min_value=1, max_value=max(first_page["pages"], 1),
+                                   value=1, step=1, key="dash_page")
+            history_page = first_page if page == 1 else fetch_history_page(page, page_size, run_type, dash_language)
+            st.caption(f"{history_page['total']} runs")
+
+            for item in history_page["items"]:
+                timestamp = datetime.fromisoformat(item["timestamp"]).astimezone()
+                with st.expander(f"🔹 {item['language'].capitalize()} {item['type'].capitalize()} @ {timestamp.strftime('%Y-%m-%d %H:%M:%S')}"):
                     st.markdown(f"**LLM CO₂:** `{item['llm_co2_kg']:.6f} kg`")
-                    st.markdown(f"**Execution CO₂:** `{item['execution_co2_kg']:.6f} kg`")
-                    # Optional: execution details
-                    exec_details = item.get("execution_details", {})
-                    if exec_details.get("individual_runs"):
-                        st.markdown(f"**Per-run CO₂:** {['{:.6f}'.format(x) for x in exec_details['individual_runs']]} kg")
-                    if exec_details.get("errors"):
-                        for err in exec_details["errors"]:
+                    if item["type"] == "generation":
+                        st.markdown(f"**Prompt:** {item['prompt']}")
+                        st.markdown(f"**Execution CO₂:** `{(item['execution_co2_kg'] or 0.0):.6f} kg`")
+                    else:
+                        st.markdown(f"**Before CO₂:** `{item['before_co2']:.6f} kg`")
+                        st.markdown(f"**After CO₂:** `{item['after_co2']:.6f} kg`")
+                        st.markdown(f"**Saved:** `{item['co2_saved']:.6f} kg`")
+
+                    # Code bodies are only fetched once the user asks for them
+                    if item["id"] not in st.session_state.loaded_runs:
+                        if st.button("Show code", key=f"load_run_{item['id']}"):
+                            st.session_state.loaded_runs.add(item["id"])
+                            st.rerun()
+                        continue
+
+                    run = fetch_run(item["id"])
+                    if run["type"] == "generation":
+                        st.code(run["output_code"], language=run["language"])
+                        exec_details = run.get("details") or {}
+                        if exec_details.get("individual_runs"):
+                            st.markdown(f"**Per-run CO₂:** {['{:.3e}'.format(x) for x in exec_details['individual_runs']]} kg")
+                        for err in exec_details.get("errors", []):
                             st.warning(f"Error: {err}")
-                elif item["type"] == "optimization":
-                    st.markdown(f"**Before Optimization {item['language'].capitalize()} Code:**")
-                    st.code(item["unoptimized_code"], language=item["language"])
-                    st.markdown(f"**After Optimization {item['language'].capitalize()} Code:**")
-                    st.code(item["optimized_code"], language=item["language"])
-                    st.markdown(f"**LLM CO₂:** `{item['llm_co2_kg']:.6f} kg`")
-                    st.markdown(f"**Before CO₂:** `{item['co2_before_kg']:.6f} kg`")
-                    st.markdown(f"**After CO₂:** `{item['co2_after_kg']:.6f} kg`")
-                    st.markdown(f"**Saved:** `{(item['co2_before_kg'] - item['co2_after_kg']):.6f} kg`")
-    else:
-        st.info("No history yet. Start generating or optimizing some code!")
+                    else:
+                        st.markdown(f"**Before Optimization {run['language'].capitalize()} Code:**")
+                        st.code(run["input_code"], language=run["language"])
+                        st.markdown(f"**After Optimization {run['language'].capitalize()} Code:**")
+                        st.code(run["output_code"], language=run["language"])
+    except requests.exceptions.ConnectionError:
+        st.error("❌ Could not connect to the backend server. Please make sure it is running.")
+    except Exception as e:
+        st.error(f"❌ Could not load the dashboard: {e}")
 
 # ======================
 # ❤️ Footer